@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import ClaveIdempotencia
 
-# Register your models here.
+class ClaveIdempotenciaAdmin(admin.ModelAdmin):
+    list_display = ('clave', 'usuario', 'ruta', 'codigo_estado', 'creada', 'expira')
+    search_fields = ('clave', 'usuario__email')
+
+admin.site.register(ClaveIdempotencia, ClaveIdempotenciaAdmin)
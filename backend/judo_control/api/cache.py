@@ -0,0 +1,129 @@
+"""
+Caché versionada de las respuestas de lectura más pesadas.
+
+Cada entidad (tipo, id) tiene un número de versión guardado en la propia caché, y la
+clave de una respuesta incluye las versiones de todo aquello de lo que depende. Invalidar
+es incrementar una versión: las entradas antiguas dejan de consultarse y caducan solas.
+Funciona con cualquier backend de Django (memoria local, archivos, Redis...).
+"""
+from functools import wraps
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+TODAS = '*'
+
+
+def _clave_version(tipo, entidad_id=TODAS):
+    return f'version:{tipo}:{entidad_id}'
+
+
+def _version_inicial():
+    # Si el backend descarta una versión, la nueva no coincide con ninguna anterior
+    return time.time_ns()
+
+
+def versiones(entidades):
+    """Versiones actuales de las entidades [(tipo, id)], en el mismo orden"""
+    claves = [_clave_version(tipo, entidad_id) for tipo, entidad_id in entidades]
+    actuales = cache.get_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            cache.add(clave, _version_inicial(), timeout=None)
+            actuales[clave] = cache.get(clave)
+    return [actuales[clave] for clave in claves]
+
+
+def incrementar_version(tipo, *entidad_ids, todas=False):
+    """
+    Invalida las respuestas que dependen de las entidades indicadas. Con `todas=True`
+    invalida además las que dependen de cualquier entidad del tipo.
+    """
+    claves = [_clave_version(tipo, entidad_id) for entidad_id in entidad_ids if entidad_id is not None]
+    if todas:
+        claves.append(_clave_version(tipo))
+    _incrementar(claves)
+    # Otra vez al confirmar: una lectura concurrente pudo cachear los datos anteriores
+    # con la versión nueva antes de que la escritura fuese visible
+    transaction.on_commit(lambda: _incrementar(claves))
+
+
+def _incrementar(claves):
+    for clave in claves:
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.add(clave, _version_inicial(), timeout=None)
+
+
+def _contar(nombre, resultado):
+    clave = f'estadisticas_cache:{nombre}:{resultado}'
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def estadisticas(nombres):
+    """Aciertos y fallos acumulados de cada respuesta cacheada"""
+    claves = {
+        (nombre, resultado): f'estadisticas_cache:{nombre}:{resultado}'
+        for nombre in nombres
+        for resultado in ('aciertos', 'fallos')
+    }
+    valores = cache.get_many(list(claves.values()))
+    datos = {}
+    for nombre in nombres:
+        aciertos = valores.get(claves[(nombre, 'aciertos')], 0)
+        fallos = valores.get(claves[(nombre, 'fallos')], 0)
+        total = aciertos + fallos
+        datos[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos * 100 / total, 1) if total else None,
+        }
+    return datos
+
+
+# Nombres registrados por respuesta_cacheada, para exponer sus contadores
+RESPUESTAS_CACHEADAS = []
+
+
+def respuesta_cacheada(nombre, dependencias, vigencia_diaria=False):
+    """
+    Cachea las respuestas 200 de una vista (método de viewset o vista de función).
+    `dependencias(**kwargs)` devuelve las entidades [(tipo, id)] de las que depende la
+    respuesta, usando `api.cache.TODAS` como id para depender de cualquiera del tipo.
+    Con `vigencia_diaria` la entrada cambia cada día (datos que dependen de la fecha).
+    """
+    RESPUESTAS_CACHEADAS.append(nombre)
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            request = args[-1]
+            entidades = dependencias(**kwargs)
+            partes = [request.get_full_path(), *versiones(entidades)]
+            if vigencia_diaria:
+                partes.append(timezone.localdate())
+            huella = hashlib.sha1(repr(partes).encode()).hexdigest()
+            clave = f'respuesta:{nombre}:{huella}'
+
+            datos = cache.get(clave)
+            if datos is not None:
+                _contar(nombre, 'aciertos')
+                return Response(datos)
+
+            _contar(nombre, 'fallos')
+            respuesta = vista(*args, **kwargs)
+            if respuesta.status_code == 200:
+                cache.set(clave, respuesta.data, settings.CACHE_RESPUESTAS_SEGUNDOS)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,96 @@
+from functools import wraps
+from datetime import timedelta
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import ClaveIdempotencia
+
+CABECERA = 'Idempotency-Key'
+
+
+def _huella(request):
+    """Resumen del cuerpo de la petición para detectar claves reutilizadas con otro contenido"""
+    contenido = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def _repetir(registro, ruta, huella):
+    """Respuesta para una clave ya usada"""
+    if registro.ruta != ruta or registro.huella != huella:
+        return Response(
+            {'error': f'La {CABECERA} ya se usó con una petición distinta'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if not registro.completada:
+        return Response(
+            {'error': 'Hay una petición con esta clave en curso'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(registro.respuesta, status=registro.codigo_estado, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotente(vista):
+    """
+    Hace reintentable una acción de escritura mediante la cabecera Idempotency-Key.
+    La primera petición con una clave se ejecuta y, si tiene éxito, su respuesta se
+    guarda durante IDEMPOTENCIA_TTL_HORAS; los reintentos reciben esa respuesta sin
+    volver a ejecutar la vista. Las respuestas de error no se guardan.
+    """
+    @wraps(vista)
+    def envoltura(self, request, *args, **kwargs):
+        clave = request.headers.get(CABECERA)
+        if not clave or not request.user.is_authenticated:
+            return vista(self, request, *args, **kwargs)
+        
+        if len(clave) > 255:
+            return Response(
+                {'error': f'La {CABECERA} no puede superar 255 caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ruta = request.path
+        huella = _huella(request)
+        
+        registro = ClaveIdempotencia.objects.filter(usuario=request.user, clave=clave).first()
+        if registro and registro.expirada:
+            registro.delete()
+            registro = None
+        if registro:
+            return _repetir(registro, ruta, huella)
+        
+        with transaction.atomic():
+            # Reservar la clave en la misma transacción que la escritura:
+            # una petición concurrente con la misma clave choca con la restricción única
+            try:
+                with transaction.atomic():
+                    registro = ClaveIdempotencia.objects.create(
+                        usuario=request.user,
+                        clave=clave,
+                        ruta=ruta,
+                        huella=huella,
+                        expira=timezone.now() + timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+                    )
+            except IntegrityError:
+                return _repetir(
+                    ClaveIdempotencia.objects.get(usuario=request.user, clave=clave), ruta, huella
+                )
+            
+            response = vista(self, request, *args, **kwargs)
+            
+            if status.is_success(response.status_code):
+                registro.codigo_estado = response.status_code
+                registro.respuesta = response.data
+                registro.save(update_fields=['codigo_estado', 'respuesta'])
+            else:
+                registro.delete()
+        
+        return response
+    
+    return envoltura
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.models import ClaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves de idempotencia cuyo TTL ya venció'
+
+    def handle(self, *args, **options):
+        eliminadas = ClaveIdempotencia.purgar_expiradas()
+        self.stdout.write(self.style.SUCCESS(f'Claves de idempotencia eliminadas: {eliminadas}'))
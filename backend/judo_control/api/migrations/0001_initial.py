@@ -0,0 +1,40 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:58
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255, verbose_name='Clave')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella del cuerpo')),
+                ('codigo_estado', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Código de estado')),
+                ('respuesta', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Respuesta')),
+                ('creada', models.DateTimeField(auto_now_add=True, verbose_name='Creada')),
+                ('expira', models.DateTimeField(db_index=True, verbose_name='Expira')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='claveidempotencia',
+            constraint=models.UniqueConstraint(fields=('usuario', 'clave'), name='clave_idempotencia_unica'),
+        ),
+    ]
@@ -1,3 +1,40 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from usuarios.models import Usuario
 
-# Create your models here.
+
+class ClaveIdempotencia(models.Model):
+    """Respuesta guardada de una petición de escritura identificada por su Idempotency-Key"""
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='claves_idempotencia')
+    clave = models.CharField('Clave', max_length=255)
+    ruta = models.CharField('Ruta', max_length=255)
+    huella = models.CharField('Huella del cuerpo', max_length=64)
+    codigo_estado = models.PositiveSmallIntegerField('Código de estado', null=True, blank=True)
+    respuesta = models.JSONField('Respuesta', null=True, blank=True, encoder=DjangoJSONEncoder)
+    creada = models.DateTimeField('Creada', auto_now_add=True)
+    expira = models.DateTimeField('Expira', db_index=True)
+    
+    def __str__(self):
+        return f"{self.usuario} - {self.clave}"
+    
+    @property
+    def expirada(self):
+        return self.expira <= timezone.now()
+    
+    @property
+    def completada(self):
+        return self.codigo_estado is not None
+    
+    @classmethod
+    def purgar_expiradas(cls):
+        """Elimina las claves cuyo TTL ya venció y devuelve cuántas se borraron"""
+        eliminadas, _ = cls.objects.filter(expira__lte=timezone.now()).delete()
+        return eliminadas
+    
+    class Meta:
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='clave_idempotencia_unica'),
+        ]
@@ -0,0 +1,88 @@
+"""Receptores que incrementan las versiones de la caché de respuestas (ver api.cache)"""
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from combates.models import (
+    Combate, AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion, eventos_registrados
+)
+from competiciones.models import Competicion
+from competidores.models import Competidor
+from estadisticas.models import Reporte, EstadisticaCompetidor
+from .cache import incrementar_version
+
+MODELOS_ACCION = (AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion)
+
+
+def combate_modificado(sender, instance, **kwargs):
+    incrementar_version('combate', instance.pk)
+    incrementar_version('competicion', instance.competicion_id)
+    incrementar_version('estadisticas_competidor', instance.competidor1_id, instance.competidor2_id)
+
+
+def accion_modificada(sender, instance, **kwargs):
+    incrementar_version('combate', instance.combate_id)
+    incrementar_version('estadisticas_competidor', instance.competidor_id)
+
+
+@receiver(eventos_registrados)
+def eventos_combate(sender, combate, eventos, **kwargs):
+    """Cubre también las acciones insertadas en bloque, que no emiten post_save"""
+    incrementar_version('combate', combate.pk)
+    incrementar_version('estadisticas_competidor', combate.competidor1_id, combate.competidor2_id)
+
+
+def competidor_modificado(sender, instance, **kwargs):
+    # Los datos del competidor aparecen anidados en combates, competiciones y reportes
+    incrementar_version('competidor', instance.pk, todas=True)
+    incrementar_version('estadisticas_competidor', instance.pk)
+
+
+def competicion_modificada(sender, instance, **kwargs):
+    incrementar_version('competicion', instance.pk, todas=True)
+
+
+def reporte_modificado(sender, instance, **kwargs):
+    incrementar_version('reporte', instance.pk)
+
+
+def estadistica_modificada(sender, instance, **kwargs):
+    incrementar_version('reporte', instance.reporte_id)
+
+
+def relacion_modificada(tipo):
+    """Receptor de m2m_changed para las relaciones de `tipo` con sus competidores o competiciones"""
+    def receptor(sender, instance, action, reverse, pk_set, **kwargs):
+        if not action.startswith('post_'):
+            return
+        if not reverse:
+            incrementar_version(tipo, instance.pk)
+        elif pk_set:
+            incrementar_version(tipo, *pk_set)
+        else:
+            # clear() desde el otro extremo: no se sabe qué filas cambiaron
+            incrementar_version(tipo, todas=True)
+    return receptor
+
+
+for modelo, receptor in (
+    (Combate, combate_modificado),
+    *((modelo, accion_modificada) for modelo in MODELOS_ACCION),
+    (Competidor, competidor_modificado),
+    (Competicion, competicion_modificada),
+    (Reporte, reporte_modificado),
+):
+    post_save.connect(receptor, sender=modelo, dispatch_uid=f'cache_guardado_{modelo.__name__}')
+    post_delete.connect(receptor, sender=modelo, dispatch_uid=f'cache_eliminado_{modelo.__name__}')
+
+# Sin post_delete: impediría el borrado en bloque al regenerar los reportes, que ya
+# invalida su caché (Reporte.generar_estadisticas y EstadisticaCompetidorViewSet)
+post_save.connect(estadistica_modificada, sender=EstadisticaCompetidor, dispatch_uid='cache_guardado_EstadisticaCompetidor')
+
+m2m_changed.connect(
+    relacion_modificada('competicion'), sender=Competicion.competidores.through, dispatch_uid='cache_competicion_competidores'
+)
+m2m_changed.connect(
+    relacion_modificada('reporte'), sender=Reporte.competidores.through, dispatch_uid='cache_reporte_competidores'
+)
+m2m_changed.connect(
+    relacion_modificada('reporte'), sender=Reporte.competiciones.through, dispatch_uid='cache_reporte_competiciones'
+)
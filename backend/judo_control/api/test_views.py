@@ -1,12 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, IntegrityError, OperationalError
 from django.urls import reverse
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from competidores.models import Competidor
+from competidores.importacion import importar
 from competiciones.models import Competicion
-from combates.models import Combate
+from combates.models import Combate, AccionTashiWaza, AccionCombinada, Amonestacion, EventoCombate
+from combates.difusion import difusor
+from combates.views import CombateViewSet, _secuencias_recibidas
+from api.models import ClaveIdempotencia
+from estadisticas.models import Reporte, EstadisticaCompetidor, TareaLotePDF
+from estadisticas import agregados, pdf
+from estadisticas.agregados import estadisticas_generales
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+import asyncio
+import csv
+import gzip
+import io
+import os
+import tempfile
+import zipfile
+import threading
+import time
+from unittest import mock
 from datetime import date, timedelta
 import json
 
@@ -342,4 +364,1282 @@ class CombateAPITest(TestCase):
         
         combate.refresh_from_db()
         self.assertTrue(combate.finalizado)
-        self.assertEqual(combate.ganador, self.competidor1)
\ No newline at end of file
+        self.assertEqual(combate.ganador, self.competidor1)
+
+
+class CombateEnCursoAPITestBase(TestCase):
+    """Base con un combate iniciado y un entrenador autenticado por token"""
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas"""
+        self.client = APIClient()
+        self.usuario = Usuario.objects.create_user(
+            email='mesa@example.com',
+            password='testpass123',
+            nombre='Mesa de Control',
+            rol='entrenador'
+        )
+        self.token = Token.objects.create(user=self.usuario)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        
+        self.competicion = Competicion.objects.create(
+            nombre='Torneo Eventos',
+            fecha=date.today(),
+            evento='combate_oficial',
+            tipo='nacional',
+            cantidad_atletas=4,
+            cantidad_combates_planificados=4,
+            creado_por=self.usuario
+        )
+        self.competidor1 = Competidor.objects.create(
+            identificacion_personal='90010200001', nombre='Competidor 1', genero='M',
+            division_peso='73', categoria='sub21_juvenil', anos_experiencia=3
+        )
+        self.competidor2 = Competidor.objects.create(
+            identificacion_personal='90010200002', nombre='Competidor 2', genero='M',
+            division_peso='73', categoria='sub21_juvenil', anos_experiencia=2
+        )
+        self.competicion.competidores.add(self.competidor1, self.competidor2)
+        self.combate = Combate.objects.create(
+            competicion=self.competicion,
+            competidor1=self.competidor1,
+            competidor2=self.competidor2,
+            iniciado=True,
+            registrado_por=self.usuario
+        )
+    
+    def registrar_tashi(self, puntuacion='waza_ari'):
+        url = reverse('combate-registrar-accion-tashi-waza', kwargs={'pk': self.combate.pk})
+        return self.client.post(url, {
+            'competidor': self.competidor1.pk,
+            'tipo': 'ashi_waza',
+            'tecnica': 'uchi_mata',
+            'puntuacion': puntuacion,
+            'tiempo': '00:01:10'
+        }, format='json')
+
+
+class ListadoCompeticionesAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de que la lectura de competiciones no escribe en la base de datos"""
+    
+    def crear_competicion(self, nombre, fecha_fin=None):
+        return Competicion.objects.create(
+            nombre=nombre, fecha=date.today() - timedelta(days=10), fecha_fin=fecha_fin,
+            evento='entrenamiento', tipo='nacional', cantidad_atletas=4, creado_por=self.usuario
+        )
+    
+    def test_listar_sin_escrituras_ni_consultas_por_fila(self):
+        """Prueba que listar competiciones no hace UPDATE y cuesta lo mismo con más filas"""
+        url = reverse('competicion-list')
+        with CaptureQueriesContext(connection) as pocas:
+            self.client.get(url)
+        for indice in range(8):
+            competicion = self.crear_competicion(f'Vencida {indice}', date.today() - timedelta(days=1))
+            competicion.competidores.add(self.competidor1)
+        
+        with CaptureQueriesContext(connection) as muchas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(muchas), len(pocas))
+        self.assertFalse([q for q in muchas if q['sql'].startswith('UPDATE')])
+    
+    def test_vencida_se_lee_como_finalizada(self):
+        """Prueba que una competición vencida aparece finalizada sin haberse guardado así"""
+        vencida = self.crear_competicion('Vencida', date.today() - timedelta(days=1))
+        url = reverse('competicion-list')
+        
+        response = self.client.get(url, {'finalizada': 'true'})
+        self.assertEqual([c['id'] for c in response.data['results']], [vencida.pk])
+        self.assertTrue(response.data['results'][0]['finalizada'])
+        response = self.client.get(url, {'finalizada': 'false'})
+        self.assertEqual([c['id'] for c in response.data['results']], [self.competicion.pk])
+        
+        vencida.refresh_from_db()
+        self.assertFalse(vencida.finalizada)
+
+
+class InscripcionLoteAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la inscripción masiva de competidores por identificación"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.nuevos = [
+            Competidor.objects.create(
+                identificacion_personal=f'9101010000{indice}', nombre=f'Nuevo {indice}', genero='F',
+                division_peso='57', categoria='sub21_juvenil', anos_experiencia=1
+            )
+            for indice in range(3)
+        ]
+        self.url = reverse('competicion-inscribir-lote', kwargs={'pk': self.competicion.pk})
+    
+    def test_inscribe_e_informa_errores_por_fila(self):
+        """Prueba que se inscriben las válidas y cada fila problemática indica su motivo"""
+        identificaciones = [
+            self.nuevos[0].identificacion_personal,
+            self.competidor1.identificacion_personal,
+            'desconocida',
+            self.nuevos[1].identificacion_personal,
+            self.nuevos[0].identificacion_personal,
+            self.nuevos[2].identificacion_personal,
+        ]
+        response = self.client.post(self.url, {'identificaciones': identificaciones}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['inscritos'], 2)
+        self.assertEqual([error['fila'] for error in response.data['errores']], [2, 3, 5, 6])
+        self.assertIn('ya está inscrito', response.data['errores'][0]['error'])
+        self.assertIn('No existe', response.data['errores'][1]['error'])
+        self.assertIn('repetida', response.data['errores'][2]['error'])
+        self.assertIn('cantidad máxima', response.data['errores'][3]['error'])
+        self.assertEqual(set(self.competicion.competidores.all()), {
+            self.competidor1, self.competidor2, self.nuevos[0], self.nuevos[1]
+        })
+    
+    def test_consultas_independientes_del_tamano(self):
+        """Prueba que el número de consultas no crece con la cantidad de identificaciones"""
+        self.competicion.cantidad_atletas = 100
+        self.competicion.save()
+        with CaptureQueriesContext(connection) as uno:
+            self.competicion.inscribir_lote([self.nuevos[0].identificacion_personal])
+        with CaptureQueriesContext(connection) as varios:
+            self.competicion.inscribir_lote([c.identificacion_personal for c in self.nuevos[1:]] + ['x', 'y'])
+        self.assertEqual(len(uno), len(varios))
+    
+    def test_inscripcion_desde_csv(self):
+        """Prueba que se acepta un CSV con encabezado y se invalida la competición cacheada"""
+        detalle = reverse('competicion-detail', kwargs={'pk': self.competicion.pk})
+        self.assertEqual(len(self.client.get(detalle).data['competidores']), 2)
+        
+        archivo = io.BytesIO(
+            f'nombre,identificacion_personal\nNuevo 0,{self.nuevos[0].identificacion_personal}\n'.encode('utf-8')
+        )
+        archivo.name = 'inscripcion.csv'
+        response = self.client.post(self.url, {'archivo': archivo}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['inscritos'], 1)
+        self.assertEqual(len(self.client.get(detalle).data['competidores']), 3)
+    
+    def test_sin_identificaciones(self):
+        """Prueba que una petición sin identificaciones se rechaza"""
+        response = self.client.post(self.url, {'identificaciones': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportacionCompetidoresAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la importación masiva de competidores"""
+    
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=directorio.name, IMPORTACION_TAMANO_LOTE=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.url = reverse('competidor-importar')
+    
+    def subir(self, contenido, nombre):
+        archivo = io.BytesIO(contenido.encode('utf-8'))
+        archivo.name = nombre
+        return self.client.post(self.url, {'archivo': archivo}, format='multipart')
+    
+    def test_importar_csv_con_errores(self):
+        """Prueba que se crean las filas válidas y las rechazadas se descargan con su motivo"""
+        contenido = (
+            'identificacion_personal,nombre,genero,division_peso,categoria,anos_experiencia\n'
+            '92010100001,Atleta Uno,M,66,sub21_juvenil,2\n'
+            '92010100002,Atleta Dos,F,52,sub21_primera,3\n'
+            '92010100003,Atleta Tres,F,66,sub21_juvenil,1\n'
+            '90010200001,Ya Registrado,M,73,sub21_juvenil,1\n'
+            '92010100001,Repetido,M,66,sub21_juvenil,2\n'
+            '92010100004,Atleta Cuatro,M,+100,sub21_juvenil,5\n'
+        )
+        response = self.subir(contenido, 'roster.csv')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {clave: response.data[clave] for clave in ('procesadas', 'creados', 'errores')},
+            {'procesadas': 6, 'creados': 3, 'errores': 3}
+        )
+        self.assertTrue(Competidor.objects.filter(identificacion_personal='92010100004').exists())
+        
+        errores = self.client.get(response.data['errores_url'])
+        self.assertEqual(errores.status_code, status.HTTP_200_OK)
+        filas = list(csv.DictReader(io.StringIO(b''.join(errores.streaming_content).decode('utf-8'))))
+        self.assertEqual([fila['fila'] for fila in filas], ['4', '5', '6'])
+        self.assertIn('División de peso', filas[0]['error'])
+        self.assertIn('Ya existe', filas[1]['error'])
+        self.assertIn('Ya existe', filas[2]['error'])
+    
+    def test_importar_ndjson(self):
+        """Prueba que se aceptan archivos NDJSON y una línea ilegible se informa sin detener la importación"""
+        lineas = [
+            json.dumps({'identificacion_personal': '92020200001', 'nombre': 'Atleta', 'genero': 'F',
+                        'division_peso': '48', 'categoria': 'sub21_juvenil', 'anos_experiencia': 0,
+                        'activo': False}),
+            '{no es json',
+        ]
+        response = self.subir('\n'.join(lineas) + '\n', 'roster.ndjson')
+        
+        self.assertEqual((response.data['creados'], response.data['errores']), (1, 1))
+        self.assertFalse(Competidor.objects.get(identificacion_personal='92020200001').activo)
+    
+    def test_sin_errores_no_deja_archivo(self):
+        """Prueba que sin filas rechazadas no se genera archivo de errores"""
+        response = self.subir(
+            'identificacion_personal,nombre,genero,division_peso,categoria,anos_experiencia\n'
+            '92030300001,Atleta,M,60,sub21_juvenil,1\n', 'roster.csv'
+        )
+        self.assertNotIn('errores_url', response.data)
+        
+        url = reverse('competidor-errores-importacion')
+        self.assertEqual(self.client.get(url, {'archivo': '../settings.py'}).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_unicidad_consultada_por_lote(self):
+        """Prueba que la importación no carga todas las identificaciones registradas"""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.subir(
+                'identificacion_personal,nombre,genero,division_peso,categoria,anos_experiencia\n'
+                '92070700001,Atleta Uno,M,60,sub21_juvenil,1\n'
+                '90010200001,Ya Registrado,M,73,sub21_juvenil,1\n'
+                '92070700002,Atleta Dos,M,60,sub21_juvenil,1\n', 'roster.csv'
+            )
+        
+        self.assertEqual((response.data['creados'], response.data['errores']), (2, 1))
+        lecturas = [
+            consulta['sql'] for consulta in consultas.captured_queries
+            if consulta['sql'].startswith('SELECT') and 'FROM "competidores_competidor"' in consulta['sql']
+        ]
+        self.assertTrue(lecturas)
+        self.assertTrue(all(' IN (' in sql for sql in lecturas))
+    
+    def test_archivo_no_utf8_no_importa_nada(self):
+        """Prueba que un archivo con bytes que no son UTF-8 se rechaza antes de crear ninguna fila"""
+        # Más filas válidas de las que se decodifican de una vez antes del byte erróneo
+        filas = ''.join(f'92040{numero:06d},Atleta {numero},M,66,sub21_juvenil,2\n' for numero in range(300))
+        contenido = (
+            'identificacion_personal,nombre,genero,division_peso,categoria,anos_experiencia\n'
+            + filas + '92040400999,Atleta Peña,M,66,sub21_juvenil,2\n'
+        ).encode('latin-1')
+        archivo = io.BytesIO(contenido)
+        archivo.name = 'roster.csv'
+        response = self.client.post(self.url, {'archivo': archivo}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Competidor.objects.filter(identificacion_personal__startswith='92040').exists())
+    
+    def test_importacion_invalida_estadisticas_generales(self):
+        """Prueba que los competidores importados se cuentan en los totales cacheados"""
+        antes = estadisticas_generales()['competidores']
+        self.subir(
+            'identificacion_personal,nombre,genero,division_peso,categoria,anos_experiencia\n'
+            '92050500001,Atleta,M,60,sub21_juvenil,1\n', 'roster.csv'
+        )
+        self.assertEqual(estadisticas_generales()['competidores'], antes + 1)
+    
+    def test_identificaciones_ocupadas_durante_la_importacion(self):
+        """Prueba que las identificaciones ocupadas durante la importación se rechazan y el resto se crea"""
+        def filas():
+            for numero in range(1, 4):
+                if numero == 3:
+                    # Otra petición registra la primera identificación antes de insertar el lote
+                    Competidor.objects.create(
+                        identificacion_personal='92060600001', nombre='Concurrente', genero='M',
+                        division_peso='60', categoria='sub21_juvenil', anos_experiencia=1
+                    )
+                yield numero + 1, {
+                    'identificacion_personal': f'9206060000{numero}', 'nombre': f'Atleta {numero}',
+                    'genero': 'M', 'division_peso': '60', 'categoria': 'sub21_juvenil', 'anos_experiencia': '1'
+                }
+        
+        # La inserción del lote sin las ocupadas también choca con otra escritura
+        with mock.patch.object(Competidor.objects, 'bulk_create', side_effect=IntegrityError):
+            resumen = importar(filas(), io.StringIO(), tamano_lote=3)
+        
+        self.assertEqual((resumen['creados'], resumen['errores']), (2, 1))
+        self.assertEqual(Competidor.objects.get(identificacion_personal='92060600001').nombre, 'Concurrente')
+        self.assertTrue(Competidor.objects.filter(identificacion_personal='92060600003').exists())
+
+
+class EventosCombateAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la sincronización incremental de eventos de un combate"""
+    
+    def test_eventos_desde_secuencia(self):
+        """Prueba que solo se devuelven los eventos nuevos y el marcador actual"""
+        url = reverse('combate-eventos', kwargs={'pk': self.combate.pk})
+        response = self.client.get(url, {'desde': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        secuencia = response.data['secuencia']
+        
+        self.assertEqual(self.registrar_tashi().status_code, status.HTTP_201_CREATED)
+        
+        response = self.client.get(url, {'desde': secuencia})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e['tipo'] for e in response.data['eventos']], ['accion'])
+        self.assertEqual(response.data['puntuaciones']['competidor1']['waza_ari'], 1)
+    
+    def test_sin_cambios_devuelve_304(self):
+        """Prueba que un cliente al día recibe 304 sin cuerpo"""
+        self.registrar_tashi()
+        url = reverse('combate-eventos', kwargs={'pk': self.combate.pk})
+        secuencia = self.client.get(url).data['secuencia']
+        
+        response = self.client.get(url, {'desde': secuencia})
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+
+
+class FlujoEnVivoTest(CombateEnCursoAPITestBase):
+    """Pruebas del marcador en vivo por Server-Sent Events"""
+    
+    async def leer_mensajes(self, response, cantidad):
+        mensajes = []
+        async for fragmento in response.streaming_content:
+            mensajes.append(fragmento.decode() if isinstance(fragmento, bytes) else fragmento)
+            if len(mensajes) == cantidad:
+                break
+        await response.streaming_content.aclose()
+        return mensajes
+    
+    async def token_flujo(self):
+        response = await sync_to_async(self.client.post)(reverse('token_flujo'))
+        return response.data['token']
+    
+    async def test_reconexion_reenvia_eventos_perdidos(self):
+        """Prueba que Last-Event-ID reenvía los eventos posteriores y después el estado"""
+        ultimo = await EventoCombate.objects.filter(combate=self.combate).alatest('id')
+        await sync_to_async(self.registrar_tashi)()
+        
+        url = reverse('flujo_combate', kwargs={'combate_id': self.combate.pk})
+        response = await self.async_client.get(
+            url, {'token': await self.token_flujo()}, headers={'Last-Event-ID': str(ultimo.id)}
+        )
+        mensajes = await self.leer_mensajes(response, 3)
+        
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(mensajes[0].startswith('retry:'))
+        self.assertIn('event: accion', mensajes[1])
+        self.assertIn('event: estado', mensajes[2])
+        self.assertIn('"waza_ari": 1', mensajes[2])
+    
+    async def test_evento_confirmado_llega_en_vivo(self):
+        """Prueba que el difusor entrega a la suscripción los eventos de su combate"""
+        def registrar_y_confirmar():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.registrar_tashi()
+        
+        suscripcion = difusor.suscribir(combate_id=self.combate.pk)
+        try:
+            await sync_to_async(registrar_y_confirmar)()
+            mensaje = await asyncio.wait_for(suscripcion.cola.get(), timeout=1)
+        finally:
+            difusor.cancelar(suscripcion)
+        
+        self.assertEqual(mensaje['tipo'], 'accion')
+        self.assertEqual(mensaje['competicion'], self.competicion.pk)
+    
+    @override_settings(SSE_CAPACIDAD_COLA=1)
+    async def test_cola_desbordada_se_recupera_al_reconectar(self):
+        """Prueba que un cliente lento recibe los eventos descartados al reconectar con Last-Event-ID"""
+        def registrar_dos():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.registrar_tashi()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.registrar_tashi('yuko')
+
+        url = reverse('flujo_combate', kwargs={'combate_id': self.combate.pk})
+        response = await self.async_client.get(url, {'token': await self.token_flujo()})
+        flujo = response.streaming_content
+        await anext(flujo)  # retry
+        await anext(flujo)  # estado
+
+        await sync_to_async(registrar_dos)()
+        primero, descartado = [
+            evento async for evento in EventoCombate.objects.filter(combate=self.combate).order_by('-id')[:2]
+        ][::-1]
+        # Se entrega lo que cabía en la cola y el flujo termina
+        entregados = [m.decode() if isinstance(m, bytes) else m async for m in flujo]
+        self.assertEqual(len(entregados), 1)
+        self.assertIn(f'id: {primero.id}\n', entregados[0])
+
+        response = await self.async_client.get(
+            url, {'token': await self.token_flujo()}, headers={'Last-Event-ID': str(primero.id)}
+        )
+        mensajes = await self.leer_mensajes(response, 2)
+        self.assertIn(f'id: {descartado.id}\n', mensajes[1])
+
+    async def test_requiere_autenticacion(self):
+        """Prueba que el flujo rechaza clientes sin token"""
+        url = reverse('flujo_combate', kwargs={'combate_id': self.combate.pk})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+    
+    async def test_token_de_flujo_de_un_solo_uso(self):
+        """Prueba que el token de flujo sirve una sola vez y que el token de la API no se acepta en la URL"""
+        url = reverse('flujo_combate', kwargs={'combate_id': self.combate.pk})
+        token = await self.token_flujo()
+        
+        response = await self.async_client.get(url, {'token': token})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+        
+        self.assertEqual((await self.async_client.get(url, {'token': token})).status_code, 401)
+        self.assertEqual((await self.async_client.get(url, {'token': self.token.key})).status_code, 401)
+        
+        with override_settings(SSE_TOKEN_SEGUNDOS=-1):
+            self.assertEqual((await self.async_client.get(url, {'token': await self.token_flujo()})).status_code, 401)
+
+
+
+class RegistroLoteAPITest(CombateEnCursoAPITestBase):
+    """Pruebas del registro de acciones en lote"""
+    
+    def accion_tashi(self, competidor, puntuacion='waza_ari', tiempo='00:01:00'):
+        return {
+            'tipo_registro': 'tashi_waza',
+            'competidor': competidor.pk,
+            'tipo': 'ashi_waza',
+            'tecnica': 'uchi_mata',
+            'puntuacion': puntuacion,
+            'tiempo': tiempo
+        }
+    
+    def test_lote_mixto_registra_todo_y_finaliza(self):
+        """Prueba que un lote mixto se registra completo y finaliza el combate una vez"""
+        url = reverse('combate-registrar-lote', kwargs={'pk': self.combate.pk})
+        response = self.client.post(url, {'acciones': [
+            {'tipo_registro': 'amonestacion', 'competidor': self.competidor2.pk,
+             'tipo': 'shido', 'tiempo': '00:00:30'},
+            self.accion_tashi(self.competidor1, tiempo='00:01:00'),
+            self.accion_tashi(self.competidor1, tiempo='00:02:00'),
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['registradas'], 3)
+        self.assertTrue(response.data['combate_finalizado'])
+        self.assertEqual(response.data['ganador'], self.competidor1.pk)
+        self.assertEqual(self.combate.acciones_tashi_waza.count(), 2)
+        self.assertEqual(
+            EventoCombate.objects.filter(combate=self.combate, tipo='finalizacion').count(), 1
+        )
+    
+    def test_entrada_invalida_rechaza_el_lote(self):
+        """Prueba que un error en cualquier entrada no registra ninguna acción"""
+        url = reverse('combate-registrar-lote', kwargs={'pk': self.combate.pk})
+        response = self.client.post(url, {'acciones': [
+            self.accion_tashi(self.competidor1),
+            {'tipo_registro': 'tashi_waza', 'competidor': self.competidor1.pk, 'tipo': 'ashi_waza'},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([d['indice'] for d in response.data['detalles']], [1])
+        self.assertFalse(self.combate.acciones_tashi_waza.exists())
+
+
+class AccionCombinadaAPITest(CombateEnCursoAPITestBase):
+    """Pruebas del registro atómico de acciones combinadas"""
+    
+    def combinacion(self, tecnicas):
+        return {
+            'competidor': self.competidor1.pk,
+            'tiempo': '00:01:30',
+            'resultado_final': 'waza_ari',
+            'acciones': [
+                {'categoria': 'ashi_waza', 'tecnica': 'ouchi_gari', 'puntuacion': 'sin_puntuacion'},
+                {'categoria': 'koshi_waza', 'tecnica': 'harai_goshi', 'puntuacion': 'waza_ari'},
+            ],
+            'acciones_tashi': tecnicas
+        }
+    
+    def tecnica(self, tecnica, puntuacion='sin_puntuacion'):
+        return {
+            'competidor': self.competidor1.pk,
+            'tipo': 'ashi_waza',
+            'tecnica': tecnica,
+            'puntuacion': puntuacion,
+            'tiempo': '00:01:30'
+        }
+    
+    def test_combinacion_con_consultas_constantes(self):
+        """Prueba que una combinación de 4 técnicas se registra con un número fijo de consultas"""
+        url = reverse('combate-registrar-accion-combinada', kwargs={'pk': self.combate.pk})
+        tecnicas = [self.tecnica(t) for t in ('ouchi_gari', 'kouchi_gari', 'de_ashi_harai')]
+        tecnicas.append(self.tecnica('uchi_mata', 'waza_ari'))
+        
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(url, self.combinacion(tecnicas), format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['acciones']), 4)
+        self.assertEqual(self.combate.acciones_tashi_waza.filter(accion_combinada__isnull=False).count(), 4)
+        self.assertEqual(response.data['puntuaciones']['competidor1']['puntuacion']['waza_ari'], 1)
+        self.assertLessEqual(len(consultas), 16)
+    
+    def test_tecnica_invalida_no_deja_combinacion_parcial(self):
+        """Prueba que una técnica inválida rechaza toda la combinación"""
+        url = reverse('combate-registrar-accion-combinada', kwargs={'pk': self.combate.pk})
+        invalida = self.tecnica('uchi_mata')
+        del invalida['tiempo']
+        
+        response = self.client.post(url, self.combinacion([self.tecnica('ouchi_gari'), invalida]), format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('1', [str(i) for i in response.data['detalles']['acciones_tashi']])
+        self.assertFalse(self.combate.acciones_combinadas.exists())
+        self.assertFalse(self.combate.acciones_tashi_waza.exists())
+
+
+class IdempotenciaAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la cabecera Idempotency-Key en las escrituras de combates"""
+    
+    def registrar(self, clave, puntuacion='waza_ari'):
+        url = reverse('combate-registrar-accion-tashi-waza', kwargs={'pk': self.combate.pk})
+        return self.client.post(url, {
+            'competidor': self.competidor1.pk,
+            'tipo': 'ashi_waza',
+            'tecnica': 'uchi_mata',
+            'puntuacion': puntuacion,
+            'tiempo': '00:01:10'
+        }, format='json', headers={'Idempotency-Key': clave})
+    
+    def test_reintento_devuelve_respuesta_guardada(self):
+        """Prueba que un reintento con la misma clave no vuelve a sumar la acción"""
+        primera = self.registrar('clave-1')
+        segunda = self.registrar('clave-1')
+        
+        self.assertEqual(primera.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(self.combate.acciones_tashi_waza.count(), 1)
+        self.assertFalse(Combate.objects.get(pk=self.combate.pk).finalizado)
+    
+    def test_clave_reutilizada_con_otro_cuerpo(self):
+        """Prueba que una clave reutilizada con otro contenido se rechaza"""
+        self.registrar('clave-1')
+        response = self.registrar('clave-1', puntuacion='ippon')
+        
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(self.combate.acciones_tashi_waza.count(), 1)
+    
+    def test_clave_expirada_se_ejecuta_de_nuevo(self):
+        """Prueba que una clave vencida deja de reproducirse y se purga"""
+        self.registrar('clave-1')
+        ClaveIdempotencia.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        
+        self.assertEqual(ClaveIdempotencia.purgar_expiradas(), 1)
+        self.registrar('clave-1')
+        self.assertEqual(self.combate.acciones_tashi_waza.count(), 2)
+
+
+class SincronizacionAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la reproducción de acciones registradas sin conexión"""
+    
+    def entrada(self, secuencia, competidor, tipo_registro='amonestacion', **datos):
+        entrada = {
+            'secuencia_cliente': secuencia,
+            'registrado_en': '2026-01-10T10:00:00Z',
+            'tipo_registro': tipo_registro,
+            'competidor': competidor.pk,
+            'tiempo': '00:01:00'
+        }
+        if tipo_registro == 'amonestacion':
+            entrada['tipo'] = 'shido'
+        else:
+            entrada.update({'tipo': 'ashi_waza', 'tecnica': 'uchi_mata', 'puntuacion': 'sin_puntuacion'})
+        entrada.update(datos)
+        return entrada
+    
+    def sincronizar(self, entradas):
+        url = reverse('combate-sincronizar', kwargs={'pk': self.combate.pk})
+        return self.client.post(url, {'dispositivo': 'tapiz-1', 'acciones': entradas}, format='json')
+    
+    def test_cola_grande_con_consultas_constantes(self):
+        """Prueba que cientos de acciones se aplican con un número fijo de consultas"""
+        entradas = [self.entrada(i, self.competidor1, 'tashi_waza') for i in range(300)]
+        
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.sincronizar(entradas)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['aplicadas'], 300)
+        self.assertEqual(self.combate.acciones_tashi_waza.count(), 300)
+        self.assertLessEqual(len(consultas), 20)
+    
+    def test_acciones_tras_finalizacion_son_conflicto(self):
+        """Prueba que las acciones posteriores a la finalización se marcan y no se registran"""
+        response = self.sincronizar([
+            self.entrada(3, self.competidor2),
+            self.entrada(1, self.competidor1, 'tashi_waza', puntuacion='ippon'),
+            self.entrada(2, self.competidor2),
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        estados = {r['secuencia_cliente']: r['estado'] for r in response.data['resultados']}
+        self.assertEqual(estados, {1: 'aplicada', 2: 'conflicto', 3: 'conflicto'})
+        self.assertTrue(response.data['combate_finalizado'])
+        self.assertEqual(response.data['ganador'], self.competidor1.pk)
+        self.assertFalse(self.combate.amonestaciones.exists())
+    
+    def test_reenvio_de_la_cola_no_duplica(self):
+        """Prueba que reenviar la misma cola tras un corte no vuelve a registrar acciones"""
+        entradas = [self.entrada(1, self.competidor2), self.entrada(2, self.competidor1)]
+        self.sincronizar(entradas[:1])
+        
+        response = self.sincronizar(entradas)
+        
+        estados = [r['estado'] for r in response.data['resultados']]
+        self.assertEqual(estados, ['duplicada', 'aplicada'])
+        self.assertEqual(response.data['puntuaciones']['competidor2']['puntuacion']['shidos'], 1)
+        self.assertEqual(self.combate.amonestaciones.count(), 2)
+    
+    def test_secuencia_booleana_se_rechaza(self):
+        """Prueba que true/false no se aceptan como secuencia del cliente"""
+        response = self.sincronizar([self.entrada(True, self.competidor2), self.entrada(False, self.competidor2)])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['estado'] for r in response.data['resultados']], ['rechazada', 'rechazada'])
+        self.assertFalse(self.combate.amonestaciones.exists())
+    
+    def test_dispositivo_demasiado_largo(self):
+        """Prueba que un identificador de dispositivo mayor que el campo se rechaza con 400"""
+        url = reverse('combate-sincronizar', kwargs={'pk': self.combate.pk})
+        response = self.client.post(url, {
+            'dispositivo': 'x' * 65, 'acciones': [self.entrada(1, self.competidor1)]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.combate.amonestaciones.exists())
+    
+    def test_secuencia_registrada_en_paralelo_es_duplicada(self):
+        """Prueba que si otra sincronización inserta la misma secuencia se informa como duplicada"""
+        self.sincronizar([self.entrada(1, self.competidor2)])
+        
+        # Simula que la otra petición insertó la secuencia después de la comprobación inicial
+        llamadas = []
+        def primera_sin_recibidas(*args):
+            llamadas.append(args)
+            return set() if len(llamadas) == 1 else _secuencias_recibidas(*args)
+        
+        with mock.patch('combates.views._secuencias_recibidas', side_effect=primera_sin_recibidas):
+            response = self.sincronizar([self.entrada(1, self.competidor2), self.entrada(2, self.competidor1)])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        estados = [r['estado'] for r in response.data['resultados']]
+        self.assertEqual(estados, ['duplicada', 'aplicada'])
+        self.assertEqual(self.combate.amonestaciones.count(), 2)
+
+
+@override_settings(REPORTES_EJECUCION_SINCRONA=True)
+class GeneracionReporteAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la generación asíncrona de reportes desde la API"""
+    
+    def setUp(self):
+        super().setUp()
+        self.reporte = Reporte.objects.create(
+            titulo='Reporte API',
+            tipo='individual',
+            fecha_inicio=date.today() - timedelta(days=1),
+            fecha_fin=date.today() + timedelta(days=1)
+        )
+        self.reporte.competidores.add(self.competidor1, self.competidor2)
+        self.url = reverse('reporte-generar-estadisticas', kwargs={'pk': self.reporte.pk})
+    
+    def test_generar_devuelve_tarea(self):
+        """Prueba que generar responde 202 y la tarea se puede consultar hasta completarse"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['reporte'], self.reporte.pk)
+        
+        response = self.client.get(reverse('tareareporte-detail', kwargs={'pk': response.data['id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['estado'], 'completada')
+        self.assertEqual(response.data['progreso'], 100)
+        self.assertEqual(self.reporte.estadisticas.count(), 2)
+    
+    def test_solicitudes_repetidas_comparten_tarea(self):
+        """Prueba que pedir el mismo reporte dos veces seguidas devuelve la misma tarea"""
+        with self.captureOnCommitCallbacks(execute=False):
+            primera = self.client.post(self.url)
+            segunda = self.client.post(self.url)
+        
+        self.assertEqual(primera.data['id'], segunda.data['id'])
+        self.assertEqual(segunda.data['estado'], 'pendiente')
+
+
+class EstadisticasDetalladasAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de las estadísticas detalladas y por técnica de los competidores"""
+    
+    def test_contadores_del_periodo(self):
+        """Prueba que solo cuentan los combates dentro del período pedido"""
+        self.registrar_tashi('ippon')
+        url = reverse('estadisticas_detalladas_competidor', kwargs={'competidor_id': self.competidor1.pk})
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_combates'], 1)
+        self.assertEqual(response.data['combates_ganados'], 1)
+        self.assertEqual(response.data['ippon'], 1)
+        
+        self.assertEqual(response.data['tecnicas_por_categoria'], {
+            'uchi_mata': {'total': 1, 'efectivas': 1, 'puntos': 10}
+        })
+        
+        manana = (date.today() + timedelta(days=1)).isoformat()
+        response = self.client.get(url, {'fecha_inicio': manana})
+        self.assertEqual(response.data['total_combates'], 0)
+        self.assertEqual(response.data['ippon'], 0)
+        self.assertEqual(response.data['tecnicas_por_categoria'], {})
+    
+    def test_combate_en_curso_con_y_sin_fechas(self):
+        """Prueba que un combate sin finalizar también cuenta y que indicar el período no cambia el resultado"""
+        self.registrar_tashi('waza_ari')
+        url = reverse('estadisticas_detalladas_competidor', kwargs={'competidor_id': self.competidor1.pk})
+        
+        sin_fechas = self.client.get(url).data
+        self.assertEqual((sin_fechas['total_combates'], sin_fechas['wazari']), (1, 1))
+        self.assertEqual(sin_fechas['tecnicas_por_categoria'], {
+            'uchi_mata': {'total': 1, 'efectivas': 1, 'puntos': 7}
+        })
+        
+        hoy = timezone.localdate().isoformat()
+        self.assertEqual(self.client.get(url, {'fecha_inicio': hoy, 'fecha_fin': hoy}).data, sin_fechas)
+    
+    def test_fecha_invalida(self):
+        """Prueba que una fecha mal formada o inexistente responde 400"""
+        url = reverse('estadisticas_detalladas_competidor', kwargs={'competidor_id': self.competidor1.pk})
+        for fechas in ({'fecha_inicio': 'ayer'}, {'fecha_fin': '2024-02-30'}):
+            self.assertEqual(self.client.get(url, fechas).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_tecnicas_frecuentes_por_division(self):
+        """Prueba la frecuencia de técnicas filtrada por división de peso"""
+        self.registrar_tashi('sin_puntuacion')
+        self.registrar_tashi('ippon')
+        url = reverse('tecnicas_frecuentes')
+        
+        response = self.client.get(url, {'division_peso': '73'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['tecnica'], 'uchi_mata')
+        self.assertEqual(response.data[0]['usos'], 2)
+        self.assertEqual(response.data[0]['tasa_puntuacion'], 50.0)
+        self.assertEqual(response.data[0]['competidores'], 1)
+        
+        response = self.client.get(url, {'division_peso': '81'})
+        self.assertEqual(response.data, [])
+        self.assertEqual(self.client.get(url, {'limite': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_tecnicas_competidor(self):
+        """Prueba la efectividad por técnica de un competidor"""
+        self.registrar_tashi('ippon')
+        
+        response = self.client.get(reverse('tecnicas_competidor', kwargs={'competidor_id': self.competidor1.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['tecnica'], 'uchi_mata')
+        self.assertEqual(response.data[0]['tasa_efectividad'], 100.0)
+        self.assertEqual(response.data[0]['puntos'], 10)
+        
+        response = self.client.get(reverse('tecnicas_competidor', kwargs={'competidor_id': 99999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DetallesCombinacionesAPITest(CombateEnCursoAPITestBase):
+    """Pruebas del detalle de combinaciones de una estadística de reporte"""
+    
+    def setUp(self):
+        super().setUp()
+        self.reporte = Reporte.objects.create(
+            titulo='Reporte combinaciones',
+            tipo='individual',
+            fecha_inicio=date.today(),
+            fecha_fin=date.today()
+        )
+        self.reporte.competidores.add(self.competidor1)
+        self.reporte.competiciones.add(self.competicion)
+        self.estadistica = EstadisticaCompetidor.objects.create(reporte=self.reporte, competidor=self.competidor1)
+        self.url = reverse('estadisticacompetidor-detalles-combinaciones', kwargs={'pk': self.estadistica.pk})
+    
+    def crear_combinaciones(self, combate, cantidad):
+        for indice in range(cantidad):
+            combinada = AccionCombinada.objects.create(
+                combate=combate, competidor=self.competidor1, descripcion=f'Combinación {indice}',
+                tiempo=timedelta(seconds=indice), efectiva=indice % 2 == 0, registrado_por=self.usuario
+            )
+            if indice % 3:
+                AccionTashiWaza.objects.create(
+                    combate=combate, competidor=self.competidor1, tipo='ashi_waza', tecnica='ouchi_gari',
+                    puntuacion='sin_puntuacion', accion_combinada=combinada,
+                    tiempo=timedelta(seconds=indice), registrado_por=self.usuario
+                )
+    
+    def test_paginado_y_acotado_al_reporte(self):
+        """Prueba que solo entran combates del reporte y que el detalle se pagina"""
+        self.crear_combinaciones(self.combate, 12)
+        self.combate.finalizar(self.competidor1)
+        
+        otra = Competicion.objects.create(
+            nombre='Otra', fecha=date.today(), evento='combate_oficial', tipo='nacional',
+            cantidad_atletas=2, cantidad_combates_planificados=2, creado_por=self.usuario
+        )
+        otra.competidores.add(self.competidor1, self.competidor2)
+        ajeno = Combate.objects.create(
+            competicion=otra, competidor1=self.competidor1, competidor2=self.competidor2,
+            iniciado=True, registrado_por=self.usuario
+        )
+        self.crear_combinaciones(ajeno, 3)
+        ajeno.finalizar(self.competidor1)
+        
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['resumen']['total_combinaciones'], 12)
+        self.assertEqual(response.data['resumen']['combinaciones_efectivas'], 6)
+        self.assertEqual(response.data['resumen']['tipos_tecnicas']['tashi_waza'], {
+            'total': 8, 'efectivas': 0, 'no_efectivas': 8
+        })
+        self.assertEqual(response.data['resumen']['tipos_tecnicas']['combinaciones_directas'], {
+            'total': 4, 'efectivas': 2, 'no_efectivas': 2
+        })
+        self.assertEqual(len(response.data['detalles']), 10)
+        self.assertEqual(response.data['paginacion']['total'], 12)
+        self.assertIsNotNone(response.data['paginacion']['siguiente'])
+        self.assertLessEqual(len(consultas), 12)
+        
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual([d['descripcion'] for d in response.data['detalles']], ['Combinación 10', 'Combinación 11'])
+        self.assertEqual(response.data['detalles'][0]['tecnicas_no_efectivas'][0]['tecnica'], 'ouchi_gari')
+
+
+class EstadisticasGeneralesAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de los totales del panel de estadísticas generales"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('estadisticacompetidor-generales')
+    
+    def test_totales_en_pocas_consultas(self):
+        """Prueba los totales calculados, incluido kata_te_waza, con consultas agregadas"""
+        with self.captureOnCommitCallbacks(execute=True):
+            AccionTashiWaza.objects.create(
+                combate=self.combate, competidor=self.competidor1, tipo='kata_te_waza', tecnica='seoi_nage',
+                puntuacion='waza_ari', tiempo=timedelta(seconds=20), registrado_por=self.usuario
+            )
+        
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['te_waza_total'], 1)
+        self.assertEqual(response.data['total_waza_ari'], 1)
+        self.assertEqual(response.data['competidores'], 2)
+        self.assertLessEqual(len(consultas), 10)
+    
+    def test_cache_invalidada_por_escrituras(self):
+        """Prueba que se sirve desde caché hasta que una escritura la invalida"""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        consultas_calculo = [q for q in consultas if 'combates_acciontashiwaza' in q['sql']]
+        self.assertEqual(consultas_calculo, [])
+        self.assertEqual(response.data['total_shido'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('combate-registrar-amonestacion', kwargs={'pk': self.combate.pk}),
+                {'competidor': self.competidor2.pk, 'tipo': 'shido', 'tiempo': '00:00:30'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        self.assertEqual(self.client.get(self.url).data['total_shido'], 1)
+
+    def test_version_cambia_otra_vez_al_confirmar(self):
+        """Prueba que lo cacheado durante la escritura, aún sin confirmar, no se sirve tras el commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Amonestacion.objects.create(
+                combate=self.combate, competidor=self.competidor1, tipo='shido',
+                tiempo=timedelta(seconds=10), registrado_por=self.usuario
+            )
+            clave_durante = agregados._clave_generales()
+            estadisticas_generales()
+
+        self.assertNotEqual(agregados._clave_generales(), clave_durante)
+
+
+class CacheRespuestasAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la caché versionada de las respuestas de lectura"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+    
+    def test_combate_cacheado_hasta_registrar_accion(self):
+        """Prueba que el detalle del combate se sirve de caché hasta que cambia"""
+        url = reverse('combate-detail', kwargs={'pk': self.combate.pk})
+        self.client.get(url)
+        
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in consultas if 'combates_combate' in q['sql']])
+        
+        self.registrar_tashi('sin_puntuacion')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['acciones_tashi_waza']), 1)
+    
+    def test_competidor_anidado_invalida(self):
+        """Prueba que editar un competidor invalida los detalles que lo anidan"""
+        url = reverse('competicion-detail', kwargs={'pk': self.competicion.pk})
+        self.client.get(url)
+        
+        self.competidor1.nombre = 'Nombre Corregido'
+        self.competidor1.save()
+        
+        response = self.client.get(url)
+        self.assertIn('Nombre Corregido', [c['nombre'] for c in response.data['competidores']])
+    
+    def test_inscripcion_invalida_competicion(self):
+        """Prueba que m2m_changed invalida la competición al inscribir competidores"""
+        url = reverse('competicion-detail', kwargs={'pk': self.competicion.pk})
+        self.assertEqual(len(self.client.get(url).data['competidores']), 2)
+        
+        nuevo = Competidor.objects.create(
+            identificacion_personal='90010200003', nombre='Competidor 3', genero='M',
+            division_peso='73', categoria='sub21_juvenil', anos_experiencia=1
+        )
+        nuevo.competiciones.add(self.competicion)
+        
+        self.assertEqual(len(self.client.get(url).data['competidores']), 3)
+    
+    def test_contadores_de_aciertos(self):
+        """Prueba que los aciertos y fallos se exponen a los administradores"""
+        url = reverse('estadisticas_detalladas_competidor', kwargs={'competidor_id': self.competidor1.pk})
+        self.client.get(url)
+        self.client.get(url)
+        
+        self.assertEqual(
+            self.client.get(reverse('estadisticas_cache')).status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.usuario.rol = 'administrador'
+        self.usuario.save()
+        response = self.client.get(reverse('estadisticas_cache'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['estadisticas_competidor'], {
+            'aciertos': 1, 'fallos': 1, 'tasa_aciertos': 50.0
+        })
+
+
+class ExportarPDFAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la descarga del reporte en PDF y de su caché en disco"""
+    
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        self.reporte = Reporte.objects.create(
+            titulo='Reporte PDF',
+            tipo='individual',
+            fecha_inicio=date.today() - timedelta(days=1),
+            fecha_fin=date.today() + timedelta(days=1)
+        )
+        self.reporte.competidores.add(self.competidor1, self.competidor2)
+        self.registrar_tashi('ippon')
+        self.reporte.generar_estadisticas()
+        self.url = reverse('reporte-exportar-pdf', kwargs={'pk': self.reporte.pk})
+    
+    def test_descarga_pdf(self):
+        """Prueba que el reporte se descarga como PDF adjunto"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('Reporte PDF.pdf', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+    
+    def test_titulo_con_marcado(self):
+        """Prueba que un título con caracteres de marcado XML se imprime sin romper el PDF"""
+        Reporte.objects.filter(pk=self.reporte.pk).update(titulo='Tom & Jerry <x')
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+    
+    def test_pdf_borrado_antes_de_abrirlo(self):
+        """Prueba que si otra descarga borra el archivo antes de abrirlo se sirve igualmente el PDF"""
+        guardar_pdf = pdf.guardar_pdf
+        
+        def guardar_y_sustituir(*args, **kwargs):
+            ruta = guardar_pdf(*args, **kwargs)
+            os.remove(ruta)
+            return ruta
+        
+        with mock.patch('estadisticas.pdf.guardar_pdf', side_effect=guardar_y_sustituir):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+    
+    def test_descargas_repetidas_usan_el_archivo(self):
+        """Prueba que sin cambios se reutiliza el archivo y se respeta If-None-Match"""
+        primera = self.client.get(self.url)
+        ruta = pdf.obtener_pdf(self.reporte)
+        modificado = os.path.getmtime(ruta)
+        
+        segunda = self.client.get(self.url)
+        self.assertEqual(primera['ETag'], segunda['ETag'])
+        self.assertEqual(os.path.getmtime(ruta), modificado)
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_cambios_en_estadisticas_renderizan_de_nuevo(self):
+        """Prueba que al cambiar las estadísticas se genera otro PDF y se borra el anterior"""
+        anterior = pdf.obtener_pdf(self.reporte)
+        etag = self.client.get(self.url)['ETag']
+        
+        self.reporte.estadisticas.filter(competidor=self.competidor2).update(shido=2)
+        response = self.client.get(self.url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertFalse(os.path.exists(anterior))
+        self.assertTrue(os.path.exists(pdf.obtener_pdf(self.reporte)))
+    
+    @override_settings(REPORTES_PDF_PROCESOS=2, REPORTES_EJECUCION_SINCRONA=True)
+    def test_exportar_lote_de_competicion(self):
+        """Prueba que el lote de una competición se encola, se renderiza en procesos y se descarga como ZIP"""
+        otro = Reporte.objects.create(
+            titulo='Reporte Comparativo', tipo='comparativo',
+            fecha_inicio=date.today(), fecha_fin=date.today()
+        )
+        otro.competidores.add(self.competidor2)
+        self.reporte.competiciones.add(self.competicion)
+        otro.competiciones.add(self.competicion)
+        url = reverse('reporte-exportar-lote')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'competicion': self.competicion.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        tarea = TareaLotePDF.objects.get(pk=response.data['id'])
+        self.assertEqual(response['Location'], f'/api/tareas-lote-pdf/{tarea.pk}/')
+        self.assertEqual((tarea.estado, tarea.procesados, tarea.total), ('completada', 2, 2))
+        
+        descarga = self.client.get(response.data['url_descarga'])
+        self.assertEqual(descarga.status_code, status.HTTP_200_OK)
+        self.assertEqual(descarga['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(descarga.streaming_content))) as archivo_zip:
+            nombres = archivo_zip.namelist()
+            self.assertEqual(len(nombres), 2)
+            self.assertTrue(all(archivo_zip.read(nombre).startswith(b'%PDF') for nombre in nombres))
+        
+        ruta = pdf.generar_lote(pdf.reportes_para_lote(self.competicion.pk), pdf.nombre_lote(self.competicion.pk))
+        self.assertTrue(os.path.exists(ruta))
+        self.assertEqual(len(os.listdir(os.path.dirname(ruta))), 1)
+    
+    def test_lote_sin_completar_no_se_descarga(self):
+        """Prueba que el ZIP de una tarea pendiente responde 409 y el de un lote sustituido 410"""
+        tarea = TareaLotePDF.objects.create(nombre='reportes_competicion1', total=1)
+        url = reverse('tarealotepdf-descargar', kwargs={'pk': tarea.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_409_CONFLICT)
+        
+        TareaLotePDF.objects.filter(pk=tarea.pk).update(estado='completada', archivo='lotes/no_existe.zip')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_410_GONE)
+    
+    def test_lote_renderiza_pdf_borrado(self):
+        """Prueba que si un PDF guardado desaparece antes de comprimir el lote, se vuelve a renderizar"""
+        ruta = pdf.obtener_pdf(self.reporte)
+        os.remove(ruta)
+        
+        ruta_zip = pdf.generar_lote(Reporte.objects.filter(pk=self.reporte.pk), procesos=1)
+        with zipfile.ZipFile(ruta_zip) as archivo_zip:
+            self.assertTrue(archivo_zip.read(archivo_zip.namelist()[0]).startswith(b'%PDF'))
+        self.assertTrue(os.path.exists(ruta))
+    
+    def test_exportar_lote_requiere_filtro(self):
+        """Prueba que el lote exige una competición o un rango de fechas válido"""
+        url = reverse('reporte-exportar-lote')
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(url, {'fecha_inicio': '01/01/2024'}, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        
+        manana = (date.today() + timedelta(days=5)).isoformat()
+        self.assertEqual(
+            self.client.post(url, {'fecha_inicio': manana}, format='json').status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertFalse(TareaLotePDF.objects.exists())
+
+
+class ExportacionAccionesAPITest(CombateEnCursoAPITestBase):
+    """Pruebas de la exportación en flujo de las acciones de los combates"""
+    
+    def setUp(self):
+        super().setUp()
+        self.registrar_tashi('waza_ari')
+        Amonestacion.objects.create(
+            combate=self.combate, competidor=self.competidor2, tipo='shido',
+            tiempo=timedelta(seconds=40), registrado_por=self.usuario
+        )
+        self.url = reverse('combate-exportar')
+    
+    def contenido(self, response):
+        return b''.join(response.streaming_content)
+    
+    def test_exportar_csv(self):
+        """Prueba que el CSV incluye una fila por acción con los nombres resueltos"""
+        response = self.client.get(self.url, {'competicion': self.competicion.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        
+        filas = list(csv.DictReader(io.StringIO(self.contenido(response).decode('utf-8'))))
+        self.assertEqual([fila['registro'] for fila in filas], ['tashi_waza', 'amonestacion'])
+        self.assertEqual(filas[0]['competidor'], 'Competidor 1')
+        self.assertEqual(filas[0]['competicion'], 'Torneo Eventos')
+        self.assertEqual(filas[0]['puntuacion'], 'waza_ari')
+        self.assertEqual(filas[1]['tipo'], 'shido')
+    
+    def test_exportar_ndjson_comprimido(self):
+        """Prueba que el NDJSON comprimido con gzip se puede descomprimir y leer"""
+        response = self.client.get(self.url, {'formato': 'ndjson', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        
+        lineas = gzip.decompress(self.contenido(response)).decode('utf-8').splitlines()
+        filas = [json.loads(linea) for linea in lineas]
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[0]['identificacion'], '90010200001')
+    
+    def test_consultas_independientes_del_numero_de_filas(self):
+        """Prueba que los nombres relacionados no se consultan fila por fila"""
+        for _ in range(5):
+            self.registrar_tashi('sin_puntuacion')
+        
+        with CaptureQueriesContext(connection) as consultas:
+            self.contenido(self.client.get(self.url, {'competicion': self.competicion.pk}))
+        acciones = [q for q in consultas if 'combates_acciontashiwaza' in q['sql']]
+        self.assertEqual(len(acciones), 1)
+        self.assertFalse([q for q in consultas if q['sql'].startswith('SELECT') and 'FROM "competidores_competidor"' in q['sql']])
+    
+    def test_filtro_por_fechas(self):
+        """Prueba que el rango de fechas excluye los combates fuera del período"""
+        manana = date.today() + timedelta(days=1)
+        response = self.client.get(self.url, {'fecha_inicio': manana.isoformat()})
+        self.assertEqual(self.contenido(response).decode('utf-8').count('\n'), 1)
+        
+        response = self.client.get(self.url, {'fecha_inicio': 'ayer'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_formato_y_competicion_invalidos(self):
+        """Prueba que un formato desconocido o una competición inexistente se rechazan"""
+        self.assertEqual(self.client.get(self.url, {'formato': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'competicion': 9999}).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_requiere_entrenador(self):
+        """Prueba que un usuario con rol competidor no puede exportar las acciones"""
+        competidor = Usuario.objects.create_user(
+            email='atleta@example.com', password='testpass123', nombre='Atleta', rol='competidor'
+        )
+        self.client.force_authenticate(user=competidor)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FinalizacionConcurrenteTest(TransactionTestCase):
+    """Pruebas de la finalización automática con varias mesas registrando a la vez"""
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas"""
+        self.usuario = Usuario.objects.create_user(
+            email='mesa@example.com', password='testpass123', nombre='Mesa de Control', rol='entrenador'
+        )
+        competicion = Competicion.objects.create(
+            nombre='Torneo Concurrente', fecha=date.today(), evento='combate_oficial', tipo='nacional',
+            cantidad_atletas=2, cantidad_combates_planificados=1, creado_por=self.usuario
+        )
+        self.competidor1 = Competidor.objects.create(
+            identificacion_personal='90010200011', nombre='Competidor 1', genero='M',
+            division_peso='73', categoria='sub21_juvenil', anos_experiencia=3
+        )
+        self.competidor2 = Competidor.objects.create(
+            identificacion_personal='90010200012', nombre='Competidor 2', genero='M',
+            division_peso='73', categoria='sub21_juvenil', anos_experiencia=2
+        )
+        competicion.competidores.add(self.competidor1, self.competidor2)
+        self.combate = Combate.objects.create(
+            competicion=competicion, competidor1=self.competidor1, competidor2=self.competidor2,
+            iniciado=True, registrado_por=self.usuario
+        )
+    
+    def registrar_en_paralelo(self, peticiones):
+        """Lanza cada petición en su propio hilo y conexión, todas a la vez"""
+        vista = CombateViewSet.as_view({'post': 'registrar_accion_tashi_waza'})
+        barrera = threading.Barrier(len(peticiones))
+        # SQLite no bloquea filas con select_for_update: este candado hace de bloqueo de la fila
+        # del combate, de modo que las peticiones llegan a la vez pero sus transacciones no se
+        # solapan y ninguna agota los reintentos por "database is locked"
+        escritura = threading.Lock()
+        respuestas = []
+        
+        def registrar(competidor, puntuacion):
+            try:
+                barrera.wait()
+                # SQLite bloquea ante escrituras simultáneas: se reintenta como hace el frontend
+                for _ in range(100):
+                    request = APIRequestFactory().post('/', {
+                        'competidor': competidor.pk, 'tipo': 'ashi_waza', 'tecnica': 'uchi_mata',
+                        'puntuacion': puntuacion, 'tiempo': '00:01:00'
+                    }, format='json')
+                    force_authenticate(request, user=self.usuario)
+                    try:
+                        with escritura:
+                            respuestas.append(vista(request, pk=self.combate.pk))
+                        break
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+        
+        hilos = [threading.Thread(target=registrar, args=peticion) for peticion in peticiones]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return respuestas
+    
+    def test_una_sola_finalizacion(self):
+        """Prueba que varios ippon simultáneos finalizan el combate exactamente una vez"""
+        peticiones = [(self.competidor1, 'ippon'), (self.competidor2, 'ippon')] * 4
+        respuestas = self.registrar_en_paralelo(peticiones)
+        
+        combate = Combate.objects.get(pk=self.combate.pk)
+        registradas = [r for r in respuestas if r.status_code == status.HTTP_201_CREATED]
+        finalizaciones = EventoCombate.objects.filter(combate=combate, tipo='finalizacion')
+        
+        self.assertTrue(combate.finalizado)
+        self.assertEqual(finalizaciones.count(), 1)
+        self.assertEqual(finalizaciones.get().competidor_id, combate.ganador_id)
+        self.assertEqual(len(respuestas), len(peticiones))
+        self.assertEqual(sum(r.data['resultado_combate'] is not None for r in registradas), 1)
+        # Ninguna acción aceptada se pierde del marcador
+        marcador = combate.obtener_marcador()
+        self.assertEqual(
+            marcador.ippon_competidor1 + marcador.ippon_competidor2,
+            AccionTashiWaza.objects.filter(combate=combate).count()
+        )
+        self.assertEqual(len(registradas), AccionTashiWaza.objects.filter(combate=combate).count())
+        # Ninguna acción aceptada queda registrada después de la finalización
+        secuencias = {
+            evento.datos['accion_id']: evento.secuencia
+            for evento in EventoCombate.objects.filter(combate=combate, tipo='accion')
+        }
+        finalizacion = finalizaciones.get().secuencia
+        for respuesta in registradas:
+            self.assertLess(secuencias[respuesta.data['accion']['id']], finalizacion)
@@ -6,10 +6,15 @@ from competiciones.views import CompeticionViewSet
 from combates.views import (
     CombateViewSet, AccionTashiWazaViewSet, 
     AccionNeWazaViewSet, AmonestacionViewSet,
-    obtener_puntuaciones_combate, verificar_finalizacion_automatica
+    obtener_puntuaciones_combate, verificar_finalizacion_automatica,
+    flujo_combate, flujo_competicion, token_flujo
+)
+from estadisticas.views import (
+    ReporteViewSet, EstadisticaCompetidorViewSet, TareaReporteViewSet, TareaLotePDFViewSet,
+    estadisticas_detalladas_competidor, tecnicas_frecuentes, tecnicas_competidor
 )
-from estadisticas.views import ReporteViewSet, EstadisticaCompetidorViewSet, estadisticas_detalladas_competidor
 from rest_framework.authtoken.views import obtain_auth_token
+from .views import estadisticas_cache
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet)
@@ -21,14 +26,22 @@ router.register(r'acciones-ne-waza', AccionNeWazaViewSet)
 router.register(r'amonestaciones', AmonestacionViewSet)
 router.register(r'reportes', ReporteViewSet)
 router.register(r'estadisticas', EstadisticaCompetidorViewSet)
+router.register(r'tareas-reporte', TareaReporteViewSet)
+router.register(r'tareas-lote-pdf', TareaLotePDFViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('rest_framework.urls')),
     path('token-auth/', obtain_auth_token, name='api_token_auth'),
+    path('cache/estadisticas/', estadisticas_cache, name='estadisticas_cache'),
     path('estadisticas/competidor/<int:competidor_id>/', estadisticas_detalladas_competidor, name='estadisticas_detalladas_competidor'),
     path('competidor/<int:competidor_id>/', estadisticas_detalladas_competidor, name='estadisticas-competidor'),
+    path('tecnicas/frecuencias/', tecnicas_frecuentes, name='tecnicas_frecuentes'),
+    path('tecnicas/competidor/<int:competidor_id>/', tecnicas_competidor, name='tecnicas_competidor'),
     # Cambiar a:
     path('combates/<int:combate_id>/puntuaciones/', obtener_puntuaciones_combate, name='obtener_puntuaciones_combate'),  # Remove 'views.' prefix
     path('combates/<int:combate_id>/verificar_finalizacion_automatica/', verificar_finalizacion_automatica, name='verificar_finalizacion_automatica'),
+    path('en_vivo/token/', token_flujo, name='token_flujo'),
+    path('combates/<int:combate_id>/en_vivo/', flujo_combate, name='flujo_combate'),
+    path('competiciones/<int:competicion_id>/en_vivo/', flujo_competicion, name='flujo_competicion'),
 ]
\ No newline at end of file
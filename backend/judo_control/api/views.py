@@ -1,3 +1,11 @@
-from django.shortcuts import render
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from usuarios.views import EsAdministrador
+from .cache import RESPUESTAS_CACHEADAS, estadisticas
 
-# Create your views here.
+
+@api_view(['GET'])
+@permission_classes([EsAdministrador])
+def estadisticas_cache(request):
+    """Aciertos y fallos de la caché de respuestas desde el arranque del backend de caché"""
+    return Response(estadisticas(RESPUESTAS_CACHEADAS))
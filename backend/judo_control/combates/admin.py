@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion
+from .models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, MarcadorCombate, EventoCombate
 
 class AccionTashiWazaInline(admin.TabularInline):
     model = AccionTashiWaza
@@ -22,4 +22,6 @@ class CombateAdmin(admin.ModelAdmin):
 admin.site.register(Combate, CombateAdmin)
 admin.site.register(AccionTashiWaza)
 admin.site.register(AccionNeWaza)
-admin.site.register(Amonestacion)
\ No newline at end of file
+admin.site.register(Amonestacion)
+admin.site.register(MarcadorCombate)
+admin.site.register(EventoCombate)
\ No newline at end of file
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class CombatesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'combates'
-    verbose_name = 'Combates'
\ No newline at end of file
+    verbose_name = 'Combates'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,76 @@
+"""
+Difusión en proceso de los eventos de combate hacia los marcadores en vivo.
+
+Un único difusor por proceso reparte cada EventoCombate confirmado entre las
+conexiones Server-Sent Events abiertas, sin depender de Redis ni de un broker
+externo. Las vistas síncronas publican desde su hilo y cada suscripción recibe
+el mensaje en la cola de su propio bucle de eventos.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión, filtrada por combate o competición"""
+    
+    def __init__(self, combate_id=None, competicion_id=None, capacidad=None):
+        self.combate_id = combate_id
+        self.competicion_id = competicion_id
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=capacidad or getattr(settings, 'SSE_CAPACIDAD_COLA', 256))
+        # Se activa cuando la cola se llena; a partir de ahí no se encola nada más
+        self.desbordada = False
+    
+    def acepta(self, mensaje):
+        if self.combate_id is not None:
+            return mensaje['combate'] == self.combate_id
+        return mensaje['competicion'] == self.competicion_id
+    
+    def entregar(self, mensaje):
+        # Se ejecuta dentro del bucle de la suscripción
+        if self.desbordada:
+            return
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se descartan este evento y los siguientes, y la conexión
+            # se cierra tras entregar los que ya estaban en cola. Al reconectar con
+            # Last-Event-ID (el último entregado) se reenvían los descartados
+            self.desbordada = True
+    
+    def agotada(self):
+        """La cola se desbordó y ya se entregó todo lo encolado antes del desborde"""
+        return self.desbordada and self.cola.empty()
+
+
+class Difusor:
+    """Reparte eventos a las suscripciones activas del proceso"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+    
+    def suscribir(self, combate_id=None, competicion_id=None):
+        suscripcion = Suscripcion(combate_id=combate_id, competicion_id=competicion_id)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+    
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+    
+    def publicar(self, mensaje):
+        with self._lock:
+            destinos = [s for s in self._suscripciones if s.acepta(mensaje)]
+        for suscripcion in destinos:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, mensaje)
+            except RuntimeError:
+                # El bucle de la conexión ya se cerró
+                self.cancelar(suscripcion)
+
+
+difusor = Difusor()
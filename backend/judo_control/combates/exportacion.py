@@ -0,0 +1,137 @@
+"""
+Exportación en flujo de las acciones registradas en los combates.
+
+Cada tipo de acción se recorre con `.values(...).iterator(chunk_size=...)`, resolviendo
+los nombres relacionados con JOINs en la misma consulta, y las filas se escriben una a
+una como CSV o NDJSON. La memoria usada no depende del número de filas exportadas.
+"""
+import csv
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+COLUMNAS = [
+    'registro', 'id', 'combate_id', 'fecha_combate', 'competicion_id', 'competicion',
+    'competidor_id', 'competidor', 'identificacion', 'tipo', 'tecnica', 'puntuacion',
+    'efectiva', 'accion_combinada_id', 'descripcion', 'duracion_control', 'tiempo',
+    'registrado_por',
+]
+
+# Campos comunes a todas las acciones, resueltos por JOIN
+_CAMPOS_COMUNES = {
+    'id': 'id',
+    'combate_id': 'combate_id',
+    'fecha_combate': 'combate__fecha_hora',
+    'competicion_id': 'combate__competicion_id',
+    'competicion': 'combate__competicion__nombre',
+    'competidor_id': 'competidor_id',
+    'competidor': 'competidor__nombre',
+    'identificacion': 'competidor__identificacion_personal',
+    'tiempo': 'tiempo',
+    'registrado_por': 'registrado_por__email',
+}
+
+# (registro, modelo, campos propios) en el orden en que se exportan
+_REGISTROS = [
+    ('tashi_waza', AccionTashiWaza, {
+        'tipo': 'tipo', 'tecnica': 'tecnica', 'puntuacion': 'puntuacion',
+        'efectiva': 'efectiva', 'accion_combinada_id': 'accion_combinada_id',
+    }),
+    ('ne_waza', AccionNeWaza, {
+        'tipo': 'tipo', 'tecnica': 'tecnica', 'puntuacion': 'puntuacion',
+        'efectiva': 'efectiva', 'accion_combinada_id': 'accion_combinada_id',
+        'duracion_control': 'duracion_control',
+    }),
+    ('combinada', AccionCombinada, {
+        'puntuacion': 'puntuacion', 'efectiva': 'efectiva', 'descripcion': 'descripcion',
+    }),
+    ('amonestacion', Amonestacion, {
+        'tipo': 'tipo',
+    }),
+]
+
+
+def filtrar_combates(competicion_id=None, fecha_inicio=None, fecha_fin=None):
+    """Filtro sobre las acciones para una competición y/o un rango de fechas del combate"""
+    filtro = {}
+    if competicion_id is not None:
+        filtro['combate__competicion_id'] = competicion_id
+    if fecha_inicio is not None:
+        filtro['combate__fecha_hora__date__gte'] = fecha_inicio
+    if fecha_fin is not None:
+        filtro['combate__fecha_hora__date__lte'] = fecha_fin
+    return filtro
+
+
+def filas_acciones(filtro):
+    """Genera un diccionario por acción con las COLUMNAS, sin cargar más de un lote a la vez"""
+    tamano_lote = settings.EXPORTACION_TAMANO_LOTE
+    for registro, modelo, campos in _REGISTROS:
+        columnas = {**_CAMPOS_COMUNES, **campos}
+        filas = (
+            modelo.objects.filter(**filtro)
+            .order_by('combate_id', 'id')
+            .values(*columnas.values())
+            .iterator(chunk_size=tamano_lote)
+        )
+        for fila in filas:
+            datos = dict.fromkeys(COLUMNAS)
+            datos['registro'] = registro
+            for columna, campo in columnas.items():
+                datos[columna] = fila[campo]
+            yield datos
+
+
+class _Eco:
+    """Pseudo-archivo que devuelve lo escrito, para usar csv.writer en un generador"""
+
+    def write(self, valor):
+        return valor
+
+
+def _como_csv(filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS)
+    for fila in filas:
+        yield escritor.writerow([_texto(fila[columna]) for columna in COLUMNAS])
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    return valor
+
+
+def _como_ndjson(filas):
+    for fila in filas:
+        yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _comprimir(fragmentos):
+    # wbits=31 produce un flujo gzip completo (cabecera y CRC)
+    compresor = zlib.compressobj(wbits=31)
+    for fragmento in fragmentos:
+        datos = compresor.compress(fragmento)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def exportar_acciones(filtro, formato='csv', gzip=False):
+    """Genera el contenido de la exportación en bytes, comprimido con gzip si se pide"""
+    serializar = _como_csv if formato == 'csv' else _como_ndjson
+    fragmentos = (texto.encode('utf-8') for texto in serializar(filas_acciones(filtro)))
+    if gzip:
+        return _comprimir(fragmentos)
+    return fragmentos
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from combates.models import Combate, MarcadorCombate
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los marcadores de combate a partir de las acciones registradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--combate', type=int, help='ID de un combate concreto')
+
+    def handle(self, *args, **options):
+        combates = Combate.objects.all()
+        if options['combate']:
+            combates = combates.filter(id=options['combate'])
+
+        total = 0
+        for combate in combates.iterator():
+            with transaction.atomic():
+                marcador, creado = MarcadorCombate.objects.get_or_create(combate=combate)
+                marcador.combate = combate
+                marcador.recalcular()
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Marcadores recalculados: {total}'))
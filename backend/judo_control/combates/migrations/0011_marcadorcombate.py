@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combates', '0010_combate_observaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcadorCombate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ippon_competidor1', models.PositiveIntegerField(default=0, verbose_name='Ippon competidor 1')),
+                ('waza_ari_competidor1', models.PositiveIntegerField(default=0, verbose_name='Waza-ari competidor 1')),
+                ('shidos_competidor1', models.PositiveIntegerField(default=0, verbose_name='Shidos competidor 1')),
+                ('hansoku_make_competidor1', models.PositiveIntegerField(default=0, verbose_name='Hansoku-make competidor 1')),
+                ('ippon_competidor2', models.PositiveIntegerField(default=0, verbose_name='Ippon competidor 2')),
+                ('waza_ari_competidor2', models.PositiveIntegerField(default=0, verbose_name='Waza-ari competidor 2')),
+                ('shidos_competidor2', models.PositiveIntegerField(default=0, verbose_name='Shidos competidor 2')),
+                ('hansoku_make_competidor2', models.PositiveIntegerField(default=0, verbose_name='Hansoku-make competidor 2')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('combate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='marcador', to='combates.combate')),
+            ],
+            options={
+                'verbose_name': 'Marcador de Combate',
+                'verbose_name_plural': 'Marcadores de Combate',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competidores', '0006_competidor_activo'),
+        ('combates', '0011_marcadorcombate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcadorcombate',
+            name='secuencia',
+            field=models.PositiveIntegerField(default=0, verbose_name='Último evento'),
+        ),
+        migrations.CreateModel(
+            name='EventoCombate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('secuencia', models.PositiveIntegerField(verbose_name='Secuencia')),
+                ('tipo', models.CharField(choices=[('accion', 'Acción registrada'), ('amonestacion', 'Amonestación'), ('inicio', 'Inicio del combate'), ('finalizacion', 'Finalización del combate'), ('correccion', 'Corrección')], max_length=20, verbose_name='Tipo')),
+                ('datos', models.JSONField(blank=True, default=dict, verbose_name='Datos del evento')),
+                ('fecha_hora', models.DateTimeField(auto_now_add=True, verbose_name='Fecha y hora')),
+                ('combate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='combates.combate')),
+                ('competidor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_combate', to='competidores.competidor')),
+            ],
+            options={
+                'verbose_name': 'Evento de Combate',
+                'verbose_name_plural': 'Eventos de Combate',
+                'ordering': ['combate', 'secuencia'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventocombate',
+            constraint=models.UniqueConstraint(fields=('combate', 'secuencia'), name='evento_combate_secuencia_unica'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combates', '0012_eventocombate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventocombate',
+            name='dispositivo',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Dispositivo de origen'),
+        ),
+        migrations.AddField(
+            model_name='eventocombate',
+            name='registrado_en_cliente',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Hora en el dispositivo'),
+        ),
+        migrations.AddField(
+            model_name='eventocombate',
+            name='secuencia_cliente',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Secuencia en el dispositivo'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventocombate',
+            constraint=models.UniqueConstraint(condition=models.Q(('secuencia_cliente__isnull', False)), fields=('combate', 'dispositivo', 'secuencia_cliente'), name='evento_combate_secuencia_cliente_unica'),
+        ),
+    ]
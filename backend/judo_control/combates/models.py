@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Value
 from django.core.exceptions import ValidationError
+from django.dispatch import Signal
 from competidores.models import Competidor
 from competiciones.models import Competicion
 from usuarios.models import Usuario
+from .difusion import difusor
 
 class Combate(models.Model):
     competicion = models.ForeignKey(Competicion, on_delete=models.CASCADE, related_name='combates')
@@ -50,66 +53,315 @@ class Combate(models.Model):
     def __str__(self):
         return f"{self.competidor1.nombre} vs {self.competidor2.nombre} - {self.competicion.nombre}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado persistido, para detectar inicio y finalización al guardar
+        instance._estado_guardado = (
+            instance.__dict__.get('iniciado'), instance.__dict__.get('finalizado'), instance.__dict__.get('ganador_id')
+        )
+        # Claves de los resúmenes diarios, para detectar un cambio de competición o de competidores
+        instance._claves_guardadas = instance.claves_resumen()
+        return instance
+    
+    def claves_resumen(self):
+        """(competicion_id, competidor1_id, competidor2_id) tal como están en memoria"""
+        return tuple(self.__dict__.get(campo) for campo in ('competicion_id', 'competidor1_id', 'competidor2_id'))
+    
+    def obtener_marcador(self):
+        """Devuelve el marcador del combate, reconstruyéndolo si aún no existe"""
+        marcador, creado = MarcadorCombate.objects.get_or_create(combate=self)
+        marcador.combate = self
+        if creado:
+            marcador.recalcular()
+        return marcador
+    
+    def registrar_acciones(self, registros, usuario, origenes=None):
+        """
+        Inserta en bloque acciones validadas y sin guardar, actualizando el marcador
+        y el registro de eventos con una sola escritura cada uno. `registros` es una
+        lista de (accion, tecnicas): las técnicas solo acompañan a una AccionCombinada.
+        `origenes`, alineado con `registros`, indica el dispositivo y la secuencia del
+        cliente de cada acción cuando llega desde una cola sin conexión.
+        """
+        ordenadas = []
+        origenes_eventos = []
+        for indice, (accion, tecnicas) in enumerate(registros):
+            ordenadas.append(accion)
+            ordenadas.extend(tecnicas)
+            origenes_eventos.append(origenes[indice] if origenes else None)
+            origenes_eventos.extend([None] * len(tecnicas))
+        if not ordenadas:
+            return []
+        
+        for accion in ordenadas:
+            accion.combate = self
+            accion.registrado_por = usuario
+            if isinstance(accion, AccionNeWaza):
+                accion.asignar_puntuacion()
+        
+        with transaction.atomic():
+            # Las combinaciones primero, para vincular sus técnicas por id
+            AccionCombinada.objects.bulk_create([a for a in ordenadas if isinstance(a, AccionCombinada)])
+            for accion, tecnicas in registros:
+                for tecnica in tecnicas:
+                    tecnica.accion_combinada = accion
+            for modelo in (AccionTashiWaza, AccionNeWaza, Amonestacion):
+                acciones = [a for a in ordenadas if isinstance(a, modelo)]
+                if acciones:
+                    modelo.objects.bulk_create(acciones)
+            
+            cambios = [MarcadorCombate.cambio(accion) for accion in ordenadas]
+            MarcadorCombate.aplicar(self, cambios)
+            EventoCombate.registrar_lote(self, [
+                (
+                    'amonestacion' if isinstance(accion, Amonestacion) else 'accion',
+                    accion.competidor_id,
+                    {**EventoCombate.datos_accion(accion), 'cambios': cambio}
+                )
+                for accion, cambio in zip(ordenadas, cambios)
+            ], origenes=origenes_eventos)
+        return ordenadas
+    
+    def contar_puntuaciones(self):
+        """Cuenta ippon, waza-ari, shidos y hansoku-make de ambos competidores en una sola consulta"""
+        cero = Value(0, output_field=models.IntegerField())
+        # Solo puntúan las técnicas efectivas que NO pertenecen a combinaciones
+        individuales = Q(efectiva=True, accion_combinada__isnull=True)
+        
+        def contar_tecnicas(acciones, filtro):
+            return acciones.filter(combate=self).order_by().values('competidor').annotate(
+                ippon=Count('id', filter=filtro & Q(puntuacion='ippon')),
+                waza_ari=Count('id', filter=filtro & Q(puntuacion='waza_ari')),
+                shidos=cero,
+                hansoku_make=cero,
+            ).values_list('competidor', 'ippon', 'waza_ari', 'shidos', 'hansoku_make')
+        
+        amonestaciones = Amonestacion.objects.filter(combate=self).order_by().values('competidor').annotate(
+            ippon=cero,
+            waza_ari=cero,
+            shidos=Count('id', filter=Q(tipo='shido')),
+            hansoku_make=Count('id', filter=Q(tipo='hansokumake')),
+        ).values_list('competidor', 'ippon', 'waza_ari', 'shidos', 'hansoku_make')
+        
+        consulta = contar_tecnicas(AccionTashiWaza.objects, individuales).union(
+            contar_tecnicas(AccionNeWaza.objects, individuales),
+            contar_tecnicas(AccionCombinada.objects, Q(efectiva=True)),
+            amonestaciones,
+            all=True
+        )
+        
+        conteos = {
+            competidor_id: dict.fromkeys(MarcadorCombate.CONTADORES, 0)
+            for competidor_id in (self.competidor1_id, self.competidor2_id)
+        }
+        for competidor_id, *valores in consulta:
+            if competidor_id in conteos:
+                for contador, valor in zip(MarcadorCombate.CONTADORES, valores):
+                    conteos[competidor_id][contador] += valor
+        return conteos
+    
+    def calcular_puntuaciones(self):
+        """Puntuaciones IJF de (competidor1, competidor2) leídas del marcador"""
+        marcador = self.obtener_marcador()
+        return marcador.puntuacion(self.competidor1_id), marcador.puntuacion(self.competidor2_id)
+    
     def calcular_puntuacion_competidor(self, competidor_id):
         """Calcula la puntuación actual de un competidor según reglas IJF"""
-        puntuacion = {
-            'ippon': 0,
-            'waza_ari': 0,
-            'shidos': 0,
-            'hansoku_make': False,
-            'ganador': False
+        return self.obtener_marcador().puntuacion(competidor_id)
+    
+    def finalizar(self, ganador=None, duracion=None, datos=None):
+        """
+        Finaliza el combate con un UPDATE condicionado a que siga abierto, de modo que
+        entre varias mesas o reintentos concurrentes solo uno lo consigue. Devuelve
+        False (y refresca la instancia) si otro proceso lo finalizó antes.
+        """
+        campos = {'finalizado': True, 'ganador': ganador}
+        if duracion is not None:
+            campos['duracion'] = duracion
+        
+        with transaction.atomic():
+            if not Combate.objects.filter(pk=self.pk, finalizado=False).update(**campos):
+                self.refresh_from_db(fields=['finalizado', 'ganador', 'duracion'])
+                self._estado_guardado = (self.iniciado, self.finalizado, self.ganador_id)
+                return False
+            
+            for campo, valor in campos.items():
+                setattr(self, campo, valor)
+            # update() no emite post_save: el evento se registra aquí
+            EventoCombate.registrar(
+                self, 'finalizacion',
+                competidor_id=self.ganador_id,
+                datos={
+                    'ganador': self.ganador_id,
+                    'duracion': str(self.duracion) if self.duracion else None,
+                    **(datos or {})
+                }
+            )
+            self._estado_guardado = (self.iniciado, self.finalizado, self.ganador_id)
+        return True
+    
+    def verificar_finalizacion_automatica(self):
+        """Verifica si el combate debe finalizar automáticamente según reglas IJF"""
+        if self.finalizado:
+            return None
+        
+        marcador = self.obtener_marcador()
+        lado = marcador.lado_ganador()
+        if lado is None:
+            return None
+        
+        perdedor = 'competidor2' if lado == 'competidor1' else 'competidor1'
+        ganador = getattr(self, lado)
+        puntuacion_ganador = marcador.puntuacion(ganador.id)
+        puntuacion_perdedor = marcador.puntuacion(getattr(self, f'{perdedor}_id'))
+        motivo = 'ippon' if puntuacion_ganador['ippon'] >= 1 else 'waza_ari_awasete_ippon' if puntuacion_ganador['waza_ari'] >= 2 else 'hansoku_make_oponente'
+        
+        if not self.finalizar(ganador, datos={'motivo': motivo}):
+            return None
+        
+        return {
+            'ganador': ganador.id,
+            'motivo': motivo,
+            'puntuacion_ganador': puntuacion_ganador,
+            'puntuacion_perdedor': puntuacion_perdedor
         }
+    
+    class Meta:
+        verbose_name = 'Combate'
+        verbose_name_plural = 'Combates'
+        ordering = ['-fecha_hora']
+
+class MarcadorCombate(models.Model):
+    """Marcador en vivo del combate, actualizado con cada acción registrada"""
+    combate = models.OneToOneField(Combate, on_delete=models.CASCADE, related_name='marcador')
+    ippon_competidor1 = models.PositiveIntegerField('Ippon competidor 1', default=0)
+    waza_ari_competidor1 = models.PositiveIntegerField('Waza-ari competidor 1', default=0)
+    shidos_competidor1 = models.PositiveIntegerField('Shidos competidor 1', default=0)
+    hansoku_make_competidor1 = models.PositiveIntegerField('Hansoku-make competidor 1', default=0)
+    ippon_competidor2 = models.PositiveIntegerField('Ippon competidor 2', default=0)
+    waza_ari_competidor2 = models.PositiveIntegerField('Waza-ari competidor 2', default=0)
+    shidos_competidor2 = models.PositiveIntegerField('Shidos competidor 2', default=0)
+    hansoku_make_competidor2 = models.PositiveIntegerField('Hansoku-make competidor 2', default=0)
+    secuencia = models.PositiveIntegerField('Último evento', default=0)
+    actualizado = models.DateTimeField('Última actualización', auto_now=True)
+    
+    CONTADORES = ('ippon', 'waza_ari', 'shidos', 'hansoku_make')
+    
+    def __str__(self):
+        return f"Marcador - {self.combate_id}"
+    
+    @staticmethod
+    def contribucion(accion):
+        """Contador del marcador que suma una acción, o None si no puntúa"""
+        if isinstance(accion, Amonestacion):
+            return {'shido': 'shidos', 'hansokumake': 'hansoku_make'}.get(accion.tipo)
         
-        # Contar acciones Tashi Waza INDIVIDUALES (que NO pertenecen a combinaciones)
-        acciones_tashi = self.acciones_tashi_waza.filter(
-            competidor_id=competidor_id, 
-            efectiva=True,
-            accion_combinada__isnull=True
-        )
-        for accion in acciones_tashi:
-            if accion.puntuacion == 'ippon':
-                puntuacion['ippon'] += 1
-            elif accion.puntuacion == 'waza_ari':
-                puntuacion['waza_ari'] += 1
+        # Las técnicas dentro de una combinación no puntúan por separado
+        if getattr(accion, 'accion_combinada_id', None) is not None:
+            return None
         
-        # Contar acciones Ne Waza INDIVIDUALES (que NO pertenecen a combinaciones)
-        acciones_ne = self.acciones_ne_waza.filter(
-            competidor_id=competidor_id, 
-            efectiva=True,
-            accion_combinada__isnull=True
-        )
-        for accion in acciones_ne:
-            if accion.puntuacion == 'ippon':
-                puntuacion['ippon'] += 1
-            elif accion.puntuacion == 'waza_ari':
-                puntuacion['waza_ari'] += 1
+        if accion.efectiva and accion.puntuacion in ('ippon', 'waza_ari'):
+            return accion.puntuacion
+        return None
+    
+    @classmethod
+    def cambio(cls, accion, signo=1):
+        """Cambio que una acción produce en el marcador, p. ej. {'competidor1': {'waza_ari': 1}}"""
+        contador = cls.contribucion(accion)
+        if contador is None:
+            return {}
         
-        # Contar SOLO las acciones combinadas efectivas (no las técnicas individuales dentro)
-        acciones_combinadas = self.acciones_combinadas.filter(competidor_id=competidor_id, efectiva=True)
-        for accion in acciones_combinadas:
-            if accion.puntuacion == 'ippon':
-                puntuacion['ippon'] += 1
-            elif accion.puntuacion == 'waza_ari':
-                puntuacion['waza_ari'] += 1
+        combate = accion.combate
+        if accion.competidor_id == combate.competidor1_id:
+            return {'competidor1': {contador: signo}}
+        if accion.competidor_id == combate.competidor2_id:
+            return {'competidor2': {contador: signo}}
+        return {}
+    
+    @classmethod
+    def aplicar(cls, combate, cambios):
+        """Suma en base de datos una lista de cambios con una sola actualización"""
+        totales = {}
+        for cambio in cambios:
+            for lado, contadores in cambio.items():
+                for contador, valor in contadores.items():
+                    campo = f'{contador}_{lado}'
+                    totales[campo] = totales.get(campo, 0) + valor
         
-        # Contar shidos
-        shidos = self.amonestaciones.filter(competidor_id=competidor_id, tipo='shido').count()
-        puntuacion['shidos'] = shidos
+        totales = {campo: valor for campo, valor in totales.items() if valor}
+        if totales:
+            cls.objects.filter(combate_id=combate.id).update(
+                **{campo: F(campo) + valor for campo, valor in totales.items()}
+            )
+    
+    @classmethod
+    def reservar_secuencias(cls, combate, cantidad=1):
+        """Reserva números de secuencia consecutivos para eventos del combate y devuelve el primero"""
+        if not cls.objects.filter(combate_id=combate.id).update(secuencia=F('secuencia') + cantidad):
+            combate.obtener_marcador()
+            cls.objects.filter(combate_id=combate.id).update(secuencia=F('secuencia') + cantidad)
+        ultima = cls.objects.filter(combate_id=combate.id).values_list('secuencia', flat=True).get()
+        return ultima - cantidad + 1
+    
+    def sumar(self, cambio):
+        """Aplica un cambio solo en memoria, p. ej. para simular acciones antes de guardarlas"""
+        for lado, contadores in cambio.items():
+            for contador, valor in contadores.items():
+                campo = f'{contador}_{lado}'
+                setattr(self, campo, getattr(self, campo) + valor)
+    
+    def lado_ganador(self):
+        """Lado que gana según el marcador ('competidor1'/'competidor2'), o None si sigue el combate"""
+        p1 = self.puntuacion(self.combate.competidor1_id)
+        p2 = self.puntuacion(self.combate.competidor2_id)
+        if p1['ganador'] or p2['hansoku_make']:
+            return 'competidor1'
+        if p2['ganador'] or p1['hansoku_make']:
+            return 'competidor2'
+        return None
+    
+    def contadores(self):
+        """Contadores actuales agrupados por lado"""
+        return {
+            lado: {contador: getattr(self, f'{contador}_{lado}') for contador in self.CONTADORES}
+            for lado in ('competidor1', 'competidor2')
+        }
+    
+    def recalcular(self):
+        """Reconstruye el marcador a partir de las tablas de acciones y devuelve el cambio"""
+        combate = self.combate
+        anteriores = self.contadores()
+        conteos = combate.contar_puntuaciones()
+        for lado, competidor_id in (('competidor1', combate.competidor1_id), ('competidor2', combate.competidor2_id)):
+            for contador, valor in conteos[competidor_id].items():
+                setattr(self, f'{contador}_{lado}', valor)
+        self.save(update_fields=[f'{contador}_{lado}' for lado in anteriores for contador in self.CONTADORES] + ['actualizado'])
         
-        # Verificar hansoku-make por acumulación de shidos (3 shidos = hansoku-make)
-        if shidos >= 3:
-            puntuacion['hansoku_make'] = True
-            puntuacion['ganador'] = False  # El oponente gana
-            return puntuacion
+        cambios = {}
+        for lado, valores in self.contadores().items():
+            diferencia = {c: v - anteriores[lado][c] for c, v in valores.items() if v != anteriores[lado][c]}
+            if diferencia:
+                cambios[lado] = diferencia
+        return cambios
+    
+    def puntuacion(self, competidor_id):
+        """Puntuación de un competidor según reglas IJF, leída del marcador"""
+        lado = 'competidor1' if competidor_id == self.combate.competidor1_id else 'competidor2'
+        shidos = getattr(self, f'shidos_{lado}')
+        puntuacion = {
+            'ippon': getattr(self, f'ippon_{lado}'),
+            'waza_ari': getattr(self, f'waza_ari_{lado}'),
+            'shidos': shidos,
+            'hansoku_make': False,
+            'ganador': False
+        }
         
-        # Verificar hansoku-make directo
-        hansoku_directo = self.amonestaciones.filter(competidor_id=competidor_id, tipo='hansokumake').exists()
-        if hansoku_directo:
+        # Hansoku-make por acumulación de shidos (3 shidos) o directo
+        if shidos >= 3 or getattr(self, f'hansoku_make_{lado}') > 0:
             puntuacion['hansoku_make'] = True
-            puntuacion['ganador'] = False
             return puntuacion
         
-        # Verificar condiciones de victoria
         # 1. Ippon directo
         if puntuacion['ippon'] >= 1:
             puntuacion['ganador'] = True
@@ -119,48 +371,12 @@ class Combate(models.Model):
         if puntuacion['waza_ari'] >= 2:
             puntuacion['ganador'] = True
             puntuacion['ippon'] = 1  # Se convierte en ippon
-            return puntuacion
         
         return puntuacion
     
-    def verificar_finalizacion_automatica(self):
-        """Verifica si el combate debe finalizar automáticamente según reglas IJF"""
-        if self.finalizado:
-            return None
-        
-        puntuacion_c1 = self.calcular_puntuacion_competidor(self.competidor1.id)
-        puntuacion_c2 = self.calcular_puntuacion_competidor(self.competidor2.id)
-        
-        # Verificar si competidor 1 gana
-        if puntuacion_c1['ganador'] or puntuacion_c2['hansoku_make']:
-            self.ganador = self.competidor1
-            self.finalizado = True
-            self.save()
-            return {
-                'ganador': self.competidor1.id,
-                'motivo': 'ippon' if puntuacion_c1['ippon'] >= 1 else 'waza_ari_awasete_ippon' if puntuacion_c1['waza_ari'] >= 2 else 'hansoku_make_oponente',
-                'puntuacion_ganador': puntuacion_c1,
-                'puntuacion_perdedor': puntuacion_c2
-            }
-        
-        # Verificar si competidor 2 gana
-        if puntuacion_c2['ganador'] or puntuacion_c1['hansoku_make']:
-            self.ganador = self.competidor2
-            self.finalizado = True
-            self.save()
-            return {
-                'ganador': self.competidor2.id,
-                'motivo': 'ippon' if puntuacion_c2['ippon'] >= 1 else 'waza_ari_awasete_ippon' if puntuacion_c2['waza_ari'] >= 2 else 'hansoku_make_oponente',
-                'puntuacion_ganador': puntuacion_c2,
-                'puntuacion_perdedor': puntuacion_c1
-            }
-        
-        return None
-    
     class Meta:
-        verbose_name = 'Combate'
-        verbose_name_plural = 'Combates'
-        ordering = ['-fecha_hora']
+        verbose_name = 'Marcador de Combate'
+        verbose_name_plural = 'Marcadores de Combate'
 
 class AccionCombinada(models.Model):
     combate = models.ForeignKey(Combate, on_delete=models.CASCADE, related_name='acciones_combinadas')
@@ -376,7 +592,8 @@ class AccionNeWaza(models.Model):
     tiempo = models.DurationField('Tiempo de la acción')
     registrado_por = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='acciones_ne_registradas')
     
-    def save(self, *args, **kwargs):
+    def asignar_puntuacion(self):
+        """Puntuación automática según el tipo de técnica (también antes de un bulk_create)"""
         # Lógica automática de puntuación para osaekomi
         if self.tipo == 'osaekomi_waza' and self.duracion_control:
             segundos = self.duracion_control.total_seconds()
@@ -389,7 +606,9 @@ class AccionNeWaza(models.Model):
         # Para shime y kansetsu, si es efectiva es ippon
         elif self.tipo in ['shime_waza', 'kansetsu_waza'] and self.efectiva:
             self.puntuacion = 'ippon'
-        
+    
+    def save(self, *args, **kwargs):
+        self.asignar_puntuacion()
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -417,4 +636,143 @@ class Amonestacion(models.Model):
     class Meta:
         verbose_name = 'Amonestación'
         verbose_name_plural = 'Amonestaciones'
-        ordering = ['-tiempo']
\ No newline at end of file
+        ordering = ['-tiempo']
+
+# Se emite con (combate, eventos) cada vez que se añaden eventos al registro de un combate
+eventos_registrados = Signal()
+
+
+class EventoCombate(models.Model):
+    """Registro inmutable y ordenado de lo ocurrido en un combate"""
+    TIPO_CHOICES = (
+        ('accion', 'Acción registrada'),
+        ('amonestacion', 'Amonestación'),
+        ('inicio', 'Inicio del combate'),
+        ('finalizacion', 'Finalización del combate'),
+        ('correccion', 'Corrección'),
+    )
+    
+    MODELOS_ACCION = {
+        'AccionTashiWaza': 'tashi_waza',
+        'AccionNeWaza': 'ne_waza',
+        'AccionCombinada': 'combinada',
+        'Amonestacion': 'amonestacion',
+    }
+    
+    combate = models.ForeignKey(Combate, on_delete=models.CASCADE, related_name='eventos')
+    secuencia = models.PositiveIntegerField('Secuencia')
+    tipo = models.CharField('Tipo', max_length=20, choices=TIPO_CHOICES)
+    competidor = models.ForeignKey(Competidor, on_delete=models.SET_NULL, null=True, blank=True, related_name='eventos_combate')
+    datos = models.JSONField('Datos del evento', default=dict, blank=True)
+    fecha_hora = models.DateTimeField('Fecha y hora', auto_now_add=True)
+    dispositivo = models.CharField('Dispositivo de origen', max_length=64, blank=True, default='')
+    secuencia_cliente = models.PositiveIntegerField('Secuencia en el dispositivo', null=True, blank=True)
+    registrado_en_cliente = models.DateTimeField('Hora en el dispositivo', null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.combate_id} #{self.secuencia} - {self.get_tipo_display()}"
+    
+    @staticmethod
+    def datos_accion(accion):
+        """Datos mínimos de una acción para reproducirla desde el registro"""
+        datos = {
+            'modelo': EventoCombate.MODELOS_ACCION[type(accion).__name__],
+            'accion_id': accion.id,
+            'tipo': accion.tipo if hasattr(accion, 'tipo') else None,
+            'tiempo': str(accion.tiempo),
+        }
+        for campo in ('tecnica', 'puntuacion', 'efectiva', 'accion_combinada_id', 'descripcion'):
+            if hasattr(accion, campo):
+                datos[campo] = getattr(accion, campo)
+        return datos
+    
+    @classmethod
+    def registrar(cls, combate, tipo, competidor_id=None, datos=None):
+        """Añade un evento al final del registro del combate"""
+        return cls.registrar_lote(combate, [(tipo, competidor_id, datos)])[0]
+    
+    @classmethod
+    def registrar_lote(cls, combate, eventos, origenes=None):
+        """
+        Añade varios eventos (tipo, competidor_id, datos) con secuencias consecutivas.
+        `origenes` opcional, alineado con `eventos`: campos de origen del cliente de cada uno.
+        """
+        origenes = origenes or [None] * len(eventos)
+        primera = MarcadorCombate.reservar_secuencias(combate, len(eventos))
+        creados = cls.objects.bulk_create([
+            cls(
+                combate=combate,
+                secuencia=primera + indice,
+                tipo=tipo,
+                competidor_id=competidor_id,
+                datos=datos or {},
+                **(origen or {})
+            )
+            for indice, ((tipo, competidor_id, datos), origen) in enumerate(zip(eventos, origenes))
+        ])
+        
+        eventos_registrados.send(sender=cls, combate=combate, eventos=creados)
+        
+        # Los marcadores en vivo solo reciben eventos confirmados
+        def publicar():
+            for evento in creados:
+                difusor.publicar(evento.mensaje())
+        transaction.on_commit(publicar)
+        return creados
+    
+    def mensaje(self):
+        """Representación del evento para los marcadores en vivo"""
+        return {
+            'id': self.id,
+            'combate': self.combate_id,
+            'competicion': self.combate.competicion_id,
+            'secuencia': self.secuencia,
+            'tipo': self.tipo,
+            'competidor': self.competidor_id,
+            'datos': self.datos,
+            'fecha_hora': self.fecha_hora.isoformat(),
+        }
+    
+    @classmethod
+    def reproducir(cls, combate, hasta=None):
+        """Reconstruye el estado del combate recorriendo su registro de eventos"""
+        estado = {
+            'secuencia': 0,
+            'iniciado': False,
+            'finalizado': False,
+            'ganador': None,
+            'marcador': {lado: dict.fromkeys(MarcadorCombate.CONTADORES, 0) for lado in ('competidor1', 'competidor2')},
+        }
+        eventos = cls.objects.filter(combate=combate).order_by('secuencia')
+        if hasta is not None:
+            eventos = eventos.filter(secuencia__lte=hasta)
+        
+        for secuencia, tipo, datos in eventos.values_list('secuencia', 'tipo', 'datos'):
+            estado['secuencia'] = secuencia
+            if tipo == 'inicio':
+                estado['iniciado'] = True
+            elif tipo == 'finalizacion':
+                estado['finalizado'] = True
+                estado['ganador'] = datos.get('ganador')
+            elif 'finalizado' in datos:
+                estado['finalizado'] = datos['finalizado']
+                estado['ganador'] = datos.get('ganador')
+            
+            for lado, cambios in datos.get('cambios', {}).items():
+                for contador, valor in cambios.items():
+                    estado['marcador'][lado][contador] += valor
+        return estado
+    
+    class Meta:
+        verbose_name = 'Evento de Combate'
+        verbose_name_plural = 'Eventos de Combate'
+        ordering = ['combate', 'secuencia']
+        constraints = [
+            models.UniqueConstraint(fields=['combate', 'secuencia'], name='evento_combate_secuencia_unica'),
+            models.UniqueConstraint(
+                fields=['combate', 'dispositivo', 'secuencia_cliente'],
+                condition=models.Q(secuencia_cliente__isnull=False),
+                name='evento_combate_secuencia_cliente_unica'
+            ),
+        ]
+
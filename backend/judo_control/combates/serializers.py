@@ -5,7 +5,19 @@ from competidores.serializers import CompetidorSerializer
 import re
 from datetime import timedelta
 
+class CompetidorDelCombateField(serializers.PrimaryKeyRelatedField):
+    """Resuelve el competidor con los ya cargados del combate del contexto"""
+    
+    def to_internal_value(self, data):
+        combate = self.context.get('combate')
+        if combate:
+            for competidor in (combate.competidor1, combate.competidor2):
+                if str(competidor.pk) == str(data):
+                    return competidor
+        return super().to_internal_value(data)
+
 class AccionTashiWazaSerializer(serializers.ModelSerializer):
+    competidor = CompetidorDelCombateField(queryset=Competidor.objects.all())
     es_parte_combinacion = serializers.SerializerMethodField()
     
     class Meta:
@@ -42,6 +54,7 @@ class AccionTashiWazaSerializer(serializers.ModelSerializer):
         return value
 
 class AccionNeWazaSerializer(serializers.ModelSerializer):
+    competidor = CompetidorDelCombateField(queryset=Competidor.objects.all())
     es_parte_combinacion = serializers.SerializerMethodField()
     
     class Meta:
@@ -90,6 +103,8 @@ class AccionNeWazaSerializer(serializers.ModelSerializer):
         return data
 
 class AmonestacionSerializer(serializers.ModelSerializer):
+    competidor = CompetidorDelCombateField(queryset=Competidor.objects.all())
+    
     class Meta:
         model = Amonestacion
         fields = ['id', 'combate', 'competidor', 'tipo', 'tiempo']
@@ -128,6 +143,8 @@ class AmonestacionSerializer(serializers.ModelSerializer):
 
 # MOVER AccionCombinadaSerializer ANTES de CombateSerializer
 class AccionCombinadaSerializer(serializers.ModelSerializer):
+    competidor = CompetidorDelCombateField(queryset=Competidor.objects.all())
+    
     class Meta:
         model = AccionCombinada
         exclude = ['combate', 'registrado_por']
@@ -0,0 +1,77 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    Combate, MarcadorCombate, EventoCombate,
+    AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion
+)
+
+MODELOS_ACCION = (AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion)
+
+
+@receiver(post_save, sender=Combate)
+def registrar_estado_combate(sender, instance, created, **kwargs):
+    """Crea el marcador y registra inicio, finalización o su corrección"""
+    if created:
+        MarcadorCombate.objects.get_or_create(combate=instance)
+    
+    iniciado, finalizado, ganador_id = getattr(instance, '_estado_guardado', (False, False, None))
+    
+    if instance.iniciado and not iniciado:
+        EventoCombate.registrar(instance, 'inicio')
+    
+    if instance.finalizado and not finalizado:
+        EventoCombate.registrar(
+            instance, 'finalizacion',
+            competidor_id=instance.ganador_id,
+            datos={
+                'ganador': instance.ganador_id,
+                'duracion': str(instance.duracion) if instance.duracion else None
+            }
+        )
+    elif finalizado and (not instance.finalizado or instance.ganador_id != ganador_id):
+        EventoCombate.registrar(
+            instance, 'correccion',
+            competidor_id=instance.ganador_id,
+            datos={'finalizado': instance.finalizado, 'ganador': instance.ganador_id}
+        )
+    
+    instance._estado_guardado = (instance.iniciado, instance.finalizado, instance.ganador_id)
+
+
+def registrar_accion_guardada(sender, instance, created, **kwargs):
+    """Mantiene el marcador y el registro de eventos al insertar o editar una acción"""
+    if created:
+        cambios = MarcadorCombate.cambio(instance)
+        MarcadorCombate.aplicar(instance.combate, [cambios])
+        tipo = 'amonestacion' if isinstance(instance, Amonestacion) else 'accion'
+    else:
+        # Una corrección puede cambiar competidor, puntuación o efectividad
+        cambios = instance.combate.obtener_marcador().recalcular()
+        tipo = 'correccion'
+    
+    EventoCombate.registrar(
+        instance.combate, tipo,
+        competidor_id=instance.competidor_id,
+        datos={**EventoCombate.datos_accion(instance), 'cambios': cambios}
+    )
+
+
+def registrar_accion_eliminada(sender, instance, origin=None, **kwargs):
+    """Descuenta del marcador una acción eliminada y registra la corrección"""
+    # Si se elimina el combate (o un competidor) el marcador y el registro desaparecen con él
+    modelo_origen = getattr(origin, 'model', type(origin))
+    if modelo_origen not in MODELOS_ACCION:
+        return
+    
+    cambios = MarcadorCombate.cambio(instance, signo=-1)
+    MarcadorCombate.aplicar(instance.combate, [cambios])
+    EventoCombate.registrar(
+        instance.combate, 'correccion',
+        competidor_id=instance.competidor_id,
+        datos={**EventoCombate.datos_accion(instance), 'cambios': cambios, 'eliminada': True}
+    )
+
+
+for modelo in MODELOS_ACCION:
+    post_save.connect(registrar_accion_guardada, sender=modelo, dispatch_uid=f'accion_guardada_{modelo.__name__}')
+    post_delete.connect(registrar_accion_eliminada, sender=modelo, dispatch_uid=f'accion_eliminada_{modelo.__name__}')
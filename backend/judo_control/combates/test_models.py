@@ -1,7 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from combates.models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion
+from combates.models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada, MarcadorCombate, EventoCombate
 from competiciones.models import Competicion
 from competidores.models import Competidor
 from datetime import date, timedelta, datetime
@@ -304,4 +304,228 @@ class AmonestacionModelTest(TestCase):
                 registrado_por=self.usuario
             )
             self.assertEqual(amonestacion.tipo, tipo)
-            amonestacion.delete()
\ No newline at end of file
+            amonestacion.delete()
+
+
+class CombateIniciadoTestBase(TestCase):
+    """Base con un combate iniciado entre dos competidores inscritos"""
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas"""
+        self.usuario = Usuario.objects.create_user(
+            email='marcador@example.com',
+            nombre='Entrenador Marcador',
+            rol='entrenador'
+        )
+        
+        self.competicion = Competicion.objects.create(
+            nombre='Torneo Marcador',
+            fecha=date.today(),
+            evento='combate_oficial',
+            tipo='nacional',
+            cantidad_atletas=4,
+            cantidad_combates_planificados=4,
+            creado_por=self.usuario
+        )
+        
+        self.competidor1 = Competidor.objects.create(
+            identificacion_personal='90010100001',
+            nombre='Competidor 1',
+            genero='M',
+            division_peso='73',
+            categoria='sub21_juvenil',
+            anos_experiencia=3
+        )
+        
+        self.competidor2 = Competidor.objects.create(
+            identificacion_personal='90010100002',
+            nombre='Competidor 2',
+            genero='M',
+            division_peso='73',
+            categoria='sub21_juvenil',
+            anos_experiencia=4
+        )
+        
+        self.competicion.competidores.add(self.competidor1, self.competidor2)
+        
+        self.combate = Combate.objects.create(
+            competicion=self.competicion,
+            competidor1=self.competidor1,
+            competidor2=self.competidor2,
+            iniciado=True,
+            registrado_por=self.usuario
+        )
+    
+    def registrar_tashi(self, competidor, puntuacion, **kwargs):
+        return AccionTashiWaza.objects.create(
+            combate=self.combate,
+            competidor=competidor,
+            tipo='ashi_waza',
+            tecnica='uchi_mata',
+            puntuacion=puntuacion,
+            tiempo=timedelta(seconds=30),
+            registrado_por=self.usuario,
+            **kwargs
+        )
+
+
+class MarcadorCombateTest(CombateIniciadoTestBase):
+    """Pruebas del marcador incremental de un combate"""
+    
+    def test_marcador_se_crea_con_el_combate(self):
+        """Prueba que cada combate nace con su marcador a cero"""
+        marcador = MarcadorCombate.objects.get(combate=self.combate)
+        self.assertEqual(marcador.waza_ari_competidor1, 0)
+        self.assertEqual(marcador.shidos_competidor2, 0)
+    
+    def test_insercion_actualiza_marcador(self):
+        """Prueba que registrar acciones suma en el marcador"""
+        self.registrar_tashi(self.competidor1, 'waza_ari')
+        self.registrar_tashi(self.competidor1, 'sin_puntuacion')
+        Amonestacion.objects.create(
+            combate=self.combate, competidor=self.competidor2, tipo='shido',
+            tiempo=timedelta(seconds=40), registrado_por=self.usuario
+        )
+        
+        marcador = self.combate.obtener_marcador()
+        self.assertEqual(marcador.waza_ari_competidor1, 1)
+        self.assertEqual(marcador.shidos_competidor2, 1)
+        self.assertEqual(marcador.puntuacion(self.competidor1.id)['waza_ari'], 1)
+    
+    def test_edicion_y_eliminacion_actualizan_marcador(self):
+        """Prueba que corregir o eliminar una acción ajusta el marcador"""
+        accion = self.registrar_tashi(self.competidor1, 'waza_ari')
+        accion.puntuacion = 'ippon'
+        accion.save()
+        
+        marcador = self.combate.obtener_marcador()
+        self.assertEqual(marcador.waza_ari_competidor1, 0)
+        self.assertEqual(marcador.ippon_competidor1, 1)
+        
+        accion.delete()
+        marcador = self.combate.obtener_marcador()
+        self.assertEqual(marcador.ippon_competidor1, 0)
+    
+    def test_tecnicas_de_combinacion_no_puntuan_por_separado(self):
+        """Prueba que solo la combinación puntúa, no sus técnicas"""
+        combinacion = AccionCombinada.objects.create(
+            combate=self.combate, competidor=self.competidor2, descripcion='Ashi waza (A)',
+            tiempo=timedelta(seconds=50), efectiva=True, puntuacion='waza_ari',
+            registrado_por=self.usuario
+        )
+        self.registrar_tashi(self.competidor2, 'waza_ari', accion_combinada=combinacion)
+        
+        marcador = self.combate.obtener_marcador()
+        self.assertEqual(marcador.waza_ari_competidor2, 1)
+    
+    def test_recalcular_reconstruye_marcador(self):
+        """Prueba que recalcular coincide con las tablas de acciones"""
+        self.registrar_tashi(self.competidor1, 'waza_ari')
+        self.registrar_tashi(self.competidor1, 'waza_ari')
+        MarcadorCombate.objects.filter(combate=self.combate).update(waza_ari_competidor1=0)
+        
+        marcador = self.combate.obtener_marcador()
+        marcador.recalcular()
+        
+        puntuacion = marcador.puntuacion(self.competidor1.id)
+        self.assertEqual(marcador.waza_ari_competidor1, 2)
+        self.assertTrue(puntuacion['ganador'])
+        self.assertEqual(puntuacion['ippon'], 1)
+    
+    def test_finalizacion_automatica_lee_marcador(self):
+        """Prueba que el ippon finaliza el combate automáticamente"""
+        self.registrar_tashi(self.competidor2, 'ippon')
+        
+        resultado = self.combate.verificar_finalizacion_automatica()
+        
+        self.assertEqual(resultado['ganador'], self.competidor2.id)
+        self.assertEqual(resultado['motivo'], 'ippon')
+        self.assertTrue(self.combate.finalizado)
+    
+    def test_contar_puntuaciones_usa_una_consulta(self):
+        """Prueba que el conteo de ambos competidores no crece con las acciones"""
+        for cantidad in (1, 15):
+            for _ in range(cantidad):
+                self.registrar_tashi(self.competidor1, 'sin_puntuacion')
+                Amonestacion.objects.create(
+                    combate=self.combate, competidor=self.competidor2, tipo='shido',
+                    tiempo=timedelta(seconds=40), registrado_por=self.usuario
+                )
+            with self.assertNumQueries(1):
+                conteos = self.combate.contar_puntuaciones()
+        
+        self.assertEqual(conteos[self.competidor2.id]['shidos'], 16)
+        self.assertEqual(conteos[self.competidor1.id]['waza_ari'], 0)
+    
+    def test_calcular_puntuaciones_coste_constante(self):
+        """Prueba que puntuar ambos competidores cuesta lo mismo con 1 o 20 acciones"""
+        self.combate.obtener_marcador()
+        for cantidad in (1, 20):
+            for _ in range(cantidad):
+                self.registrar_tashi(self.competidor2, 'sin_puntuacion')
+            with self.assertNumQueries(1):
+                puntuacion_c1, puntuacion_c2 = self.combate.calcular_puntuaciones()
+        
+        self.assertFalse(puntuacion_c1['ganador'])
+        self.assertEqual(puntuacion_c2['waza_ari'], 0)
+
+
+class EventoCombateTest(CombateIniciadoTestBase):
+    """Pruebas del registro de eventos de un combate"""
+    
+    def test_secuencia_monotona(self):
+        """Prueba que los eventos se numeran consecutivamente por combate"""
+        self.registrar_tashi(self.competidor1, 'waza_ari')
+        Amonestacion.objects.create(
+            combate=self.combate, competidor=self.competidor2, tipo='shido',
+            tiempo=timedelta(seconds=40), registrado_por=self.usuario
+        )
+        
+        eventos = list(self.combate.eventos.values_list('secuencia', 'tipo'))
+        self.assertEqual(eventos, [(1, 'inicio'), (2, 'accion'), (3, 'amonestacion')])
+        self.assertEqual(self.combate.obtener_marcador().secuencia, 3)
+    
+    def test_reproducir_registro_reconstruye_estado(self):
+        """Prueba que reproducir los eventos coincide con el marcador y el combate"""
+        accion = self.registrar_tashi(self.competidor1, 'waza_ari')
+        self.registrar_tashi(self.competidor2, 'waza_ari')
+        accion.puntuacion = 'sin_puntuacion'
+        accion.save()
+        self.registrar_tashi(self.competidor2, 'ippon').delete()
+        self.registrar_tashi(self.competidor2, 'waza_ari')
+        self.combate.verificar_finalizacion_automatica()
+        
+        estado = EventoCombate.reproducir(self.combate)
+        
+        self.assertEqual(estado['marcador'], self.combate.obtener_marcador().contadores())
+        self.assertEqual(estado['marcador']['competidor2']['waza_ari'], 2)
+        self.assertTrue(estado['iniciado'])
+        self.assertTrue(estado['finalizado'])
+        self.assertEqual(estado['ganador'], self.competidor2.id)
+        self.assertEqual(
+            list(self.combate.eventos.values_list('tipo', flat=True)),
+            ['inicio', 'accion', 'accion', 'correccion', 'accion', 'correccion', 'accion', 'finalizacion']
+        )
+
+
+
+class FinalizacionCombateTest(CombateIniciadoTestBase):
+    """Pruebas de la finalización condicionada del combate"""
+    
+    def test_instancia_desactualizada_no_finaliza_de_nuevo(self):
+        """Prueba que dos mesas con el combate cargado solo finalizan una vez y no pisan al ganador"""
+        mesa_a = Combate.objects.get(pk=self.combate.pk)
+        mesa_b = Combate.objects.get(pk=self.combate.pk)
+        self.registrar_tashi(self.competidor1, 'ippon')
+        
+        resultado_a = mesa_a.verificar_finalizacion_automatica()
+        resultado_b = mesa_b.verificar_finalizacion_automatica()
+        finalizado_b = mesa_b.finalizar(self.competidor2)
+        
+        self.assertEqual(resultado_a['ganador'], self.competidor1.id)
+        self.assertIsNone(resultado_b)
+        self.assertFalse(finalizado_b)
+        self.assertTrue(mesa_b.finalizado)
+        self.assertEqual(mesa_b.ganador_id, self.competidor1.id)
+        self.assertEqual(Combate.objects.get(pk=self.combate.pk).ganador_id, self.competidor1.id)
+        self.assertEqual(self.combate.eventos.filter(tipo='finalizacion').count(), 1)
@@ -2,23 +2,231 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada
+from django.db import IntegrityError, transaction
+from .models import (
+    Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada,
+    MarcadorCombate, EventoCombate
+)
+from .difusion import difusor
+from .exportacion import FORMATOS, exportar_acciones, filtrar_combates
 from .serializers import (
     CombateSerializer, AccionTashiWazaSerializer, 
     AccionNeWazaSerializer, AmonestacionSerializer, AccionCombinadaSerializer
 )
 from usuarios.views import EsEntrenador
+from api.idempotencia import idempotente
+from api.cache import respuesta_cacheada, TODAS
 from competiciones.models import Competicion
+from rest_framework.authtoken.models import Token
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import timedelta
+import copy
+import asyncio
+import json
 import re
+import secrets
+
+# Mapas para generar la descripción de una combinación
+CODIGOS_CATEGORIA = {
+    'ashi_waza': 'A', 'koshi_waza': 'K', 'kata_te_waza': 'KTW',
+    'ma_sutemi_waza': 'MS', 'yoko_sutemi_waza': 'YS',
+    'osaekomi_waza': 'O', 'shime_waza': 'S', 'kansetsu_waza': 'KN'
+}
+
+NOMBRES_CATEGORIA = {
+    'ashi_waza': 'Ashi waza', 'koshi_waza': 'Koshi waza', 'kata_te_waza': 'Kata waza',
+    'ma_sutemi_waza': 'Ma sutemi waza', 'yoko_sutemi_waza': 'Yoko sutemi waza',
+    'osaekomi_waza': 'Osaekomi waza', 'shime_waza': 'Shime waza', 'kansetsu_waza': 'Kansetsu waza'
+}
+
+SERIALIZADORES_REGISTRO = {
+    'tashi_waza': AccionTashiWazaSerializer,
+    'ne_waza': AccionNeWazaSerializer,
+    'amonestacion': AmonestacionSerializer,
+}
+
+def _validar_accion(serializer_class, combate, datos):
+    """Valida una acción y la devuelve sin guardar junto a sus errores"""
+    serializer = serializer_class(data=datos, context={'combate': combate})
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return serializer_class.Meta.model(**serializer.validated_data), None
+
+def _fecha_cliente(valor):
+    """Fecha y hora enviada por un dispositivo, o None si no es válida"""
+    try:
+        fecha = parse_datetime(str(valor))
+    except ValueError:
+        return None
+    if fecha is not None and timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+def _preparar_combinacion(combate, datos):
+    """
+    Valida una combinación y todas sus técnicas sin guardar nada.
+    Devuelve ((combinada, tecnicas), estadisticas, errores).
+    """
+    acciones = datos.get('acciones', [])
+    resultado_final = datos.get('resultado_final', 'sin_puntuacion')
+    
+    if not acciones:
+        return None, None, {'acciones': ['No se proporcionaron acciones para la combinación']}
+    
+    categorias_usadas = []
+    tecnicas_detalle = []
+    tecnicas_efectivas = 0
+    tecnicas_fallidas = 0
+    
+    for accion in acciones:
+        categoria = accion.get('categoria', '')
+        tecnica = accion.get('tecnica', '')
+        
+        if categoria and categoria not in categorias_usadas:
+            categorias_usadas.append(categoria)
+        
+        if tecnica:
+            tecnicas_detalle.append(tecnica)
+        
+        if accion.get('efectiva', True) and accion.get('puntuacion', 'sin_puntuacion') != 'sin_puntuacion':
+            tecnicas_efectivas += 1
+        else:
+            tecnicas_fallidas += 1
+    
+    if not categorias_usadas:
+        return None, None, {'acciones': ['No se encontraron categorías válidas en las acciones']}
+    
+    nombres_categorias = [NOMBRES_CATEGORIA.get(cat, cat) for cat in categorias_usadas]
+    codigos_categorias = [CODIGOS_CATEGORIA.get(cat, cat[:2].upper()) for cat in categorias_usadas]
+    
+    combinada, errores_combinada = _validar_accion(AccionCombinadaSerializer, combate, {
+        'competidor': datos.get('competidor'),
+        'descripcion': f"{' - '.join(nombres_categorias)} ({'-'.join(codigos_categorias)})",
+        'descripcion_detallada': f"Técnicas: {', '.join(tecnicas_detalle)} | Efectivas: {tecnicas_efectivas}/{len(acciones)}",
+        'tiempo': datos.get('tiempo'),
+        'efectiva': resultado_final != 'sin_puntuacion',
+        'puntuacion': resultado_final
+    })
+    errores = dict(errores_combinada or {})
+    
+    # Técnicas individuales, manteniendo sus puntuaciones reales
+    tecnicas = []
+    for clave, serializer_class in (('acciones_tashi', AccionTashiWazaSerializer), ('acciones_ne', AccionNeWazaSerializer)):
+        errores_tecnicas = {}
+        for indice, datos_tecnica in enumerate(datos.get(clave, [])):
+            tecnica, errores_tecnica = _validar_accion(serializer_class, combate, datos_tecnica)
+            if errores_tecnica:
+                errores_tecnicas[indice] = errores_tecnica
+            else:
+                tecnicas.append(tecnica)
+        if errores_tecnicas:
+            errores[clave] = errores_tecnicas
+    
+    if errores:
+        return None, None, errores
+    
+    estadisticas = {
+        'tecnicas_totales': len(acciones),
+        'tecnicas_efectivas': tecnicas_efectivas,
+        'tecnicas_fallidas': tecnicas_fallidas,
+        'resultado_combinacion': resultado_final
+    }
+    return (combinada, tecnicas), estadisticas, None
+
+def _secuencias_recibidas(combate, dispositivo, secuencias):
+    """Secuencias de un dispositivo que ya están registradas en el combate"""
+    return set(EventoCombate.objects.filter(
+        combate=combate, dispositivo=dispositivo, secuencia_cliente__in=secuencias
+    ).values_list('secuencia_cliente', flat=True))
+
+def _planificar_sincronizacion(combate, dispositivo, pendientes):
+    """
+    Valida las acciones pendientes de un dispositivo, ordenadas por secuencia, sin guardar
+    nada. Devuelve (resultados, registros, origenes) para `Combate.registrar_acciones`.
+    """
+    resultados = []
+    recibidas = _secuencias_recibidas(combate, dispositivo, [entrada['secuencia_cliente'] for entrada in pendientes])
+    
+    # Simular el marcador en memoria para detectar la finalización a mitad de la cola
+    marcador = copy.copy(combate.obtener_marcador())
+    finalizado = combate.finalizado
+    registros = []
+    origenes = []
+    
+    for entrada in pendientes:
+        secuencia = entrada['secuencia_cliente']
+        resultado = {'secuencia_cliente': secuencia}
+        resultados.append(resultado)
+        
+        if secuencia in recibidas:
+            resultado['estado'] = 'duplicada'
+            continue
+        recibidas.add(secuencia)
+        
+        if finalizado:
+            resultado['estado'] = 'conflicto'
+            resultado['motivo'] = 'El combate ya estaba finalizado'
+            continue
+        
+        registrado_en = _fecha_cliente(entrada.get('registrado_en'))
+        tipo_registro = entrada.get('tipo_registro')
+        if tipo_registro == 'combinada':
+            registro, estadisticas, errores = _preparar_combinacion(combate, entrada)
+        elif tipo_registro in SERIALIZADORES_REGISTRO:
+            accion, errores = _validar_accion(SERIALIZADORES_REGISTRO[tipo_registro], combate, entrada)
+            registro = (accion, [])
+        else:
+            errores = {'tipo_registro': [f"Debe ser uno de: combinada, {', '.join(SERIALIZADORES_REGISTRO)}"]}
+        if not errores and registrado_en is None:
+            errores = {'registrado_en': ['Fecha y hora inválida']}
+        
+        if errores:
+            resultado['estado'] = 'rechazada'
+            resultado['errores'] = errores
+            continue
+        
+        accion = registro[0]
+        accion.combate = combate
+        marcador.sumar(MarcadorCombate.cambio(accion))
+        finalizado = marcador.lado_ganador() is not None
+        
+        registros.append(registro)
+        origenes.append({
+            'dispositivo': dispositivo,
+            'secuencia_cliente': secuencia,
+            'registrado_en_cliente': registrado_en
+        })
+        resultado['estado'] = 'aplicada'
+    return resultados, registros, origenes
 
 class CombateViewSet(viewsets.ModelViewSet):
     queryset = Combate.objects.all()
     serializer_class = CombateSerializer
     
+    @respuesta_cacheada('combate', lambda pk: [('combate', pk), ('competidor', TODAS), ('competicion', TODAS)])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    # Escrituras que bloquean la fila del combate hasta el final de su transacción: así se
+    # serializan con una finalización simultánea y la comprobación de `finalizado` es fiable
+    ACCIONES_BLOQUEANTES = (
+        'iniciar_combate', 'finalizar_combate', 'registrar_accion_tashi_waza', 'registrar_accion_ne_waza',
+        'registrar_amonestacion', 'registrar_accion_combinada', 'registrar_lote', 'sincronizar',
+    )
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
+        if self.action in self.ACCIONES_BLOQUEANTES:
+            queryset = queryset.select_for_update()
+        
         # Filtrar por competición si se proporciona el parámetro
         competicion_id = self.request.query_params.get('competicion')
         if competicion_id:
@@ -37,7 +245,7 @@ class CombateViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 
                           'registrar_accion_tashi_waza', 'registrar_accion_ne_waza', 
                           'registrar_amonestacion', 'finalizar_combate', 'iniciar_combate',
-                          'registrar_accion_combinada']:
+                          'registrar_accion_combinada', 'registrar_lote', 'sincronizar', 'exportar']:
             permission_classes = [EsEntrenador]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -47,6 +255,8 @@ class CombateViewSet(viewsets.ModelViewSet):
         serializer.save(registrado_por=self.request.user)
     
     @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
     def iniciar_combate(self, request, pk=None):
         combate = self.get_object()
         
@@ -68,7 +278,8 @@ class CombateViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Combate iniciado correctamente'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'])
-    @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
     def registrar_accion_combinada(self, request, pk=None):
         combate = self.get_object()
         
@@ -85,182 +296,61 @@ class CombateViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        acciones = request.data.get('acciones', [])
-        competidor_id = request.data.get('competidor')
-        tiempo = request.data.get('tiempo')
-        observaciones = request.data.get('observaciones', '')
-        resultado_final = request.data.get('resultado_final', 'sin_puntuacion')
-        
-        if not acciones:
-            return Response(
-                {'error': 'No se proporcionaron acciones para la combinación'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Crear la acción combinada principal
-        categorias_usadas = []
-        tecnicas_detalle = []
-        tecnicas_efectivas = 0
-        tecnicas_fallidas = 0
-        
-        for accion in acciones:
-            categoria = accion.get('categoria', '')
-            tecnica = accion.get('tecnica', '')
-            efectiva = accion.get('efectiva', True)
-            puntuacion = accion.get('puntuacion', 'sin_puntuacion')
-            
-            if categoria and categoria not in categorias_usadas:
-                categorias_usadas.append(categoria)
-            
-            if tecnica:
-                tecnicas_detalle.append(tecnica)
-                
-            if efectiva and puntuacion != 'sin_puntuacion':
-                tecnicas_efectivas += 1
-            else:
-                tecnicas_fallidas += 1
-        
-        # Mapas para generar descripción
-        codigos_map = {
-            'ashi_waza': 'A', 'koshi_waza': 'K', 'kata_te_waza': 'KTW',
-            'ma_sutemi_waza': 'MS', 'yoko_sutemi_waza': 'YS',
-            'osaekomi_waza': 'O', 'shime_waza': 'S', 'kansetsu_waza': 'KN'
-        }
-        
-        nombres_map = {
-            'ashi_waza': 'Ashi waza', 'koshi_waza': 'Koshi waza', 'kata_te_waza': 'Kata waza',
-            'ma_sutemi_waza': 'Ma sutemi waza', 'yoko_sutemi_waza': 'Yoko sutemi waza',
-            'osaekomi_waza': 'Osaekomi waza', 'shime_waza': 'Shime waza', 'kansetsu_waza': 'Kansetsu waza'
-        }
-        
-        if not categorias_usadas:
-            return Response(
-                {'error': 'No se encontraron categorías válidas en las acciones'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Validar la combinación y todas sus técnicas antes de escribir nada
+        registro, estadisticas, errores = _preparar_combinacion(combate, request.data)
+        if errores:
+            return Response({
+                'error': 'Datos inválidos',
+                'detalles': errores
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        nombres_categorias = [nombres_map.get(cat, cat) for cat in categorias_usadas]
-        codigos_categorias = [codigos_map.get(cat, cat[:2].upper()) for cat in categorias_usadas]
+        accion_combinada, tecnicas = registro
+        combate.registrar_acciones([registro], request.user)
         
-        descripcion_formato = f"{' - '.join(nombres_categorias)} ({'-'.join(codigos_categorias)})"
-        descripcion_detallada = f"Técnicas: {', '.join(tecnicas_detalle)} | Efectivas: {tecnicas_efectivas}/{len(acciones)}"
+        # Verificar finalización automática una sola vez para toda la combinación
+        resultado_finalizacion = combate.verificar_finalizacion_automatica()
         
-        efectiva_combinacion = resultado_final != 'sin_puntuacion'
+        # Calcular puntuaciones actualizadas
+        puntuacion_c1, puntuacion_c2 = combate.calcular_puntuaciones()
         
-        accion_combinada_data = {
-            'competidor': competidor_id,
-            'descripcion': descripcion_formato,
-            'descripcion_detallada': descripcion_detallada,
-            'tiempo': tiempo,
-            'efectiva': efectiva_combinacion,
-            'puntuacion': resultado_final
+        response_data = {
+            'accion_combinada': AccionCombinadaSerializer(accion_combinada).data,
+            'acciones': [
+                (AccionTashiWazaSerializer if isinstance(tecnica, AccionTashiWaza) else AccionNeWazaSerializer)(tecnica).data
+                for tecnica in tecnicas
+            ],
+            'combate_finalizado': combate.finalizado,
+            'ganador': combate.ganador.id if combate.ganador else None,
+            'ganador_nombre': combate.ganador.nombre if combate.ganador else None,
+            'puntuaciones': {
+                'competidor1': {
+                    'id': combate.competidor1.id,
+                    'nombre': combate.competidor1.nombre,
+                    'puntuacion': puntuacion_c1
+                },
+                'competidor2': {
+                    'id': combate.competidor2.id,
+                    'nombre': combate.competidor2.nombre,
+                    'puntuacion': puntuacion_c2
+                }
+            },
+            'estadisticas': estadisticas
         }
         
-        # Agregar contexto del combate al serializer
-        accion_combinada_serializer = AccionCombinadaSerializer(
-            data=accion_combinada_data, 
-            context={'combate': combate}
-        )
-        
-        if accion_combinada_serializer.is_valid():
-            accion_combinada = accion_combinada_serializer.save(
-                combate=combate, 
-                registrado_por=request.user
-            )
-            
-            # Registrar técnicas individuales manteniendo sus puntuaciones reales
-            acciones_tashi = request.data.get('acciones_tashi', [])
-            acciones_ne = request.data.get('acciones_ne', [])
-            
-            acciones_registradas = []
-            
-            # Registrar acciones Tashi Waza
-            for accion_data in acciones_tashi:
-                accion_data['accion_combinada'] = accion_combinada.id
-                # MANTENER la puntuación original, no forzar 'sin_puntuacion'
-                # accion_data['puntuacion'] = accion_data.get('puntuacion', 'sin_puntuacion')
-                
-                serializer = AccionTashiWazaSerializer(
-                    data=accion_data, 
-                    context={'combate': combate}
-                )
-                if serializer.is_valid():
-                    accion = serializer.save(
-                        combate=combate, 
-                        registrado_por=request.user,
-                        accion_combinada=accion_combinada
-                    )
-                    acciones_registradas.append(serializer.data)
-                else:
-                    print(f"Error en Tashi Waza: {serializer.errors}")
-            
-            # Registrar acciones Ne Waza
-            for accion_data in acciones_ne:
-                accion_data['accion_combinada'] = accion_combinada.id
-                # MANTENER la puntuación original, no forzar 'sin_puntuacion'
-                # accion_data['puntuacion'] = accion_data.get('puntuacion', 'sin_puntuacion')
-                
-                serializer = AccionNeWazaSerializer(
-                    data=accion_data, 
-                    context={'combate': combate}
-                )
-                if serializer.is_valid():
-                    accion = serializer.save(
-                        combate=combate, 
-                        registrado_por=request.user,
-                        accion_combinada=accion_combinada
-                    )
-                    acciones_registradas.append(serializer.data)
-                else:
-                    print(f"Error en Ne Waza: {serializer.errors}")
-            
-            # Verificar finalización automática
-            resultado_finalizacion = combate.verificar_finalizacion_automatica()
-            
-            # Calcular puntuaciones actualizadas
-            puntuacion_c1 = combate.calcular_puntuacion_competidor(combate.competidor1.id)
-            puntuacion_c2 = combate.calcular_puntuacion_competidor(combate.competidor2.id)
-            
-            response_data = {
-                'accion_combinada': accion_combinada_serializer.data,
-                'acciones': acciones_registradas,
-                'combate_finalizado': combate.finalizado,
-                'ganador': combate.ganador.id if combate.ganador else None,
-                'ganador_nombre': combate.ganador.nombre if combate.ganador else None,
-                'puntuaciones': {
-                    'competidor1': {
-                        'id': combate.competidor1.id,
-                        'nombre': combate.competidor1.nombre,
-                        'puntuacion': puntuacion_c1
-                    },
-                    'competidor2': {
-                        'id': combate.competidor2.id,
-                        'nombre': combate.competidor2.nombre,
-                        'puntuacion': puntuacion_c2
-                    }
-                },
-                'estadisticas': {
-                    'tecnicas_totales': len(acciones),
-                    'tecnicas_efectivas': tecnicas_efectivas,
-                    'tecnicas_fallidas': tecnicas_fallidas,
-                    'resultado_combinacion': resultado_final
+        if resultado_finalizacion:
+            response_data.update({
+                'motivo_victoria': resultado_finalizacion['motivo'],
+                'puntuacion_final': {
+                    'ganador': resultado_finalizacion['puntuacion_ganador'],
+                    'perdedor': resultado_finalizacion['puntuacion_perdedor']
                 }
-            }
-            
-            if resultado_finalizacion:
-                response_data.update({
-                    'motivo_victoria': resultado_finalizacion['motivo'],
-                    'puntuacion_final': {
-                        'ganador': resultado_finalizacion['puntuacion_ganador'],
-                        'perdedor': resultado_finalizacion['puntuacion_perdedor']
-                    }
-                })
-            
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            })
         
-        return Response(accion_combinada_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(response_data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
     def registrar_accion_tashi_waza(self, request, pk=None):
         combate = self.get_object()
         
@@ -285,8 +375,7 @@ class CombateViewSet(viewsets.ModelViewSet):
             resultado_combate = combate.verificar_finalizacion_automatica()
             
             # Calcular puntuaciones actualizadas
-            puntuacion_c1 = combate.calcular_puntuacion_competidor(combate.competidor1.id)
-            puntuacion_c2 = combate.calcular_puntuacion_competidor(combate.competidor2.id)
+            puntuacion_c1, puntuacion_c2 = combate.calcular_puntuaciones()
             
             response_data = {
                 'accion': AccionTashiWazaSerializer(accion).data,
@@ -322,6 +411,8 @@ class CombateViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
     def registrar_accion_ne_waza(self, request, pk=None):
         combate = self.get_object()
         
@@ -346,8 +437,7 @@ class CombateViewSet(viewsets.ModelViewSet):
             resultado_combate = combate.verificar_finalizacion_automatica()
             
             # Calcular puntuaciones actualizadas
-            puntuacion_c1 = combate.calcular_puntuacion_competidor(combate.competidor1.id)
-            puntuacion_c2 = combate.calcular_puntuacion_competidor(combate.competidor2.id)
+            puntuacion_c1, puntuacion_c2 = combate.calcular_puntuaciones()
             
             response_data = {
                 'accion': AccionNeWazaSerializer(accion).data,
@@ -383,6 +473,8 @@ class CombateViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
     def registrar_amonestacion(self, request, pk=None):
         combate = self.get_object()
         
@@ -404,8 +496,7 @@ class CombateViewSet(viewsets.ModelViewSet):
             
             resultado_combate = combate.verificar_finalizacion_automatica()
             
-            puntuacion_c1 = combate.calcular_puntuacion_competidor(combate.competidor1.id)
-            puntuacion_c2 = combate.calcular_puntuacion_competidor(combate.competidor2.id)
+            puntuacion_c1, puntuacion_c2 = combate.calcular_puntuaciones()
             
             response_data = {
                 'amonestacion': AmonestacionSerializer(amonestacion).data,
@@ -431,6 +522,8 @@ class CombateViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
     def finalizar_combate(self, request, pk=None):
         combate = self.get_object()
         
@@ -465,9 +558,7 @@ class CombateViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        combate.finalizado = True
-        combate.duracion = duracion
-        
+        ganador = combate.ganador
         if ganador_id:
             try:
                 from competidores.models import Competidor
@@ -477,19 +568,260 @@ class CombateViewSet(viewsets.ModelViewSet):
                         {'error': 'El ganador debe ser uno de los competidores del combate'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
-                combate.ganador = ganador
             except Competidor.DoesNotExist:
                 return Response(
                     {'error': 'Competidor no encontrado'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        combate.save()
+        if not combate.finalizar(ganador, duracion):
+            return Response(
+                {'error': 'El combate ya está finalizado'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response(
             {'message': 'Combate finalizado correctamente'},
             status=status.HTTP_200_OK
         )
+    
+    @action(detail=True, methods=['post'])
+    @idempotente
+    @transaction.atomic
+    def registrar_lote(self, request, pk=None):
+        """Registra en una sola transacción una lista mixta de acciones y amonestaciones"""
+        combate = self.get_object()
+        
+        if combate.finalizado:
+            return Response(
+                {'error': 'No se pueden registrar acciones en un combate finalizado'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not combate.iniciado:
+            return Response(
+                {'error': 'No se pueden registrar acciones en un combate no iniciado'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        entradas = request.data if isinstance(request.data, list) else request.data.get('acciones', [])
+        if not entradas or not isinstance(entradas, list):
+            return Response(
+                {'error': 'Debe proporcionar una lista de acciones'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validar todo antes de escribir nada
+        registros = []
+        errores = []
+        for indice, entrada in enumerate(entradas):
+            tipo_registro = entrada.get('tipo_registro') if isinstance(entrada, dict) else None
+            if tipo_registro == 'combinada':
+                registro, estadisticas, detalle = _preparar_combinacion(combate, entrada)
+            elif tipo_registro in SERIALIZADORES_REGISTRO:
+                accion, detalle = _validar_accion(SERIALIZADORES_REGISTRO[tipo_registro], combate, entrada)
+                registro = (accion, [])
+            else:
+                detalle = {'tipo_registro': [f"Debe ser uno de: combinada, {', '.join(SERIALIZADORES_REGISTRO)}"]}
+            
+            if detalle:
+                errores.append({'indice': indice, 'errores': detalle})
+            else:
+                registros.append(registro)
+        
+        if errores:
+            return Response({
+                'error': 'Datos inválidos',
+                'detalles': errores
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        acciones = combate.registrar_acciones(registros, request.user)
+        resultado_combate = combate.verificar_finalizacion_automatica()
+        
+        puntuacion_c1, puntuacion_c2 = combate.calcular_puntuaciones()
+        
+        return Response({
+            'registradas': len(acciones),
+            'ganador': combate.ganador_id,
+            'combate_finalizado': combate.finalizado,
+            'puntuaciones': {
+                'competidor1': {
+                    'id': combate.competidor1.id,
+                    'nombre': combate.competidor1.nombre,
+                    'puntuacion': puntuacion_c1
+                },
+                'competidor2': {
+                    'id': combate.competidor2.id,
+                    'nombre': combate.competidor2.nombre,
+                    'puntuacion': puntuacion_c2
+                }
+            },
+            'resultado_combate': resultado_combate
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    @transaction.atomic
+    def sincronizar(self, request, pk=None):
+        """
+        Aplica en orden las acciones que un tapiz registró sin conexión.
+        Cada acción lleva su `secuencia_cliente` y `registrado_en`; las ya recibidas
+        de ese dispositivo se ignoran y las posteriores a la finalización se marcan
+        como conflicto en lugar de registrarse.
+        """
+        combate = self.get_object()
+        
+        if not combate.iniciado:
+            return Response(
+                {'error': 'No se pueden registrar acciones en un combate no iniciado'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dispositivo = request.data.get('dispositivo')
+        entradas = request.data.get('acciones', [])
+        if not dispositivo or not isinstance(entradas, list):
+            return Response(
+                {'error': 'Debe indicar el dispositivo y la lista de acciones'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        longitud_maxima = EventoCombate._meta.get_field('dispositivo').max_length
+        if not isinstance(dispositivo, str) or len(dispositivo) > longitud_maxima:
+            return Response(
+                {'error': f'El dispositivo debe ser un texto de hasta {longitud_maxima} caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        resultados = []
+        pendientes = []
+        for entrada in entradas:
+            secuencia = entrada.get('secuencia_cliente') if isinstance(entrada, dict) else None
+            # bool es subclase de int: true/false no son secuencias
+            if not isinstance(secuencia, int) or isinstance(secuencia, bool) or secuencia < 0:
+                resultados.append({
+                    'secuencia_cliente': secuencia,
+                    'estado': 'rechazada',
+                    'errores': {'secuencia_cliente': ['Debe ser un entero no negativo']}
+                })
+            else:
+                pendientes.append(entrada)
+        pendientes.sort(key=lambda entrada: entrada['secuencia_cliente'])
+        
+        resultados_acciones, registros, origenes = _planificar_sincronizacion(combate, dispositivo, pendientes)
+        try:
+            # registrar_acciones escribe dentro de su propio punto de guardado
+            combate.registrar_acciones(registros, request.user, origenes)
+        except IntegrityError:
+            # Una sincronización simultánea del mismo dispositivo registró alguna de estas
+            # secuencias: al volver a planificar figuran como duplicadas
+            combate.refresh_from_db()
+            resultados_acciones, registros, origenes = _planificar_sincronizacion(combate, dispositivo, pendientes)
+            combate.registrar_acciones(registros, request.user, origenes)
+        resultados.extend(resultados_acciones)
+        resultado_combate = combate.verificar_finalizacion_automatica()
+        puntuacion_c1, puntuacion_c2 = combate.calcular_puntuaciones()
+        
+        return Response({
+            'dispositivo': dispositivo,
+            'aplicadas': len(registros),
+            'resultados': resultados,
+            'ganador': combate.ganador_id,
+            'combate_finalizado': combate.finalizado,
+            'puntuaciones': {
+                'competidor1': {
+                    'id': combate.competidor1.id,
+                    'nombre': combate.competidor1.nombre,
+                    'puntuacion': puntuacion_c1
+                },
+                'competidor2': {
+                    'id': combate.competidor2.id,
+                    'nombre': combate.competidor2.nombre,
+                    'puntuacion': puntuacion_c2
+                }
+            },
+            'resultado_combate': resultado_combate
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'])
+    def eventos(self, request, pk=None):
+        """Eventos del combate posteriores a una secuencia, junto al marcador actual"""
+        try:
+            desde = int(request.query_params.get('desde', 0))
+        except ValueError:
+            return Response(
+                {'error': 'El parámetro desde debe ser un número de secuencia'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        combate = self.get_object()
+        marcador = combate.obtener_marcador()
+        etag = f'"{combate.id}-{marcador.secuencia}"'
+        
+        # Sin cambios desde la última secuencia conocida por el cliente
+        if marcador.secuencia <= desde or request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        eventos = combate.eventos.filter(secuencia__gt=desde).values(
+            'secuencia', 'tipo', 'competidor', 'datos', 'fecha_hora'
+        )
+        puntuacion_c1 = marcador.puntuacion(combate.competidor1_id)
+        puntuacion_c2 = marcador.puntuacion(combate.competidor2_id)
+        
+        return Response({
+            'secuencia': marcador.secuencia,
+            'eventos': list(eventos),
+            'iniciado': combate.iniciado,
+            'finalizado': combate.finalizado,
+            'ganador': combate.ganador_id,
+            'puntuaciones': {
+                'competidor1': puntuacion_c1,
+                'competidor2': puntuacion_c2
+            }
+        }, headers={'ETag': etag})
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta en flujo todas las acciones (tashi waza, ne waza, combinadas y amonestaciones)
+        de una `competicion` y/o de los combates entre `fecha_inicio` y `fecha_fin`
+        (AAAA-MM-DD). `formato` es csv o ndjson y `gzip=1` comprime la salida.
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            return Response(
+                {'error': f'Formato no soportado, use uno de: {", ".join(FORMATOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fechas = {}
+        for parametro in ('fecha_inicio', 'fecha_fin'):
+            valor = request.query_params.get(parametro)
+            try:
+                fechas[parametro] = parse_date(valor) if valor else None
+            except ValueError:
+                fechas[parametro] = None
+            if valor and fechas[parametro] is None:
+                return Response(
+                    {'error': f'{parametro} debe tener el formato AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        competicion_id = request.query_params.get('competicion')
+        if competicion_id is not None and not (
+            competicion_id.isdigit() and Competicion.objects.filter(pk=competicion_id).exists()
+        ):
+            return Response({'error': 'Competición no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        comprimir = request.query_params.get('gzip', '').lower() in ['true', '1', 'yes']
+        filtro = filtrar_combates(competicion_id, fechas['fecha_inicio'], fechas['fecha_fin'])
+
+        nombre = f'acciones_competicion_{competicion_id}' if competicion_id else 'acciones'
+        nombre = f'{nombre}.{formato}' + ('.gz' if comprimir else '')
+        respuesta = StreamingHttpResponse(
+            exportar_acciones(filtro, formato, gzip=comprimir),
+            content_type='application/gzip' if comprimir else FORMATOS[formato]
+        )
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        respuesta['X-Accel-Buffering'] = 'no'
+        return respuesta
 
 class AccionTashiWazaViewSet(viewsets.ModelViewSet):
     queryset = AccionTashiWaza.objects.all()
@@ -715,4 +1047,164 @@ def verificar_finalizacion_automatica(request, combate_id):
         return Response(
             {'error': str(e)}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+def _formato_sse(datos, evento=None, evento_id=None):
+    """Serializa un mensaje en formato Server-Sent Events"""
+    lineas = []
+    if evento_id is not None:
+        lineas.append(f'id: {evento_id}')
+    if evento:
+        lineas.append(f'event: {evento}')
+    lineas.append(f'data: {json.dumps(datos, default=str)}')
+    return '\n'.join(lineas) + '\n\n'
+
+
+def _estado_combates(combates):
+    """Foto del marcador de cada combate, base sobre la que aplicar los eventos"""
+    marcadores = MarcadorCombate.objects.filter(combate__in=combates).select_related('combate')
+    return [{
+        'combate': marcador.combate_id,
+        'secuencia': marcador.secuencia,
+        'iniciado': marcador.combate.iniciado,
+        'finalizado': marcador.combate.finalizado,
+        'ganador': marcador.combate.ganador_id,
+        'marcador': marcador.contadores()
+    } for marcador in marcadores]
+
+
+SAL_TOKEN_FLUJO = 'combates.flujo'
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def token_flujo(request):
+    """
+    Emite un token de un solo uso y corta vigencia (SSE_TOKEN_SEGUNDOS) para abrir un
+    marcador en vivo con ?token=, ya que EventSource no envía cabeceras. Se pide uno por
+    conexión; al reconectar se indica el último evento recibido con ?ultimo_evento=.
+    """
+    token = signing.dumps(
+        {'usuario': request.user.pk, 'nonce': secrets.token_urlsafe(16)}, salt=SAL_TOKEN_FLUJO
+    )
+    return Response({'token': token, 'expira_en': settings.SSE_TOKEN_SEGUNDOS}, status=status.HTTP_201_CREATED)
+
+
+async def _usuario_token_flujo(token):
+    """Usuario de un token de token_flujo, o None si no es válido, venció o ya se usó"""
+    try:
+        datos = signing.loads(token, salt=SAL_TOKEN_FLUJO, max_age=settings.SSE_TOKEN_SEGUNDOS)
+    except signing.BadSignature:
+        return None
+    # Un solo uso: se recuerda hasta que vence (los flujos se sirven desde un único proceso)
+    if not await cache.aadd(f'combates:token_flujo:{datos["nonce"]}', True, timeout=settings.SSE_TOKEN_SEGUNDOS):
+        return None
+    return await get_user_model().objects.filter(pk=datos['usuario'], is_active=True).afirst()
+
+
+async def _usuario_autenticado(request):
+    """
+    Autentica por token de flujo (?token=), por el token de la API en la cabecera
+    Authorization o por sesión. El token de la API nunca va en la URL: quedaría en los registros.
+    """
+    token = request.GET.get('token')
+    if token:
+        return await _usuario_token_flujo(token)
+    
+    cabecera = request.headers.get('Authorization', '')
+    if cabecera.startswith('Token '):
+        clave = cabecera.split(' ', 1)[1]
+        token = await Token.objects.select_related('user').filter(key=clave).afirst()
+        return token.user if token and token.user.is_active else None
+    
+    autenticado = await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user if autenticado else None
+
+
+async def _flujo_eventos(filtro_suscripcion, eventos, combates, ultimo_id):
+    """
+    Emite los eventos perdidos desde ultimo_id, una foto del estado actual y
+    después los eventos en vivo. Cada combate de la foto lleva su secuencia:
+    el cliente ignora los eventos con secuencia menor o igual.
+    """
+    latido = getattr(settings, 'SSE_LATIDO_SEGUNDOS', 15)
+    suscripcion = difusor.suscribir(**filtro_suscripcion)
+    try:
+        yield f"retry: {getattr(settings, 'SSE_RECONEXION_MS', 3000)}\n\n"
+        
+        if ultimo_id is not None:
+            pendientes = await sync_to_async(list)(
+                eventos.filter(id__gt=ultimo_id).select_related('combate').order_by('id')
+            )
+            for evento in pendientes:
+                ultimo_id = evento.id
+                yield _formato_sse(evento.mensaje(), evento=evento.tipo, evento_id=evento.id)
+        
+        estado = await sync_to_async(_estado_combates)(combates)
+        yield _formato_sse({'combates': estado}, evento='estado')
+        
+        while True:
+            # Cola desbordada: se cierra para que el cliente reconecte con Last-Event-ID
+            if suscripcion.agotada():
+                break
+            try:
+                mensaje = await asyncio.wait_for(suscripcion.cola.get(), timeout=latido)
+            except asyncio.TimeoutError:
+                yield ': latido\n\n'
+                continue
+            
+            if ultimo_id is not None and mensaje['id'] <= ultimo_id:
+                continue
+            yield _formato_sse(mensaje, evento=mensaje['tipo'], evento_id=mensaje['id'])
+    finally:
+        difusor.cancelar(suscripcion)
+
+
+async def _respuesta_sse(request, filtro_suscripcion, eventos, combates):
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    
+    if await _usuario_autenticado(request) is None:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+    
+    ultimo_id = request.headers.get('Last-Event-ID') or request.GET.get('ultimo_evento')
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Last-Event-ID inválido'}, status=400)
+    
+    respuesta = StreamingHttpResponse(
+        _flujo_eventos(filtro_suscripcion, eventos, combates, ultimo_id),
+        content_type='text/event-stream'
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+async def flujo_combate(request, combate_id):
+    """Marcador en vivo de un combate como Server-Sent Events (requiere servidor ASGI)"""
+    if not await Combate.objects.filter(id=combate_id).aexists():
+        return JsonResponse({'error': 'Combate no encontrado'}, status=404)
+    
+    return await _respuesta_sse(
+        request,
+        {'combate_id': combate_id},
+        EventoCombate.objects.filter(combate_id=combate_id),
+        Combate.objects.filter(id=combate_id)
+    )
+
+
+async def flujo_competicion(request, competicion_id):
+    """Marcadores en vivo de los combates activos de una competición (requiere servidor ASGI)"""
+    if not await Competicion.objects.filter(id=competicion_id).aexists():
+        return JsonResponse({'error': 'Competición no encontrada'}, status=404)
+    
+    return await _respuesta_sse(
+        request,
+        {'competicion_id': competicion_id},
+        EventoCombate.objects.filter(combate__competicion_id=competicion_id),
+        Combate.objects.filter(competicion_id=competicion_id, finalizado=False)
+    )
+
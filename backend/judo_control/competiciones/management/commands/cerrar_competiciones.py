@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from competiciones.models import Competicion
+
+
+class Command(BaseCommand):
+    help = 'Marca como finalizadas las competiciones cuya fecha de fin ya pasó'
+
+    def handle(self, *args, **options):
+        total = Competicion.cerrar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f'Competiciones cerradas: {total}'))
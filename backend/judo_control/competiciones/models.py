@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from usuarios.models import Usuario
@@ -62,6 +63,84 @@ class Competicion(models.Model):
             return True
         return False
     
+    @staticmethod
+    def filtro_finalizada(hoy=None):
+        """Condición de finalizada al leer: marcada como tal o con la fecha de fin ya pasada"""
+        hoy = hoy or timezone.now().date()
+        return models.Q(finalizada=True) | models.Q(fecha_fin__lt=hoy)
+    
+    @classmethod
+    def cerrar_vencidas(cls, hoy=None):
+        """
+        Marca como finalizadas, con un único UPDATE, las competiciones cuya fecha de fin
+        ya pasó. Devuelve cuántas se cerraron.
+        """
+        hoy = hoy or timezone.now().date()
+        return cls.objects.filter(finalizada=False, fecha_fin__lt=hoy).update(finalizada=True)
+    
+    def inscribir_lote(self, identificaciones):
+        """
+        Inscribe competidores a partir de una lista de `identificacion_personal`, en el orden
+        recibido. Resuelve todas las identificaciones en una consulta e inserta las filas de la
+        relación en un único bulk_create. Devuelve (ids inscritos, errores por fila).
+        """
+        errores = []
+        filas = []
+        vistas = set()
+        for fila, identificacion in enumerate(identificaciones, start=1):
+            identificacion = str(identificacion or '').strip()
+            if not identificacion:
+                errores.append({'fila': fila, 'identificacion': '', 'error': 'Identificación vacía'})
+            elif identificacion in vistas:
+                errores.append({'fila': fila, 'identificacion': identificacion, 'error': 'Identificación repetida en la lista'})
+            else:
+                vistas.add(identificacion)
+                filas.append((fila, identificacion))
+        
+        Inscripcion = Competicion.competidores.through
+        with transaction.atomic():
+            # Bloquea la competición para que dos lotes simultáneos no superen el cupo
+            Competicion.objects.select_for_update().filter(pk=self.pk).first()
+            encontrados = {
+                identificacion: (competidor_id, inscrito)
+                for identificacion, competidor_id, inscrito in Competidor.objects.filter(
+                    identificacion_personal__in=vistas
+                ).annotate(
+                    inscrito=models.Exists(Inscripcion.objects.filter(
+                        competicion_id=self.pk, competidor_id=models.OuterRef('pk')
+                    ))
+                ).values_list('identificacion_personal', 'id', 'inscrito')
+            }
+            desconocidas = vistas - encontrados.keys()
+            ya_inscritas = {identificacion for identificacion, (_, inscrito) in encontrados.items() if inscrito}
+            plazas = self.cantidad_atletas - Inscripcion.objects.filter(competicion_id=self.pk).count()
+            
+            nuevos = []
+            for fila, identificacion in filas:
+                if identificacion in desconocidas:
+                    error = 'No existe un competidor con esta identificación'
+                elif identificacion in ya_inscritas:
+                    error = 'El competidor ya está inscrito'
+                elif len(nuevos) >= plazas:
+                    error = f'Se supera la cantidad máxima de atletas ({self.cantidad_atletas})'
+                else:
+                    nuevos.append(encontrados[identificacion][0])
+                    continue
+                errores.append({'fila': fila, 'identificacion': identificacion, 'error': error})
+            
+            if nuevos:
+                Inscripcion.objects.bulk_create([
+                    Inscripcion(competicion_id=self.pk, competidor_id=competidor_id) for competidor_id in nuevos
+                ])
+                # Los receptores de m2m_changed (p. ej. la caché de respuestas) no ven el bulk_create
+                m2m_changed.send(
+                    sender=Inscripcion, instance=self, action='post_add', reverse=False,
+                    model=Competidor, pk_set=set(nuevos), using=self._state.db
+                )
+        
+        errores.sort(key=lambda error: error['fila'])
+        return nuevos, errores
+    
     def __str__(self):
         return f"{self.nombre} - {self.fecha}"
     
@@ -11,4 +11,10 @@ class CompeticionSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'fecha', 'fecha_fin', 'evento', 'tipo', 'cantidad_atletas', 
                  'cantidad_combates_planificados', 'cantidad_combates_realizados', 
                  'finalizada', 'creado_por', 'creado_por_nombre', 'fecha_creacion', 'competidores']
-        read_only_fields = ['fecha_creacion', 'cantidad_combates_realizados', 'creado_por', 'creado_por_nombre']
\ No newline at end of file
+        read_only_fields = ['fecha_creacion', 'cantidad_combates_realizados', 'creado_por', 'creado_por_nombre']
+
+    def to_representation(self, instance):
+        datos = super().to_representation(instance)
+        # La fecha de fin se evalúa al leer; el cierre en la base de datos es periódico
+        datos['finalizada'] = datos['finalizada'] or instance.is_finished_by_date()
+        return datos
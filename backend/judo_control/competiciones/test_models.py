@@ -147,4 +147,33 @@ class CompeticionModelTest(TestCase):
         competicion = Competicion(**self.competicion_data)
         
         with self.assertRaises(ValidationError):
-            competicion.full_clean()
\ No newline at end of file
+            competicion.full_clean()
+
+
+class CierreCompeticionesTest(TestCase):
+    """Pruebas del cierre periódico de las competiciones vencidas"""
+    
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            email='cierre@example.com', nombre='Organizador', rol='administrador'
+        )
+    
+    def crear_competicion(self, fecha_fin):
+        return Competicion.objects.create(
+            nombre='Torneo', fecha=date.today() - timedelta(days=10), fecha_fin=fecha_fin,
+            evento='entrenamiento', tipo='nacional', cantidad_atletas=4, creado_por=self.usuario
+        )
+    
+    def test_cerrar_vencidas(self):
+        """Prueba que solo se cierran, en una consulta, las competiciones con la fecha de fin pasada"""
+        vencida = self.crear_competicion(date.today() - timedelta(days=1))
+        en_curso = self.crear_competicion(date.today())
+        sin_fin = self.crear_competicion(None)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(Competicion.cerrar_vencidas(), 1)
+        self.assertEqual(Competicion.cerrar_vencidas(), 0)
+        
+        for competicion, finalizada in ((vencida, True), (en_curso, False), (sin_fin, False)):
+            competicion.refresh_from_db()
+            self.assertEqual(competicion.finalizada, finalizada)
@@ -7,28 +7,49 @@ from rest_framework.response import Response
 from rest_framework import status
 from competidores.models import Competidor
 from competidores.serializers import CompetidorSerializer
+from api.cache import respuesta_cacheada, TODAS
+import csv
+import io
+
+def _identificaciones_csv(archivo):
+    """
+    Identificaciones de un CSV: la columna `identificacion_personal` si hay encabezado,
+    o la primera columna si no lo hay.
+    """
+    filas = csv.reader(io.TextIOWrapper(archivo, encoding='utf-8-sig'))
+    primera = next(filas, [])
+    encabezado = [columna.strip().lower() for columna in primera]
+    if 'identificacion_personal' in encabezado:
+        columna = encabezado.index('identificacion_personal')
+    else:
+        columna = 0
+        filas = [primera, *filas]
+    return [fila[columna] if len(fila) > columna else '' for fila in filas if fila]
 
 class CompeticionViewSet(viewsets.ModelViewSet):
     queryset = Competicion.objects.all()
     serializer_class = CompeticionSerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Actualizar estados de competiciones basándose en fecha_fin
-        for competicion in queryset:
-            competicion.update_status_by_date()
+        queryset = super().get_queryset().select_related('creado_por').prefetch_related('competidores')
         
-        # Filtrar por estado finalizado si se proporciona el parámetro
+        # Filtrar por estado finalizado si se proporciona el parámetro. Las competiciones
+        # vencidas cuentan como finalizadas aunque `cerrar_competiciones` aún no las haya marcado
         finalizada = self.request.query_params.get('finalizada')
         if finalizada is not None:
             is_finalizada = finalizada.lower() in ['true', '1', 'yes']
-            queryset = queryset.filter(finalizada=is_finalizada)
+            condicion = Competicion.filtro_finalizada()
+            queryset = queryset.filter(condicion if is_finalizada else ~condicion)
         
         return queryset
     
+    # Depende de la fecha: la competición se da por finalizada al pasar su fecha de fin
+    @respuesta_cacheada('competicion', lambda pk: [('competicion', pk), ('competidor', TODAS)], vigencia_diaria=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'inscribir_lote']:
             permission_classes = [EsEntrenador]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -89,6 +110,43 @@ class CompeticionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=True, methods=['post'])
+    def inscribir_lote(self, request, pk=None):
+        """
+        Inscripción masiva por `identificacion_personal`: una lista JSON en `identificaciones`
+        o un CSV en `archivo`. Inscribe las válidas e informa de los problemas de cada fila.
+        """
+        competicion = self.get_object()
+        
+        if 'archivo' in request.FILES:
+            try:
+                identificaciones = _identificaciones_csv(request.FILES['archivo'])
+            except (UnicodeDecodeError, csv.Error):
+                return Response(
+                    {'error': 'El archivo debe ser un CSV en UTF-8'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            identificaciones = request.data.get('identificaciones')
+            if not isinstance(identificaciones, list):
+                return Response(
+                    {'error': 'Envíe una lista en identificaciones o un archivo CSV'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        if not identificaciones:
+            return Response(
+                {'error': 'Debe proporcionar al menos una identificación'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        inscritos, errores = competicion.inscribir_lote(identificaciones)
+        return Response({
+            'inscritos': len(inscritos),
+            'rechazados': len(errores),
+            'errores': errores
+        }, status=status.HTTP_200_OK)
+    
     # Agregar este nuevo método
     @action(detail=True, methods=['get'])
     def competidores_inscritos(self, request, pk=None):
@@ -0,0 +1,193 @@
+"""
+Importación masiva de competidores desde CSV o NDJSON.
+
+Las filas se leen una a una del archivo, se validan y se insertan por lotes con
+bulk_create; la unicidad de las identificaciones se comprueba contra la base de datos con
+una consulta por lote. Las filas rechazadas se escriben en un CSV de errores a medida que
+aparecen, así que la memoria usada depende del tamaño del lote, no del archivo ni de la tabla.
+"""
+import codecs
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Competidor
+
+FORMATOS = ('csv', 'ndjson')
+
+# Subdirectorio de MEDIA_ROOT donde se guardan los CSV de filas rechazadas
+DIRECTORIO_IMPORTACIONES = 'importaciones'
+
+CAMPOS_OBLIGATORIOS = ('identificacion_personal', 'nombre', 'genero', 'division_peso', 'categoria', 'anos_experiencia')
+
+COLUMNAS_ERRORES = ['fila', 'identificacion_personal', 'error']
+
+DIVISIONES = {
+    'M': {division for division, _ in Competidor.DIVISION_PESO_MASCULINO},
+    'F': {division for division, _ in Competidor.DIVISION_PESO_FEMENINO},
+}
+CATEGORIAS = {categoria for categoria, _ in Competidor.CATEGORIA_CHOICES}
+VALORES_VERDADEROS = {'true', '1', 'yes', 'si', 'sí'}
+VALORES_FALSOS = {'false', '0', 'no'}
+
+
+def formato_de(nombre_archivo):
+    """Formato deducido de la extensión del archivo (csv por defecto)"""
+    return 'ndjson' if nombre_archivo.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def es_utf8(archivo):
+    """Comprueba por bloques que un archivo binario esté en UTF-8 y lo deja al principio"""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for bloque in iter(lambda: archivo.read(64 * 1024), b''):
+            decodificador.decode(bloque)
+        decodificador.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        archivo.seek(0)
+    return True
+
+
+def leer_filas(archivo, formato):
+    """Genera (número de fila, datos o None si la línea no se pudo leer) de un archivo binario"""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        # La fila 1 es el encabezado
+        for fila, datos in enumerate(csv.DictReader(texto), start=2):
+            yield fila, datos
+        return
+
+    for fila, linea in enumerate(texto, start=1):
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            datos = None
+        yield fila, datos if isinstance(datos, dict) else None
+
+
+def _texto(datos, campo):
+    valor = datos.get(campo)
+    return '' if valor is None else str(valor).strip()
+
+
+def validar(datos, existentes):
+    """
+    Devuelve (Competidor sin guardar, None) o (None, motivo del rechazo). `existentes` son
+    las identificaciones ya tomadas por el lote en curso; las registradas las comprueba `_insertar`.
+    """
+    if datos is None:
+        return None, 'Fila con formato inválido'
+
+    faltan = [campo for campo in CAMPOS_OBLIGATORIOS if not _texto(datos, campo)]
+    if faltan:
+        return None, f'Faltan campos obligatorios: {", ".join(faltan)}'
+
+    identificacion = _texto(datos, 'identificacion_personal')
+    nombre = _texto(datos, 'nombre')
+    genero = _texto(datos, 'genero').upper()
+    division = _texto(datos, 'division_peso')
+    categoria = _texto(datos, 'categoria')
+
+    if len(identificacion) > 11:
+        return None, 'La identificación no puede tener más de 11 caracteres'
+    if identificacion in existentes:
+        return None, 'Ya existe un competidor con esta identificación'
+    if len(nombre) > 100:
+        return None, 'El nombre no puede tener más de 100 caracteres'
+    if genero not in DIVISIONES:
+        return None, 'El género debe ser M o F'
+    if division not in DIVISIONES[genero]:
+        return None, f'División de peso no válida para el género {genero}: {division}'
+    if categoria not in CATEGORIAS:
+        return None, f'Categoría no válida: {categoria}'
+    try:
+        anos_experiencia = int(_texto(datos, 'anos_experiencia'))
+    except ValueError:
+        return None, 'Los años de experiencia deben ser un número entero'
+    if not 0 <= anos_experiencia <= 5:
+        return None, 'Los años de experiencia deben estar entre 0 y 5'
+
+    activo = _texto(datos, 'activo').lower() or 'true'
+    if activo not in VALORES_VERDADEROS | VALORES_FALSOS:
+        return None, f'Valor de activo no válido: {activo}'
+
+    return Competidor(
+        identificacion_personal=identificacion,
+        nombre=nombre,
+        genero=genero,
+        division_peso=division,
+        categoria=categoria,
+        anos_experiencia=anos_experiencia,
+        activo=activo in VALORES_VERDADEROS,
+    ), None
+
+
+def _insertar(lote, registrar_error):
+    """Inserta un lote rechazando las identificaciones ya registradas, también por escrituras concurrentes"""
+    ocupadas = set(Competidor.objects.filter(
+        identificacion_personal__in=[competidor.identificacion_personal for _, competidor in lote]
+    ).values_list('identificacion_personal', flat=True))
+    libres = []
+    for fila, competidor in lote:
+        if competidor.identificacion_personal in ocupadas:
+            registrar_error(fila, competidor.identificacion_personal, 'Ya existe un competidor con esta identificación')
+        else:
+            libres.append((fila, competidor))
+    try:
+        with transaction.atomic():
+            Competidor.objects.bulk_create([competidor for _, competidor in libres])
+        return len(libres)
+    except IntegrityError:
+        pass
+
+    # Otra escritura ocupó alguna identificación tras la consulta: se inserta fila a fila
+    creados = 0
+    for fila, competidor in libres:
+        try:
+            with transaction.atomic():
+                competidor.save(force_insert=True)
+            creados += 1
+        except IntegrityError:
+            registrar_error(fila, competidor.identificacion_personal, 'Ya existe un competidor con esta identificación')
+    return creados
+
+
+def importar(filas, salida_errores, tamano_lote=None):
+    """
+    Importa las filas de `leer_filas` y escribe las rechazadas como CSV en `salida_errores`
+    (un archivo de texto). Devuelve {'procesadas', 'creados', 'errores'}.
+    """
+    tamano_lote = tamano_lote or settings.IMPORTACION_TAMANO_LOTE
+    escritor = csv.writer(salida_errores)
+    escritor.writerow(COLUMNAS_ERRORES)
+    resumen = {'procesadas': 0, 'creados': 0, 'errores': 0}
+
+    def registrar_error(fila, identificacion, error):
+        escritor.writerow([fila, identificacion, error])
+        resumen['errores'] += 1
+
+    # Identificaciones del lote en curso; las de lotes anteriores ya están en la base de datos
+    pendientes = set()
+    lote = []
+    for fila, datos in filas:
+        resumen['procesadas'] += 1
+        competidor, error = validar(datos, pendientes)
+        if error:
+            registrar_error(fila, _texto(datos or {}, 'identificacion_personal'), error)
+            continue
+        pendientes.add(competidor.identificacion_personal)
+        lote.append((fila, competidor))
+        if len(lote) >= tamano_lote:
+            resumen['creados'] += _insertar(lote, registrar_error)
+            lote = []
+            pendientes = set()
+    if lote:
+        resumen['creados'] += _insertar(lote, registrar_error)
+    return resumen
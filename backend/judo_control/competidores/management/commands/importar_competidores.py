@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from competidores.importacion import FORMATOS, formato_de, importar, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa competidores desde un archivo CSV (con encabezado) o NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo a importar')
+        parser.add_argument('--formato', choices=FORMATOS, help='Por defecto se deduce de la extensión')
+        parser.add_argument('--errores', help='Ruta del CSV de filas rechazadas (por defecto, la salida de errores)')
+        parser.add_argument('--tamano-lote', type=int, help='Competidores por bulk_create')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or formato_de(options['archivo'])
+        try:
+            archivo = open(options['archivo'], 'rb')
+        except OSError as error:
+            raise CommandError(f'No se puede abrir el archivo: {error}')
+
+        salida = open(options['errores'], 'w', encoding='utf-8', newline='') if options['errores'] else sys.stderr
+        try:
+            with archivo:
+                resumen = importar(leer_filas(archivo, formato), salida, options['tamano_lote'])
+        finally:
+            if salida is not sys.stderr:
+                salida.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas procesadas: {resumen['procesadas']}, competidores creados: {resumen['creados']}, "
+            f"rechazadas: {resumen['errores']}"
+        ))
@@ -1,7 +1,21 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.http import FileResponse
+from django.urls import reverse
 from .models import Competidor
 from .serializers import CompetidorSerializer
+from .importacion import DIRECTORIO_IMPORTACIONES, FORMATOS, es_utf8, formato_de, importar, leer_filas
+from api.cache import incrementar_version
+from estadisticas.agregados import invalidar_estadisticas_generales
 from usuarios.views import EsEntrenador
+from django.conf import settings
+import os
+import re
+import uuid
+
+def _ruta_errores(nombre):
+    return os.path.join(settings.MEDIA_ROOT, DIRECTORIO_IMPORTACIONES, nombre)
 
 class CompetidorViewSet(viewsets.ModelViewSet):
     queryset = Competidor.objects.all()
@@ -19,11 +33,60 @@ class CompetidorViewSet(viewsets.ModelViewSet):
         return queryset
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'importar', 'errores_importacion']:
             permission_classes = [EsEntrenador]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
     def perform_create(self, serializer):
-        serializer.save()
\ No newline at end of file
+        serializer.save()
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        Importa competidores desde un archivo CSV (con encabezado) o NDJSON en `archivo`.
+        El formato se deduce de la extensión o del parámetro `formato`. Las filas rechazadas
+        se descargan como CSV desde `errores_url`.
+        """
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': 'Debe adjuntar un archivo'}, status=status.HTTP_400_BAD_REQUEST)
+        formato = request.data.get('formato') or formato_de(archivo.name)
+        if formato not in FORMATOS:
+            return Response(
+                {'error': f'Formato no soportado, use uno de: {", ".join(FORMATOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Se comprueba antes de importar: un error de decodificación a mitad del archivo
+        # dejaría creados los lotes anteriores sin informarlos
+        if not es_utf8(archivo):
+            return Response({'error': 'El archivo debe estar en UTF-8'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        nombre_errores = f'errores_{uuid.uuid4().hex}.csv'
+        ruta_errores = _ruta_errores(nombre_errores)
+        os.makedirs(os.path.dirname(ruta_errores), exist_ok=True)
+        with open(ruta_errores, 'w', encoding='utf-8', newline='') as salida:
+            resumen = importar(leer_filas(archivo, formato), salida)
+        
+        if resumen['creados']:
+            # bulk_create no envía señales: se invalidan aquí las cachés que dependen de competidores
+            incrementar_version('competidor', todas=True)
+            invalidar_estadisticas_generales()
+        
+        if resumen['errores']:
+            resumen['errores_url'] = request.build_absolute_uri(
+                f"{reverse('competidor-errores-importacion')}?archivo={nombre_errores}"
+            )
+        else:
+            os.remove(ruta_errores)
+        return Response(resumen, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def errores_importacion(self, request):
+        """Descarga el CSV de filas rechazadas de una importación"""
+        nombre = request.query_params.get('archivo', '')
+        ruta = _ruta_errores(nombre)
+        if not re.fullmatch(r'errores_[0-9a-f]{32}\.csv', nombre) or not os.path.exists(ruta):
+            return Response({'error': 'Archivo de errores no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre, content_type='text/csv')
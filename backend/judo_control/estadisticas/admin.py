@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Reporte, EstadisticaCompetidor
+from .models import Reporte, EstadisticaCompetidor, ResumenDiarioCompetidor, ResumenTecnicaCompetidor, TareaLotePDF, TareaReporte
 
 class EstadisticaCompetidorInline(admin.TabularInline):
     model = EstadisticaCompetidor
@@ -13,4 +13,29 @@ class ReporteAdmin(admin.ModelAdmin):
     inlines = [EstadisticaCompetidorInline]
 
 admin.site.register(Reporte, ReporteAdmin)
-admin.site.register(EstadisticaCompetidor)
\ No newline at end of file
+admin.site.register(EstadisticaCompetidor)
+
+class TareaReporteAdmin(admin.ModelAdmin):
+    list_display = ('reporte', 'estado', 'procesados', 'total', 'creada', 'finalizada')
+    list_filter = ('estado',)
+
+admin.site.register(TareaReporte, TareaReporteAdmin)
+
+class TareaLotePDFAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'estado', 'procesados', 'total', 'creada', 'finalizada')
+    list_filter = ('estado',)
+
+admin.site.register(TareaLotePDF, TareaLotePDFAdmin)
+
+class ResumenDiarioCompetidorAdmin(admin.ModelAdmin):
+    list_display = ('competidor', 'competicion', 'fecha', 'total_combates', 'combates_ganados')
+    list_filter = ('competicion', 'fecha')
+
+admin.site.register(ResumenDiarioCompetidor, ResumenDiarioCompetidorAdmin)
+
+class ResumenTecnicaCompetidorAdmin(admin.ModelAdmin):
+    list_display = ('competidor', 'combate', 'tecnica', 'puntuacion', 'en_combinacion', 'total', 'efectivas')
+    list_filter = ('modalidad', 'tipo')
+    search_fields = ('tecnica', 'competidor__nombre')
+
+admin.site.register(ResumenTecnicaCompetidor, ResumenTecnicaCompetidorAdmin)
@@ -0,0 +1,364 @@
+"""
+Cálculo de las estadísticas de reportes con consultas agrupadas.
+
+Cada consulta agrupa por competidor y cuenta con agregados condicionales
+(`Count(..., filter=Q(...))`), de modo que el número de consultas no depende
+de cuántos competidores, combates o acciones abarque el reporte.
+"""
+import hashlib
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+from api.cache import TODAS, incrementar_version, versiones
+from combates.models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada, EventoCombate
+from competiciones.models import Competicion
+from competidores.models import Competidor
+
+SIN_PUNTUACION = Q(puntuacion='sin_puntuacion')
+
+def sin_tecnicas(apps=global_apps):
+    """Combinaciones sin técnicas individuales: cuentan como una sola técnica ("directa")"""
+    return Q(
+        ~Exists(apps.get_model('combates', 'AccionTashiWaza').objects.filter(accion_combinada=OuterRef('pk')))
+        & ~Exists(apps.get_model('combates', 'AccionNeWaza').objects.filter(accion_combinada=OuterRef('pk')))
+    )
+
+
+COMBINADA_POSITIVA = Q(efectiva=True) | ~SIN_PUNTUACION
+
+# Cambiar cuando cambie la forma de calcular los contadores: invalida las marcas guardadas
+VERSION_CALCULO = 1
+
+CAMPOS_CONTADORES = (
+    'total_combates', 'combates_ganados', 'combates_perdidos',
+    'total_ataques_tashi_waza', 'ataques_positivos', 'ataques_negativos', 'wazari', 'yuko', 'ippon',
+    'ashi_waza', 'koshi_waza', 'kata_te_waza', 'sutemi_waza',
+    'combinaciones', 'ataques_combinados', 'tecnicas_positivas_combinadas', 'tecnicas_negativas_combinadas',
+    'total_acciones_ne_waza', 'inmovilizaciones', 'luxaciones', 'estrangulaciones',
+    'shido', 'hansokumake',
+)
+
+
+def combates_del_reporte(reporte, solo_finalizados=True):
+    """Combates (por defecto solo los finalizados) dentro del período y las competiciones del reporte"""
+    combates = Combate.objects.filter(
+        fecha_hora__date__gte=reporte.fecha_inicio,
+        fecha_hora__date__lte=reporte.fecha_fin
+    )
+    if solo_finalizados:
+        combates = combates.filter(finalizado=True)
+    competiciones = list(reporte.competiciones.values_list('id', flat=True))
+    if competiciones:
+        combates = combates.filter(competicion__in=competiciones)
+    return combates
+
+
+def firma_configuracion(reporte):
+    """Huella de todo lo que define el alcance del reporte, salvo los combates en sí"""
+    partes = [
+        VERSION_CALCULO,
+        reporte.fecha_inicio,
+        reporte.fecha_fin,
+        sorted(reporte.competidores.values_list('id', flat=True)),
+        sorted(reporte.competiciones.values_list('id', flat=True)),
+    ]
+    return hashlib.sha1(repr(partes).encode()).hexdigest()
+
+
+def competidores_con_cambios(reporte, marca_evento, competidor_ids):
+    """
+    Competidores del reporte con algún combate, acción o amonestación modificados
+    después del evento `marca_evento`. El registro de eventos recoge cada alta,
+    corrección y baja de acciones, así como la finalización de los combates.
+    """
+    combates = combates_del_reporte(reporte, solo_finalizados=False)
+    lados = EventoCombate.objects.filter(
+        id__gt=marca_evento, combate__in=combates.values('id')
+    ).values_list('combate__competidor1', 'combate__competidor2').distinct()
+    afectados = {competidor for lado in lados for competidor in lado}
+    return [competidor_id for competidor_id in competidor_ids if competidor_id in afectados]
+
+
+def _por_competidor(queryset, campo, **contadores):
+    """Ejecuta una consulta agrupada y la devuelve como {competidor_id: {contador: valor}}"""
+    filas = queryset.values(campo).order_by().annotate(**contadores)
+    return {fila.pop(campo): fila for fila in filas}
+
+
+def calcular_contadores(combates, competidor_ids, apps=global_apps):
+    """
+    Contadores de EstadisticaCompetidor para cada competidor sobre un conjunto de combates.
+    Devuelve {competidor_id: {campo: valor}} con todos los CAMPOS_CONTADORES.
+    `apps` permite calcularlos con los modelos históricos desde una migración.
+    """
+    Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada = (
+        apps.get_model('combates', nombre)
+        for nombre in ('Combate', 'AccionTashiWaza', 'AccionNeWaza', 'Amonestacion', 'AccionCombinada')
+    )
+    competidor_ids = list(competidor_ids)
+    combates = combates.values('id')
+
+    # Combates disputados y ganados, desde cada lado del combate
+    combates_por_lado = [
+        _por_competidor(
+            Combate.objects.filter(id__in=combates, **{f'{lado}__in': competidor_ids}), lado,
+            total=Count('id'),
+            ganados=Count('id', filter=Q(ganador=F(lado)))
+        )
+        for lado in ('competidor1', 'competidor2')
+    ]
+
+    tashi = _por_competidor(
+        AccionTashiWaza.objects.filter(combate__in=combates, competidor__in=competidor_ids), 'competidor',
+        total=Count('id'),
+        positivos=Count('id', filter=~SIN_PUNTUACION),
+        negativos=Count('id', filter=SIN_PUNTUACION),
+        waza_ari=Count('id', filter=Q(puntuacion='waza_ari')),
+        ippon=Count('id', filter=Q(puntuacion='ippon')),
+        ashi_waza=Count('id', filter=Q(tipo='ashi_waza')),
+        koshi_waza=Count('id', filter=Q(tipo='koshi_waza')),
+        kata_te_waza=Count('id', filter=Q(tipo='kata_te_waza')),
+        sutemi_waza=Count('id', filter=Q(tipo__in=['ma_sutemi_waza', 'yoko_sutemi_waza'])),
+        combinadas=Count('id', filter=Q(accion_combinada__isnull=False))
+    )
+
+    ne = _por_competidor(
+        AccionNeWaza.objects.filter(combate__in=combates, competidor__in=competidor_ids), 'competidor',
+        total=Count('id'),
+        inmovilizaciones=Count('id', filter=Q(tipo='osaekomi_waza')),
+        luxaciones=Count('id', filter=Q(tipo='kansetsu_waza')),
+        estrangulaciones=Count('id', filter=Q(tipo='shime_waza')),
+        combinadas=Count('id', filter=Q(accion_combinada__isnull=False))
+    )
+
+    amonestaciones = _por_competidor(
+        Amonestacion.objects.filter(combate__in=combates, competidor__in=competidor_ids), 'competidor',
+        shido=Count('id', filter=Q(tipo='shido')),
+        hansokumake=Count('id', filter=Q(tipo='hansokumake'))
+    )
+
+    combinadas = _por_competidor(
+        AccionCombinada.objects.filter(combate__in=combates, competidor__in=competidor_ids), 'competidor',
+        total=Count('id'),
+        ippon=Count('id', filter=Q(puntuacion='ippon')),
+        waza_ari=Count('id', filter=Q(puntuacion='waza_ari')),
+        positivas=Count('id', filter=sin_tecnicas(apps) & COMBINADA_POSITIVA),
+        negativas=Count('id', filter=sin_tecnicas(apps) & ~COMBINADA_POSITIVA)
+    )
+
+    # Técnicas dentro de las combinaciones, atribuidas al autor de la combinación
+    tecnicas_combinadas = [
+        _por_competidor(
+            modelo.objects.filter(
+                accion_combinada__combate__in=combates,
+                accion_combinada__competidor__in=competidor_ids
+            ), 'accion_combinada__competidor',
+            positivas=Count('id', filter=positiva_tecnica),
+            negativas=Count('id', filter=~positiva_tecnica)
+        )
+        for modelo, positiva_tecnica in (
+            (AccionTashiWaza, ~SIN_PUNTUACION),
+            (AccionNeWaza, Q(efectiva=True)),
+        )
+    ]
+
+    vacio = {}
+    contadores = {}
+    for competidor_id in competidor_ids:
+        lados = [lado.get(competidor_id, vacio) for lado in combates_por_lado]
+        t = tashi.get(competidor_id, vacio)
+        n = ne.get(competidor_id, vacio)
+        a = amonestaciones.get(competidor_id, vacio)
+        c = combinadas.get(competidor_id, vacio)
+        tecnicas = [grupo.get(competidor_id, vacio) for grupo in tecnicas_combinadas]
+
+        total_combates = sum(lado.get('total', 0) for lado in lados)
+        combates_ganados = sum(lado.get('ganados', 0) for lado in lados)
+        positivas_combinadas = c.get('positivas', 0) + sum(g.get('positivas', 0) for g in tecnicas)
+        negativas_combinadas = c.get('negativas', 0) + sum(g.get('negativas', 0) for g in tecnicas)
+
+        contadores[competidor_id] = {
+            'total_combates': total_combates,
+            'combates_ganados': combates_ganados,
+            'combates_perdidos': total_combates - combates_ganados,
+            'total_ataques_tashi_waza': t.get('total', 0),
+            'ataques_positivos': t.get('positivos', 0) + positivas_combinadas,
+            'ataques_negativos': t.get('negativos', 0) + negativas_combinadas,
+            'wazari': t.get('waza_ari', 0) + c.get('waza_ari', 0),
+            'yuko': 0,
+            'ippon': t.get('ippon', 0) + c.get('ippon', 0),
+            'ashi_waza': t.get('ashi_waza', 0),
+            'koshi_waza': t.get('koshi_waza', 0),
+            'kata_te_waza': t.get('kata_te_waza', 0),
+            'sutemi_waza': t.get('sutemi_waza', 0),
+            'combinaciones': t.get('combinadas', 0) + n.get('combinadas', 0),
+            'ataques_combinados': c.get('total', 0),
+            'tecnicas_positivas_combinadas': positivas_combinadas,
+            'tecnicas_negativas_combinadas': negativas_combinadas,
+            'total_acciones_ne_waza': n.get('total', 0),
+            'inmovilizaciones': n.get('inmovilizaciones', 0),
+            'luxaciones': n.get('luxaciones', 0),
+            'estrangulaciones': n.get('estrangulaciones', 0),
+            'shido': a.get('shido', 0),
+            'hansokumake': a.get('hansokumake', 0),
+        }
+    return contadores
+
+
+
+def resumen_combinaciones(combinadas):
+    """
+    Resumen de un conjunto de acciones combinadas y de sus técnicas, con una consulta
+    agregada por tabla en lugar de recorrer cada combinación.
+    """
+    totales = combinadas.aggregate(
+        total=Count('id'),
+        efectivas=Count('id', filter=Q(efectiva=True)),
+        directas=Count('id', filter=sin_tecnicas()),
+        directas_efectivas=Count('id', filter=sin_tecnicas() & COMBINADA_POSITIVA)
+    )
+    tecnicas = {
+        clave: modelo.objects.filter(accion_combinada__in=combinadas).aggregate(
+            total=Count('id'),
+            efectivas=Count('id', filter=efectiva)
+        )
+        for clave, modelo, efectiva in (
+            ('tashi_waza', AccionTashiWaza, ~SIN_PUNTUACION),
+            ('ne_waza', AccionNeWaza, Q(efectiva=True)),
+        )
+    }
+    tecnicas['combinaciones_directas'] = {
+        'total': totales['directas'], 'efectivas': totales['directas_efectivas']
+    }
+    for grupo in tecnicas.values():
+        grupo['no_efectivas'] = grupo['total'] - grupo['efectivas']
+
+    return {
+        'total_combinaciones': totales['total'],
+        'combinaciones_efectivas': totales['efectivas'],
+        'combinaciones_no_efectivas': totales['total'] - totales['efectivas'],
+        'porcentaje_efectividad': round(totales['efectivas'] * 100 / totales['total'], 1) if totales['total'] else 0,
+        'tipos_tecnicas': tecnicas
+    }
+
+def _clave_generales():
+    # La versión cambia con cada invalidación: las entradas anteriores caducan solas
+    version, = versiones([('estadisticas_generales', TODAS)])
+    return f'estadisticas:generales:{version}'
+
+
+def estadisticas_generales():
+    """
+    Totales del sistema para el panel principal, servidos desde la caché.
+    Las señales de estadisticas incrementan su versión ante cualquier escritura relevante.
+    """
+    clave = _clave_generales()
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular_estadisticas_generales()
+        cache.set(clave, datos, settings.ESTADISTICAS_GENERALES_CACHE_SEGUNDOS)
+    return datos
+
+
+def invalidar_estadisticas_generales():
+    """Invalida los totales en caché al momento y otra vez al confirmar la transacción"""
+    incrementar_version('estadisticas_generales', todas=True)
+
+
+def calcular_estadisticas_generales():
+    """Totales del sistema con una consulta de agregados condicionales por tabla"""
+    # Importado aquí: estadisticas.models importa este módulo
+    from .models import Reporte
+
+    en_combinacion = Q(accion_combinada__isnull=False)
+
+    tashi = AccionTashiWaza.objects.aggregate(
+        total=Count('id'),
+        acertadas=Count('id', filter=~SIN_PUNTUACION),
+        fallidas=Count('id', filter=SIN_PUNTUACION),
+        en_combinaciones=Count('id', filter=en_combinacion),
+        acertadas_combinaciones=Count('id', filter=en_combinacion & ~SIN_PUNTUACION),
+        fallidas_combinaciones=Count('id', filter=en_combinacion & SIN_PUNTUACION),
+        ashi_waza=Count('id', filter=Q(tipo='ashi_waza')),
+        koshi_waza=Count('id', filter=Q(tipo='koshi_waza')),
+        kata_te_waza=Count('id', filter=Q(tipo='kata_te_waza')),
+        sutemi_waza=Count('id', filter=Q(tipo__in=['ma_sutemi_waza', 'yoko_sutemi_waza'])),
+        ippon=Count('id', filter=Q(puntuacion='ippon')),
+        waza_ari=Count('id', filter=Q(puntuacion='waza_ari'))
+    )
+    ne = AccionNeWaza.objects.aggregate(
+        total=Count('id'),
+        acertadas=Count('id', filter=Q(efectiva=True)),
+        fallidas=Count('id', filter=Q(efectiva=False)),
+        en_combinaciones=Count('id', filter=en_combinacion),
+        acertadas_combinaciones=Count('id', filter=en_combinacion & Q(efectiva=True)),
+        fallidas_combinaciones=Count('id', filter=en_combinacion & Q(efectiva=False)),
+        osaekomi=Count('id', filter=Q(tipo='osaekomi_waza')),
+        shime=Count('id', filter=Q(tipo='shime_waza')),
+        kansetsu=Count('id', filter=Q(tipo='kansetsu_waza'))
+    )
+    combinadas = AccionCombinada.objects.aggregate(
+        total=Count('id'),
+        efectivas=Count('id', filter=Q(efectiva=True)),
+        fallidas=Count('id', filter=Q(efectiva=False)),
+        ippon=Count('id', filter=Q(puntuacion='ippon')),
+        waza_ari=Count('id', filter=Q(puntuacion='waza_ari'))
+    )
+    amonestaciones = Amonestacion.objects.aggregate(
+        shido=Count('id', filter=Q(tipo='shido')),
+        hansokumake=Count('id', filter=Q(tipo='hansokumake'))
+    )
+
+    return {
+        # Estadísticas básicas
+        'competidores': Competidor.objects.count(),
+        'competiciones': Competicion.objects.count(),
+        'combates': Combate.objects.filter(finalizado=True).count(),
+        'reportes': Reporte.objects.count(),
+
+        # Estadísticas de técnicas Tashi Waza
+        'total_acciones_tashi': tashi['total'],
+        'tecnicas_acertadas_tashi': tashi['acertadas'],
+        'tecnicas_fallidas_tashi': tashi['fallidas'],
+
+        # Estadísticas de técnicas Ne Waza
+        'total_acciones_ne': ne['total'],
+        'tecnicas_acertadas_ne': ne['acertadas'],
+        'tecnicas_fallidas_ne': ne['fallidas'],
+
+        # Estadísticas de combinaciones
+        'total_combinaciones': combinadas['total'],
+        'combinaciones_efectivas': combinadas['efectivas'],
+        'combinaciones_fallidas': combinadas['fallidas'],
+        'tecnicas_en_combinaciones_tashi': tashi['en_combinaciones'],
+        'tecnicas_en_combinaciones_ne': ne['en_combinaciones'],
+        'tecnicas_acertadas_combinaciones': tashi['acertadas_combinaciones'] + ne['acertadas_combinaciones'],
+        'tecnicas_fallidas_combinaciones': tashi['fallidas_combinaciones'] + ne['fallidas_combinaciones'],
+
+        # Estadísticas por tipo de técnica Tashi Waza
+        'ashi_waza_total': tashi['ashi_waza'],
+        'koshi_waza_total': tashi['koshi_waza'],
+        'te_waza_total': tashi['kata_te_waza'],
+        'sutemi_waza_total': tashi['sutemi_waza'],
+
+        # Estadísticas por tipo de técnica Ne Waza
+        'osaekomi_total': ne['osaekomi'],
+        'shime_total': ne['shime'],
+        'kansetsu_total': ne['kansetsu'],
+
+        # Puntuaciones, incluidas las de acciones combinadas
+        'total_ippon': tashi['ippon'] + combinadas['ippon'],
+        'total_waza_ari': tashi['waza_ari'] + combinadas['waza_ari'],
+
+        # Amonestaciones
+        'total_shido': amonestaciones['shido'],
+        'total_hansokumake': amonestaciones['hansokumake'],
+
+        # Totales generales
+        'total_tecnicas_acertadas': tashi['acertadas'] + ne['acertadas'],
+        'total_tecnicas_fallidas': tashi['fallidas'] + ne['fallidas'],
+        'total_acciones': tashi['total'] + ne['total']
+    }
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class EstadisticasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'estadisticas'
-    verbose_name = 'Estadísticas'
\ No newline at end of file
+    verbose_name = 'Estadísticas'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
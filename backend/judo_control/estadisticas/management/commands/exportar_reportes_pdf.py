@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from estadisticas.pdf import generar_lote, nombre_lote, reportes_para_lote
+
+
+class Command(BaseCommand):
+    help = 'Renderiza en paralelo los PDF de los reportes de una competición o período y los empaqueta en un ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--competicion', type=int, help='Id de la competición')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--procesos', type=int, help='Procesos de renderizado (por defecto, todos los núcleos)')
+
+    def handle(self, *args, **options):
+        competicion_id, desde, hasta = options['competicion'], options['desde'], options['hasta']
+        if competicion_id is None and desde is None and hasta is None:
+            raise CommandError('Indique --competicion o un rango con --desde/--hasta')
+
+        reportes = reportes_para_lote(competicion_id, desde, hasta)
+        if not reportes.exists():
+            raise CommandError('No hay reportes para exportar')
+
+        ruta = generar_lote(reportes, nombre_lote(competicion_id, desde, hasta), options['procesos'])
+        self.stdout.write(self.style.SUCCESS(f'{reportes.count()} reportes exportados en {ruta}'))
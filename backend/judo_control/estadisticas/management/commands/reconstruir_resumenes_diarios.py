@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from estadisticas.models import ResumenDiarioCompetidor
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios por competidor a partir de los combates finalizados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        total = ResumenDiarioCompetidor.reconstruir(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes diarios reconstruidos: {total}'))
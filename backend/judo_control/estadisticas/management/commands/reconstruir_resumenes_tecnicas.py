@@ -0,0 +1,15 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from estadisticas.models import ResumenTecnicaCompetidor
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen de técnicas por competidor a partir de los combates finalizados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Solo los combates desde esta fecha (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        total = ResumenTecnicaCompetidor.reconstruir(options['desde'])
+        self.stdout.write(self.style.SUCCESS(f'Filas del resumen de técnicas: {total}'))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('estadisticas', '0005_estadisticacompetidor_observaciones_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completada', 'Completada'), ('error', 'Error')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('procesados', models.PositiveIntegerField(default=0, verbose_name='Competidores procesados')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de competidores')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('creada', models.DateTimeField(auto_now_add=True, verbose_name='Creada')),
+                ('actualizada', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('iniciada', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada')),
+                ('finalizada', models.DateTimeField(blank=True, null=True, verbose_name='Finalizada')),
+                ('reporte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tareas', to='estadisticas.reporte')),
+                ('solicitada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tareas_reporte', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarea de Reporte',
+                'verbose_name_plural': 'Tareas de Reporte',
+                'ordering': ['-creada'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tareareporte',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'en_curso'])), fields=('reporte',), name='tarea_reporte_activa_unica'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estadisticas', '0006_tareareporte_tareareporte_tarea_reporte_activa_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_generacion',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fecha de generación'),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='firma',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40, verbose_name='Firma de la configuración'),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='marca_evento',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Último evento incluido'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:19
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def rellenar(apps, schema_editor):
+    """Calcula los resúmenes de los combates finalizados ya registrados"""
+    from estadisticas.agregados import calcular_contadores
+
+    Combate = apps.get_model('combates', 'Combate')
+    ResumenDiarioCompetidor = apps.get_model('estadisticas', 'ResumenDiarioCompetidor')
+    grupos = {}
+    for competicion_id, fecha, competidor1_id, competidor2_id in Combate.objects.filter(
+        finalizado=True
+    ).annotate(
+        fecha=TruncDate('fecha_hora')
+    ).values_list('competicion_id', 'fecha', 'competidor1_id', 'competidor2_id').distinct():
+        grupos.setdefault((competicion_id, fecha), set()).update((competidor1_id, competidor2_id))
+
+    for (competicion_id, fecha), competidor_ids in grupos.items():
+        combates = Combate.objects.filter(competicion_id=competicion_id, fecha_hora__date=fecha, finalizado=True)
+        ResumenDiarioCompetidor.objects.bulk_create([
+            ResumenDiarioCompetidor(competicion_id=competicion_id, fecha=fecha, competidor_id=competidor_id, **valores)
+            for competidor_id, valores in calcular_contadores(combates, competidor_ids, apps).items()
+            if valores['total_combates']
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combates', '0013_eventocombate_dispositivo_and_more'),
+        ('competiciones', '0006_competicion_fecha_fin_alter_competicion_fecha'),
+        ('competidores', '0006_competidor_activo'),
+        ('estadisticas', '0007_reporte_fecha_generacion_reporte_firma_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioCompetidor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_combates', models.PositiveIntegerField(default=0, verbose_name='Total de combates')),
+                ('combates_ganados', models.PositiveIntegerField(default=0, verbose_name='Combates ganados')),
+                ('combates_perdidos', models.PositiveIntegerField(default=0, verbose_name='Combates perdidos')),
+                ('total_ataques_tashi_waza', models.PositiveIntegerField(default=0, verbose_name='Total de ataques Tashi Waza')),
+                ('ataques_positivos', models.PositiveIntegerField(default=0, verbose_name='Ataques positivos')),
+                ('ataques_negativos', models.PositiveIntegerField(default=0, verbose_name='Ataques negativos')),
+                ('wazari', models.PositiveIntegerField(default=0, verbose_name='Wazari')),
+                ('yuko', models.PositiveIntegerField(default=0, verbose_name='Yuko')),
+                ('ippon', models.PositiveIntegerField(default=0, verbose_name='Ippon')),
+                ('ashi_waza', models.PositiveIntegerField(default=0, verbose_name='Ashi Waza')),
+                ('koshi_waza', models.PositiveIntegerField(default=0, verbose_name='Koshi Waza')),
+                ('kata_te_waza', models.PositiveIntegerField(default=0, verbose_name='Kata Te Waza')),
+                ('sutemi_waza', models.PositiveIntegerField(default=0, verbose_name='Sutemi Waza')),
+                ('combinaciones', models.PositiveIntegerField(default=0, verbose_name='Combinaciones')),
+                ('ataques_combinados', models.PositiveIntegerField(default=0, verbose_name='Ataques Combinados')),
+                ('tecnicas_positivas_combinadas', models.PositiveIntegerField(default=0, verbose_name='Técnicas Positivas en Combinaciones')),
+                ('tecnicas_negativas_combinadas', models.PositiveIntegerField(default=0, verbose_name='Técnicas Negativas en Combinaciones')),
+                ('total_acciones_ne_waza', models.PositiveIntegerField(default=0, verbose_name='Total de acciones Ne Waza')),
+                ('inmovilizaciones', models.PositiveIntegerField(default=0, verbose_name='Inmovilizaciones')),
+                ('luxaciones', models.PositiveIntegerField(default=0, verbose_name='Luxaciones')),
+                ('estrangulaciones', models.PositiveIntegerField(default=0, verbose_name='Estrangulaciones')),
+                ('shido', models.PositiveIntegerField(default=0, verbose_name='Shido')),
+                ('hansokumake', models.PositiveIntegerField(default=0, verbose_name='Hansokumake')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('competicion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='competiciones.competicion')),
+                ('competidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='competidores.competidor')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Competidor',
+                'verbose_name_plural': 'Resúmenes Diarios de Competidores',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['competidor', 'fecha'], name='resumen_competidor_fecha')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariocompetidor',
+            constraint=models.UniqueConstraint(fields=('competidor', 'competicion', 'fecha'), name='resumen_diario_competidor_unico'),
+        ),
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:21
+
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, Q
+import django.db.models.deletion
+
+
+def reconstruir_por_combate(apps, schema_editor):
+    """Rellena el resumen con una fila por combate a partir de las acciones guardadas"""
+    ResumenTecnicaCompetidor = apps.get_model('estadisticas', 'ResumenTecnicaCompetidor')
+    filas = []
+    for modelo, modalidad in (('AccionTashiWaza', 'tashi_waza'), ('AccionNeWaza', 'ne_waza')):
+        consulta = apps.get_model('combates', modelo).objects.filter(
+            combate__finalizado=True
+        ).annotate(
+            en_combinacion=ExpressionWrapper(Q(accion_combinada__isnull=False), output_field=models.BooleanField())
+        ).values(
+            'combate', 'competidor', 'tipo', 'tecnica', 'puntuacion', 'en_combinacion'
+        ).order_by().annotate(
+            total=Count('id'),
+            efectivas=Count('id', filter=Q(efectiva=True))
+        )
+        filas += [
+            ResumenTecnicaCompetidor(
+                combate_id=fila.pop('combate'), competidor_id=fila.pop('competidor'), modalidad=modalidad,
+                en_combinacion=bool(fila.pop('en_combinacion')), **fila
+            )
+            for fila in consulta.iterator()
+        ]
+    ResumenTecnicaCompetidor.objects.bulk_create(filas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combates', '0013_eventocombate_dispositivo_and_more'),
+        ('competidores', '0006_competidor_activo'),
+        ('estadisticas', '0008_resumendiariocompetidor_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenTecnicaCompetidor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modalidad', models.CharField(choices=[('tashi_waza', 'Tashi Waza'), ('ne_waza', 'Ne Waza')], max_length=10, verbose_name='Modalidad')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('tecnica', models.CharField(max_length=30, verbose_name='Técnica')),
+                ('puntuacion', models.CharField(max_length=15, verbose_name='Puntuación')),
+                ('en_combinacion', models.BooleanField(default=False, verbose_name='En combinación')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('efectivas', models.PositiveIntegerField(default=0, verbose_name='Efectivas')),
+                ('combate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_tecnicas', to='combates.combate')),
+                ('competidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_tecnicas', to='competidores.competidor')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Técnica por Competidor',
+                'verbose_name_plural': 'Resúmenes de Técnicas por Competidor',
+                'indexes': [models.Index(fields=['tecnica', 'modalidad'], name='resumen_tecnica_tecnica')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumentecnicacompetidor',
+            constraint=models.UniqueConstraint(fields=('combate', 'competidor', 'modalidad', 'tipo', 'tecnica', 'puntuacion', 'en_combinacion'), name='resumen_tecnica_combate_unico'),
+        ),
+        migrations.RunPython(reconstruir_por_combate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.11 on 2026-10-18 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('competiciones', '0006_competicion_fecha_fin_alter_competicion_fecha'),
+        ('estadisticas', '0009_resumentecnicacompetidor_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaLotePDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completada', 'Completada'), ('error', 'Error')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('creada', models.DateTimeField(auto_now_add=True, verbose_name='Creada')),
+                ('actualizada', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('iniciada', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada')),
+                ('finalizada', models.DateTimeField(blank=True, null=True, verbose_name='Finalizada')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre del lote')),
+                ('fecha_inicio', models.DateField(blank=True, null=True, verbose_name='Desde')),
+                ('fecha_fin', models.DateField(blank=True, null=True, verbose_name='Hasta')),
+                ('procesados', models.PositiveIntegerField(default=0, verbose_name='Reportes procesados')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de reportes')),
+                ('archivo', models.CharField(blank=True, default='', max_length=255, verbose_name='Archivo')),
+                ('competicion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tareas_lote_pdf', to='competiciones.competicion')),
+                ('solicitada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tareas_lote_pdf', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarea de Lote PDF',
+                'verbose_name_plural': 'Tareas de Lote PDF',
+                'ordering': ['-creada'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tarealotepdf',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'en_curso'])), fields=('nombre',), name='tarea_lote_pdf_activa_unica'),
+        ),
+    ]
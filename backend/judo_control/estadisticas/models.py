@@ -1,7 +1,17 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, ExpressionWrapper, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
 from competidores.models import Competidor
 from competiciones.models import Competicion
-from combates.models import Combate
+from combates.models import Combate, EventoCombate, AccionTashiWaza, AccionNeWaza
+from usuarios.models import Usuario
+from api.cache import incrementar_version
+from .agregados import (
+    CAMPOS_CONTADORES, calcular_contadores, competidores_con_cambios, firma_configuracion,
+)
 
 class Reporte(models.Model):
     TIPO_CHOICES = [
@@ -17,18 +27,117 @@ class Reporte(models.Model):
     competidores = models.ManyToManyField(Competidor, related_name='reportes')
     competiciones = models.ManyToManyField(Competicion, related_name='reportes', blank=True)
     
+    # Marca de agua de la última generación: los cambios posteriores se recalculan aparte
+    marca_evento = models.PositiveBigIntegerField('Último evento incluido', null=True, blank=True, editable=False)
+    firma = models.CharField('Firma de la configuración', max_length=40, blank=True, default='', editable=False)
+    fecha_generacion = models.DateTimeField('Fecha de generación', null=True, blank=True, editable=False)
+    
     def __str__(self):
         return f"{self.titulo} - {self.get_tipo_display()}"
     
+    def generar_estadisticas(self, progreso=None, completo=False):
+        """
+        Actualiza las estadísticas del reporte. Si ya se generó con la misma configuración
+        solo se recalculan los competidores con eventos posteriores a la marca guardada;
+        si no (o con `completo=True`) se recalculan todos.
+        Los competidores se calculan por lotes de REPORTES_TAMANO_LOTE; `progreso`,
+        si se indica, recibe (procesados, total) tras cada lote.
+        """
+        # La marca se toma antes de leer: lo que llegue durante el cálculo entra en la próxima.
+        # Es un id de EventoCombate, no la secuencia de cada combate: en SQLite las escrituras
+        # se serializan y los ids se confirman en orden, pero en PostgreSQL el id se asigna al
+        # insertar y una transacción con un id menor puede confirmarse después de tomar la
+        # marca. Ese evento no entra en las generaciones incrementales siguientes hasta una
+        # regeneración completa (`completo=True`) o hasta que otro evento toque al competidor
+        marca = EventoCombate.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        firma = firma_configuracion(self)
+        competidor_ids = list(self.competidores.values_list('id', flat=True))
+        # Leída de la base: las señales pueden haberla invalidado tras cargar la instancia
+        marca_anterior, firma_anterior = Reporte.objects.values_list('marca_evento', 'firma').get(pk=self.pk)
+        
+        if completo or marca_anterior is None or firma != firma_anterior:
+            estadisticas = self._regenerar(competidor_ids, progreso)
+        else:
+            existentes = set(self.estadisticas.values_list('competidor_id', flat=True))
+            afectados = competidores_con_cambios(self, marca_anterior, competidor_ids)
+            afectados += [c for c in competidor_ids if c not in existentes and c not in afectados]
+            estadisticas = self._actualizar_competidores(afectados, progreso)
+        
+        self.marca_evento, self.firma, self.fecha_generacion = marca, firma, timezone.now()
+        Reporte.objects.filter(pk=self.pk).update(
+            marca_evento=marca, firma=firma, fecha_generacion=self.fecha_generacion
+        )
+        # Las escrituras en bloque no emiten señales: se invalida la caché del reporte aquí
+        incrementar_version('reporte', self.pk)
+        return estadisticas
+    
+    def _calcular_por_lotes(self, competidor_ids, progreso):
+        competiciones = list(self.competiciones.values_list('id', flat=True))
+        tamano = settings.REPORTES_TAMANO_LOTE
+        
+        contadores = {}
+        for inicio in range(0, len(competidor_ids), tamano):
+            contadores.update(ResumenDiarioCompetidor.sumar(
+                competidor_ids[inicio:inicio + tamano], self.fecha_inicio, self.fecha_fin, competiciones
+            ))
+            if progreso:
+                progreso(len(contadores), len(competidor_ids))
+        return contadores
+    
+    def _regenerar(self, competidor_ids, progreso):
+        """Recalcula todos los competidores conservando observaciones y recomendaciones"""
+        contadores = self._calcular_por_lotes(competidor_ids, progreso)
+        
+        with transaction.atomic():
+            notas = {
+                competidor_id: {'observaciones': observaciones, 'recomendaciones': recomendaciones}
+                for competidor_id, observaciones, recomendaciones in self.estadisticas.values_list(
+                    'competidor_id', 'observaciones', 'recomendaciones'
+                )
+            }
+            self.estadisticas.all().delete()
+            return EstadisticaCompetidor.objects.bulk_create([
+                EstadisticaCompetidor(
+                    reporte=self,
+                    competidor_id=competidor_id,
+                    **contadores[competidor_id],
+                    **notas.get(competidor_id, {})
+                )
+                for competidor_id in competidor_ids
+            ])
+    
+    def _actualizar_competidores(self, competidor_ids, progreso):
+        """Recalcula solo los competidores indicados; el resto de filas no se toca"""
+        if not competidor_ids:
+            return []
+        contadores = self._calcular_por_lotes(competidor_ids, progreso)
+        
+        with transaction.atomic():
+            estadisticas = {
+                estadistica.competidor_id: estadistica
+                for estadistica in self.estadisticas.filter(competidor_id__in=competidor_ids)
+            }
+            nuevas = []
+            for competidor_id in competidor_ids:
+                estadistica = estadisticas.get(competidor_id)
+                if estadistica is None:
+                    nuevas.append(EstadisticaCompetidor(
+                        reporte=self, competidor_id=competidor_id, **contadores[competidor_id]
+                    ))
+                    continue
+                for campo, valor in contadores[competidor_id].items():
+                    setattr(estadistica, campo, valor)
+            EstadisticaCompetidor.objects.bulk_update(estadisticas.values(), CAMPOS_CONTADORES)
+            EstadisticaCompetidor.objects.bulk_create(nuevas)
+            return list(estadisticas.values()) + nuevas
+    
     class Meta:
         verbose_name = 'Reporte'
         verbose_name_plural = 'Reportes'
         ordering = ['-fecha_creacion']
 
-class EstadisticaCompetidor(models.Model):
-    competidor = models.ForeignKey(Competidor, on_delete=models.CASCADE, related_name='estadisticas')
-    reporte = models.ForeignKey(Reporte, on_delete=models.CASCADE, related_name='estadisticas')
-    
+class ContadoresCompetidor(models.Model):
+    """Contadores de estadísticas de un competidor, compartidos por reportes y resúmenes"""
     # Estadísticas generales
     total_combates = models.PositiveIntegerField('Total de combates', default=0)
     combates_ganados = models.PositiveIntegerField('Combates ganados', default=0)
@@ -64,6 +173,13 @@ class EstadisticaCompetidor(models.Model):
     shido = models.PositiveIntegerField('Shido', default=0)
     hansokumake = models.PositiveIntegerField('Hansokumake', default=0)
     
+    class Meta:
+        abstract = True
+
+class EstadisticaCompetidor(ContadoresCompetidor):
+    competidor = models.ForeignKey(Competidor, on_delete=models.CASCADE, related_name='estadisticas')
+    reporte = models.ForeignKey(Reporte, on_delete=models.CASCADE, related_name='estadisticas')
+    
     # Observaciones y recomendaciones
     observaciones = models.TextField('Observaciones', blank=True, null=True, help_text='Observaciones específicas del competidor')
     recomendaciones = models.TextField('Recomendaciones', blank=True, null=True, help_text='Recomendaciones de entrenamiento')
@@ -75,3 +191,336 @@ class EstadisticaCompetidor(models.Model):
         verbose_name = 'Estadística de Competidor'
         verbose_name_plural = 'Estadísticas de Competidores'
         ordering = ['-id']
+
+
+
+class ResumenDiarioCompetidor(ContadoresCompetidor):
+    """
+    Contadores de un competidor en los combates finalizados de una competición en un día.
+    Se mantiene al registrar eventos de combates finalizados, de modo que un reporte
+    suma unas pocas filas por competidor en lugar de recorrer todas las acciones.
+    """
+    competidor = models.ForeignKey(Competidor, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    competicion = models.ForeignKey(Competicion, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    fecha = models.DateField('Fecha')
+    
+    def __str__(self):
+        return f"{self.competidor.nombre} - {self.competicion.nombre} ({self.fecha})"
+    
+    @classmethod
+    def sumar(cls, competidor_ids, fecha_inicio, fecha_fin, competiciones=None):
+        """Contadores de cada competidor en el período: {competidor_id: {campo: valor}}"""
+        resumenes = cls.objects.filter(
+            competidor__in=competidor_ids, fecha__gte=fecha_inicio, fecha__lte=fecha_fin
+        )
+        if competiciones:
+            resumenes = resumenes.filter(competicion__in=competiciones)
+        filas = resumenes.values('competidor').order_by().annotate(
+            **{campo: Sum(campo) for campo in CAMPOS_CONTADORES}
+        )
+        sumas = {fila.pop('competidor'): fila for fila in filas}
+        vacio = dict.fromkeys(CAMPOS_CONTADORES, 0)
+        return {competidor_id: sumas.get(competidor_id, vacio) for competidor_id in competidor_ids}
+    
+    @classmethod
+    def actualizar(cls, claves):
+        """
+        Recalcula los resúmenes de las claves (competicion_id, fecha, competidor_id)
+        a partir de los combates finalizados. Las filas que quedan sin combates se eliminan.
+        """
+        grupos = {}
+        for competicion_id, fecha, competidor_id in claves:
+            grupos.setdefault((competicion_id, fecha), set()).add(competidor_id)
+        if not grupos:
+            return
+        
+        # Competidores o competiciones eliminados arrastran sus propios resúmenes
+        competidores = set(Competidor.objects.filter(
+            id__in=set().union(*grupos.values())
+        ).values_list('id', flat=True))
+        competiciones = set(Competicion.objects.filter(
+            id__in={competicion_id for competicion_id, _ in grupos}
+        ).values_list('id', flat=True))
+        
+        with transaction.atomic():
+            for (competicion_id, fecha), competidor_ids in grupos.items():
+                cls.objects.filter(
+                    competicion_id=competicion_id, fecha=fecha, competidor__in=competidor_ids
+                ).delete()
+                competidor_ids = competidor_ids & competidores
+                if competicion_id not in competiciones or not competidor_ids:
+                    continue
+                combates = Combate.objects.filter(
+                    competicion_id=competicion_id, fecha_hora__date=fecha, finalizado=True
+                )
+                cls.objects.bulk_create([
+                    cls(competicion_id=competicion_id, fecha=fecha, competidor_id=competidor_id, **valores)
+                    for competidor_id, valores in calcular_contadores(combates, competidor_ids).items()
+                    if valores['total_combates']
+                ])
+    
+    @classmethod
+    def actualizar_combate(cls, combate):
+        """Recalcula los resúmenes de los dos competidores de un combate"""
+        fecha = timezone.localdate(combate.fecha_hora)
+        cls.actualizar([
+            (combate.competicion_id, fecha, competidor_id)
+            for competidor_id in (combate.competidor1_id, combate.competidor2_id)
+        ])
+    
+    @classmethod
+    def reconstruir(cls, desde=None, hasta=None):
+        """Reconstruye todos los resúmenes (opcionalmente entre dos fechas) y devuelve cuántos quedan"""
+        resumenes = cls.objects.all()
+        combates = Combate.objects.filter(finalizado=True)
+        if desde:
+            resumenes = resumenes.filter(fecha__gte=desde)
+            combates = combates.filter(fecha_hora__date__gte=desde)
+        if hasta:
+            resumenes = resumenes.filter(fecha__lte=hasta)
+            combates = combates.filter(fecha_hora__date__lte=hasta)
+        
+        claves = set()
+        for competicion_id, fecha, competidor1_id, competidor2_id in combates.annotate(
+            fecha=TruncDate('fecha_hora')
+        ).values_list('competicion_id', 'fecha', 'competidor1_id', 'competidor2_id').distinct():
+            claves.add((competicion_id, fecha, competidor1_id))
+            claves.add((competicion_id, fecha, competidor2_id))
+        
+        with transaction.atomic():
+            resumenes.delete()
+            cls.actualizar(claves)
+        return resumenes.count()
+    
+    class Meta:
+        verbose_name = 'Resumen Diario de Competidor'
+        verbose_name_plural = 'Resúmenes Diarios de Competidores'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['competidor', 'competicion', 'fecha'],
+                name='resumen_diario_competidor_unico'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['competidor', 'fecha'], name='resumen_competidor_fecha'),
+        ]
+
+
+
+class ResumenTecnicaCompetidor(models.Model):
+    """
+    Resultados de cada técnica de un competidor en sus combates finalizados: una fila por
+    combate, técnica, tipo, puntuación y si formó parte de una combinación. Guardar la
+    aportación de cada combate permite sustituirla al corregirlo sin recorrer el historial
+    del competidor; las consultas suman las filas con `por_tecnica`.
+    """
+    MODALIDAD_CHOICES = [
+        ('tashi_waza', 'Tashi Waza'),
+        ('ne_waza', 'Ne Waza'),
+    ]
+    
+    PUNTOS = {'ippon': 10, 'waza_ari': 7}
+    
+    competidor = models.ForeignKey(Competidor, on_delete=models.CASCADE, related_name='resumenes_tecnicas')
+    combate = models.ForeignKey(Combate, on_delete=models.CASCADE, related_name='resumenes_tecnicas')
+    modalidad = models.CharField('Modalidad', max_length=10, choices=MODALIDAD_CHOICES)
+    tipo = models.CharField('Tipo', max_length=20)
+    tecnica = models.CharField('Técnica', max_length=30)
+    puntuacion = models.CharField('Puntuación', max_length=15)
+    en_combinacion = models.BooleanField('En combinación', default=False)
+    total = models.PositiveIntegerField('Total', default=0)
+    efectivas = models.PositiveIntegerField('Efectivas', default=0)
+    
+    def __str__(self):
+        return f"{self.competidor.nombre} - {self.tecnica} ({self.puntuacion})"
+    
+    @property
+    def no_efectivas(self):
+        return self.total - self.efectivas
+    
+    @classmethod
+    def calcular(cls, combate_ids):
+        """Filas del resumen de los combates indicados que están finalizados, sin guardar"""
+        filas = []
+        for modelo, modalidad in ((AccionTashiWaza, 'tashi_waza'), (AccionNeWaza, 'ne_waza')):
+            consulta = modelo.objects.filter(
+                combate__in=combate_ids, combate__finalizado=True
+            ).annotate(
+                en_combinacion=ExpressionWrapper(Q(accion_combinada__isnull=False), output_field=models.BooleanField())
+            ).values(
+                'combate', 'competidor', 'tipo', 'tecnica', 'puntuacion', 'en_combinacion'
+            ).order_by().annotate(
+                total=Count('id'),
+                efectivas=Count('id', filter=Q(efectiva=True))
+            )
+            filas += [
+                cls(
+                    combate_id=fila.pop('combate'), competidor_id=fila.pop('competidor'), modalidad=modalidad,
+                    en_combinacion=bool(fila.pop('en_combinacion')), **fila
+                )
+                for fila in consulta
+            ]
+        return filas
+    
+    @classmethod
+    def actualizar_combate(cls, combate):
+        """Sustituye la aportación de un combate; si ya no está finalizado queda vacía"""
+        with transaction.atomic():
+            cls.objects.filter(combate=combate).delete()
+            cls.objects.bulk_create(cls.calcular([combate.id]))
+    
+    @classmethod
+    def reconstruir(cls, desde=None, tamano_lote=500):
+        """
+        Reconstruye el resumen (opcionalmente solo de los combates desde una fecha) y
+        devuelve cuántas filas quedan de esos combates
+        """
+        resumenes = cls.objects.all()
+        combates = Combate.objects.filter(finalizado=True)
+        if desde:
+            resumenes = resumenes.filter(combate__fecha_hora__date__gte=desde)
+            combates = combates.filter(fecha_hora__date__gte=desde)
+        combate_ids = list(combates.values_list('id', flat=True))
+        with transaction.atomic():
+            resumenes.delete()
+            for inicio in range(0, len(combate_ids), tamano_lote):
+                cls.objects.bulk_create(cls.calcular(combate_ids[inicio:inicio + tamano_lote]))
+        return resumenes.count()
+    
+    @classmethod
+    def por_tecnica(cls, resumenes):
+        """
+        Agrupa un queryset del resumen por técnica con totales, efectividad y puntos,
+        ordenado de la más a la menos usada.
+        """
+        def suma(filtro):
+            return Coalesce(Sum('total', filter=filtro), 0)
+        
+        puntos = sum(
+            (suma(Q(puntuacion=puntuacion)) * valor for puntuacion, valor in cls.PUNTOS.items()),
+            Value(0)
+        )
+        return resumenes.values('modalidad', 'tipo', 'tecnica').order_by().annotate(
+            usos=Sum('total'),
+            efectivas=Sum('efectivas'),
+            puntuadas=suma(~Q(puntuacion='sin_puntuacion')),
+            en_combinacion=suma(Q(en_combinacion=True)),
+            puntos=puntos
+        ).order_by('-usos', 'tecnica')
+    
+    class Meta:
+        verbose_name = 'Resumen de Técnica por Competidor'
+        verbose_name_plural = 'Resúmenes de Técnicas por Competidor'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['combate', 'competidor', 'modalidad', 'tipo', 'tecnica', 'puntuacion', 'en_combinacion'],
+                name='resumen_tecnica_combate_unico'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tecnica', 'modalidad'], name='resumen_tecnica_tecnica'),
+        ]
+
+
+class TareaSegundoPlano(models.Model):
+    """Estado y progreso comunes de las tareas que se ejecutan en segundo plano (ver tareas.py)"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('completada', 'Completada'),
+        ('error', 'Error'),
+    ]
+    
+    ESTADOS_ACTIVOS = ('pendiente', 'en_curso')
+    
+    estado = models.CharField('Estado', max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    error = models.TextField('Error', blank=True, default='')
+    creada = models.DateTimeField('Creada', auto_now_add=True)
+    actualizada = models.DateTimeField('Última actualización', auto_now=True)
+    iniciada = models.DateTimeField('Iniciada', null=True, blank=True)
+    finalizada = models.DateTimeField('Finalizada', null=True, blank=True)
+    
+    @property
+    def activa(self):
+        return self.estado in self.ESTADOS_ACTIVOS
+    
+    @property
+    def interrumpida(self):
+        """Activa pero sin avances dentro del plazo: el proceso que la ejecutaba terminó"""
+        limite = timezone.now() - timedelta(minutes=settings.REPORTES_TAREA_CADUCIDAD_MINUTOS)
+        return self.activa and self.actualizada < limite
+    
+    def _actualizar(self, **campos):
+        # update() para que quien consulta el estado vea cada avance al momento
+        campos['actualizada'] = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(**campos)
+        for campo, valor in campos.items():
+            setattr(self, campo, valor)
+    
+    def iniciar(self):
+        self._actualizar(estado='en_curso', iniciada=timezone.now())
+    
+    def avanzar(self, procesados, total):
+        self._actualizar(procesados=procesados, total=total)
+    
+    def completar(self, **campos):
+        self._actualizar(estado='completada', finalizada=timezone.now(), **campos)
+    
+    def fallar(self, error):
+        self._actualizar(estado='error', error=error, finalizada=timezone.now())
+    
+    class Meta:
+        abstract = True
+
+class TareaReporte(TareaSegundoPlano):
+    """Generación en segundo plano de las estadísticas de un reporte"""
+    reporte = models.ForeignKey(Reporte, on_delete=models.CASCADE, related_name='tareas')
+    solicitada_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='tareas_reporte')
+    procesados = models.PositiveIntegerField('Competidores procesados', default=0)
+    total = models.PositiveIntegerField('Total de competidores', default=0)
+    
+    def __str__(self):
+        return f"{self.reporte.titulo} - {self.get_estado_display()}"
+    
+    class Meta:
+        verbose_name = 'Tarea de Reporte'
+        verbose_name_plural = 'Tareas de Reporte'
+        ordering = ['-creada']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['reporte'],
+                condition=models.Q(estado__in=['pendiente', 'en_curso']),
+                name='tarea_reporte_activa_unica'
+            ),
+        ]
+
+
+class TareaLotePDF(TareaSegundoPlano):
+    """
+    Generación en segundo plano del ZIP con los PDF de los reportes de una competición
+    y/o de un rango de fechas. `archivo` es la ruta del ZIP relativa a MEDIA_ROOT.
+    """
+    nombre = models.CharField('Nombre del lote', max_length=100)
+    competicion = models.ForeignKey(Competicion, on_delete=models.CASCADE, null=True, blank=True, related_name='tareas_lote_pdf')
+    fecha_inicio = models.DateField('Desde', null=True, blank=True)
+    fecha_fin = models.DateField('Hasta', null=True, blank=True)
+    solicitada_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='tareas_lote_pdf')
+    procesados = models.PositiveIntegerField('Reportes procesados', default=0)
+    total = models.PositiveIntegerField('Total de reportes', default=0)
+    archivo = models.CharField('Archivo', max_length=255, blank=True, default='')
+    
+    def __str__(self):
+        return f"{self.nombre} - {self.get_estado_display()}"
+    
+    class Meta:
+        verbose_name = 'Tarea de Lote PDF'
+        verbose_name_plural = 'Tareas de Lote PDF'
+        ordering = ['-creada']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['nombre'],
+                condition=models.Q(estado__in=['pendiente', 'en_curso']),
+                name='tarea_lote_pdf_activa_unica'
+            ),
+        ]
@@ -0,0 +1,283 @@
+"""
+Exportación de reportes a PDF.
+
+`datos_pdf` reúne en un diccionario serializable todo lo que se imprime y
+`renderizar_pdf` lo convierte en el documento sin tocar la base de datos. El PDF se
+guarda en MEDIA_ROOT con el id del reporte y la huella de esos datos en el nombre,
+de modo que las descargas repetidas se sirven del archivo sin volver a renderizar.
+
+Los lotes (todos los reportes de una competición o de un período) se renderizan en un
+ProcessPoolExecutor, porque la maquetación de reportlab ocupa la CPU, y se empaquetan
+en un ZIP guardado también en disco. Desde la API se generan como tarea en segundo plano
+(ver tareas.encolar_lote_pdf).
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Cambiarla invalida los PDF guardados cuando cambia el diseño del documento
+VERSION_PLANTILLA = 1
+
+DIRECTORIO_PDF = 'reportes_pdf'
+
+ENCABEZADO_RESUMEN = ['Competidor', 'Combates', 'Victorias', 'Ippon', 'Wazari', 'Shido', 'Efectividad']
+ENCABEZADO_TECNICAS = [
+    'Competidor', 'Ashi waza', 'Koshi waza', 'Kata te waza', 'Sutemi waza', 'Ne waza', 'Combinaciones'
+]
+
+ESTILO_TABLA = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1976d2')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+])
+
+
+def _efectividad(estadistica):
+    if not estadistica.total_ataques_tashi_waza:
+        return '0.0%'
+    return f'{estadistica.ataques_positivos * 100 / estadistica.total_ataques_tashi_waza:.1f}%'
+
+
+def datos_pdf(reporte):
+    """Contenido del PDF de un reporte como diccionario serializable"""
+    estadisticas = reporte.estadisticas.select_related('competidor').order_by('competidor__nombre')
+    resumen = []
+    tecnicas = []
+    for estadistica in estadisticas:
+        nombre = estadistica.competidor.nombre
+        resumen.append([
+            nombre, estadistica.total_combates, estadistica.combates_ganados, estadistica.ippon,
+            estadistica.wazari, estadistica.shido, _efectividad(estadistica),
+        ])
+        tecnicas.append([
+            nombre, estadistica.ashi_waza, estadistica.koshi_waza, estadistica.kata_te_waza,
+            estadistica.sutemi_waza, estadistica.total_acciones_ne_waza, estadistica.combinaciones,
+        ])
+
+    fecha_generacion = reporte.fecha_generacion
+    return {
+        'titulo': reporte.titulo,
+        'tipo': reporte.get_tipo_display(),
+        'periodo': f'{reporte.fecha_inicio:%d/%m/%Y} - {reporte.fecha_fin:%d/%m/%Y}',
+        'generado': timezone.localtime(fecha_generacion).strftime('%d/%m/%Y %H:%M') if fecha_generacion else None,
+        'resumen': resumen,
+        'tecnicas': tecnicas,
+    }
+
+
+def huella(datos):
+    """Hash del contenido del PDF (y de la versión de la plantilla)"""
+    contenido = json.dumps([VERSION_PLANTILLA, datos], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def renderizar_pdf(datos):
+    """Genera los bytes del PDF a partir de `datos_pdf`, sin acceder a la base de datos"""
+    buffer = io.BytesIO()
+    documento = SimpleDocTemplate(buffer, pagesize=A4, title=datos['titulo'])
+    estilos = getSampleStyleSheet()
+    estilo_titulo = ParagraphStyle('Titulo', parent=estilos['Heading1'], alignment=1, spaceAfter=12)
+
+    # Paragraph interpreta marcado XML: el texto de los usuarios se escapa
+    contenido = [
+        Paragraph(escape(datos['titulo']), estilo_titulo),
+        Paragraph(f"{escape(datos['tipo'])} · Período: {escape(datos['periodo'])}", estilos['Normal']),
+        Paragraph(
+            f"Estadísticas generadas el: {escape(datos['generado'])}" if datos['generado']
+            else 'Las estadísticas de este reporte aún no se han generado.',
+            estilos['Normal']
+        ),
+        Spacer(1, 16),
+    ]
+
+    if datos['resumen']:
+        for titulo, encabezado, filas in (
+            ('Resumen por competidor', ENCABEZADO_RESUMEN, datos['resumen']),
+            ('Técnicas por categoría', ENCABEZADO_TECNICAS, datos['tecnicas']),
+        ):
+            contenido.append(Paragraph(titulo, estilos['Heading2']))
+            tabla = Table([encabezado, *filas], repeatRows=1)
+            tabla.setStyle(ESTILO_TABLA)
+            contenido.extend([tabla, Spacer(1, 16)])
+    else:
+        contenido.append(Paragraph('No hay estadísticas disponibles para este reporte.', estilos['Normal']))
+
+    documento.build(contenido)
+    return buffer.getvalue()
+
+
+def _directorio(*partes):
+    return os.path.join(settings.MEDIA_ROOT, DIRECTORIO_PDF, *partes)
+
+
+def ruta_pdf(reporte_id, huella_datos):
+    return _directorio(f'reporte_{reporte_id}_{huella_datos[:16]}.pdf')
+
+
+def _escribir(ruta, contenido):
+    # Escritura atómica: una descarga concurrente nunca ve un archivo a medias
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def guardar_pdf(reporte_id, datos, contenido=None):
+    """
+    Escribe el PDF (renderizándolo si no se pasa `contenido`) y borra las versiones
+    anteriores del mismo reporte. Devuelve la ruta del archivo.
+    """
+    ruta = ruta_pdf(reporte_id, huella(datos))
+    if os.path.exists(ruta):
+        return ruta
+    if contenido is None:
+        contenido = renderizar_pdf(datos)
+
+    _escribir(ruta, contenido)
+
+    for anterior in glob(_directorio(f'reporte_{reporte_id}_*.pdf')):
+        if anterior != ruta:
+            try:
+                os.remove(anterior)
+            except FileNotFoundError:
+                pass
+    return ruta
+
+
+def obtener_pdf(reporte):
+    """Ruta del PDF del reporte con sus datos actuales, renderizándolo solo si cambiaron"""
+    return guardar_pdf(reporte.id, datos_pdf(reporte))
+
+
+def abrir_pdf(reporte):
+    """
+    Abre el PDF del reporte con sus datos actuales y devuelve (archivo, ruta). Si una
+    descarga concurrente guarda otra versión y borra esta antes de abrirla, se sirve
+    renderizada en memoria.
+    """
+    datos = datos_pdf(reporte)
+    ruta = guardar_pdf(reporte.id, datos)
+    try:
+        return open(ruta, 'rb'), ruta
+    except FileNotFoundError:
+        return io.BytesIO(renderizar_pdf(datos)), ruta
+
+
+def nombre_descarga(reporte):
+    seguro = ''.join(c if c.isalnum() or c in ' -_' else '_' for c in reporte.titulo).strip()
+    return f'{seguro or "reporte"}.pdf'
+
+
+def reportes_para_lote(competicion_id=None, fecha_inicio=None, fecha_fin=None):
+    """Reportes de una competición y/o cuyo período se solapa con el rango de fechas"""
+    from .models import Reporte
+
+    reportes = Reporte.objects.all()
+    if competicion_id is not None:
+        reportes = reportes.filter(competiciones=competicion_id)
+    if fecha_inicio is not None:
+        reportes = reportes.filter(fecha_fin__gte=fecha_inicio)
+    if fecha_fin is not None:
+        reportes = reportes.filter(fecha_inicio__lte=fecha_fin)
+    return reportes.distinct().order_by('id')
+
+
+def nombre_lote(competicion_id=None, fecha_inicio=None, fecha_fin=None):
+    """Nombre del ZIP de un lote, estable para los mismos filtros"""
+    partes = ['reportes']
+    if competicion_id is not None:
+        partes.append(f'competicion{competicion_id}')
+    if fecha_inicio is not None or fecha_fin is not None:
+        partes.append(f'{fecha_inicio or "inicio"}_{fecha_fin or "fin"}')
+    return '_'.join(partes)
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, 'rb') as archivo:
+            return archivo.read()
+    except FileNotFoundError:
+        return None
+
+
+def generar_lote(reportes, nombre='reportes', procesos=None, progreso=None):
+    """
+    Renderiza en paralelo los PDF de los reportes que cambiaron y devuelve la ruta de un
+    ZIP con todos ellos. Si ningún PDF cambió desde el último lote se reutiliza el ZIP.
+    `progreso`, si se indica, recibe (procesados, total) tras cada PDF renderizado.
+    """
+    pendientes = []
+    archivos = []
+    contenidos = {}
+    for reporte in reportes:
+        datos = datos_pdf(reporte)
+        ruta = ruta_pdf(reporte.id, huella(datos))
+        # Se leen ya: una descarga concurrente puede renderizar otra versión y borrar este archivo
+        contenidos[ruta] = _leer(ruta)
+        if contenidos[ruta] is None:
+            pendientes.append((reporte.id, datos, ruta))
+        archivos.append((ruta, f'{reporte.id:04d}_{nombre_descarga(reporte)}'))
+    
+    total = len(archivos)
+    procesados = total - len(pendientes)
+    if progreso:
+        progreso(procesados, total)
+    
+    procesos = min(procesos or settings.REPORTES_PDF_PROCESOS or os.cpu_count() or 1, len(pendientes))
+    if procesos > 1:
+        # Solo se envían los datos ya leídos: los procesos hijos no usan la base de datos.
+        # spawn en lugar de fork: se llama desde hilos en segundo plano del servidor
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as ejecutor:
+            renderizados = ejecutor.map(renderizar_pdf, [datos for _, datos, _ in pendientes])
+            for (reporte_id, datos, ruta), contenido in zip(pendientes, renderizados):
+                guardar_pdf(reporte_id, datos, contenido)
+                contenidos[ruta] = contenido
+                procesados += 1
+                if progreso:
+                    progreso(procesados, total)
+    else:
+        for reporte_id, datos, ruta in pendientes:
+            contenidos[ruta] = renderizar_pdf(datos)
+            guardar_pdf(reporte_id, datos, contenidos[ruta])
+            procesados += 1
+            if progreso:
+                progreso(procesados, total)
+    
+    firma = hashlib.sha256(repr(archivos).encode('utf-8')).hexdigest()[:16]
+    ruta_zip = _directorio('lotes', f'{nombre}_{firma}.zip')
+    if not os.path.exists(ruta_zip):
+        os.makedirs(os.path.dirname(ruta_zip), exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta_zip), suffix='.tmp')
+        # Los PDF ya van comprimidos: se almacenan sin volver a comprimir
+        with os.fdopen(descriptor, 'wb') as destino, zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as archivo_zip:
+            for ruta, nombre_archivo in archivos:
+                archivo_zip.writestr(nombre_archivo, contenidos[ruta])
+        os.replace(temporal, ruta_zip)
+        for anterior in glob(_directorio('lotes', f'{nombre}_{"?" * 16}.zip')):
+            if anterior != ruta_zip:
+                try:
+                    os.remove(anterior)
+                except FileNotFoundError:
+                    pass
+    return ruta_zip
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Reporte, EstadisticaCompetidor
+from rest_framework.reverse import reverse
+from .models import Reporte, EstadisticaCompetidor, TareaLotePDF, TareaReporte
 from competidores.serializers import CompetidorSerializer
 
 class EstadisticaCompetidorSerializer(serializers.ModelSerializer):
@@ -21,5 +22,40 @@ class ReporteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reporte
         fields = ['id', 'titulo', 'tipo', 'fecha_creacion', 'fecha_inicio', 'fecha_fin', 
-                  'competidores', 'competiciones', 'estadisticas']
-        read_only_fields = ['fecha_creacion']
\ No newline at end of file
+                  'competidores', 'competiciones', 'estadisticas', 'fecha_generacion']
+        read_only_fields = ['fecha_creacion', 'fecha_generacion']
+
+class TareaReporteSerializer(serializers.ModelSerializer):
+    progreso = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TareaReporte
+        fields = ['id', 'reporte', 'estado', 'procesados', 'total', 'progreso', 'error',
+                  'creada', 'iniciada', 'finalizada']
+        read_only_fields = fields
+    
+    def get_progreso(self, obj):
+        """Porcentaje de competidores procesados"""
+        if obj.estado == 'completada':
+            return 100
+        return round(obj.procesados * 100 / obj.total) if obj.total else 0
+
+class TareaLotePDFSerializer(serializers.ModelSerializer):
+    progreso = serializers.SerializerMethodField()
+    url_descarga = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TareaLotePDF
+        fields = ['id', 'nombre', 'competicion', 'fecha_inicio', 'fecha_fin', 'estado', 'procesados',
+                  'total', 'progreso', 'error', 'url_descarga', 'creada', 'iniciada', 'finalizada']
+        read_only_fields = fields
+    
+    def get_progreso(self, obj):
+        """Porcentaje de reportes procesados"""
+        if obj.estado == 'completada':
+            return 100
+        return round(obj.procesados * 100 / obj.total) if obj.total else 0
+    
+    def get_url_descarga(self, obj):
+        """URL del ZIP; responde 409 mientras la tarea no se complete"""
+        return reverse('tarealotepdf-descargar', kwargs={'pk': obj.pk}, request=self.context.get('request'))
@@ -0,0 +1,80 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from combates.models import (
+    Combate, AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion, eventos_registrados
+)
+from competiciones.models import Competicion
+from competidores.models import Competidor
+from .agregados import invalidar_estadisticas_generales
+from .models import Reporte, ResumenDiarioCompetidor, ResumenTecnicaCompetidor
+
+# Modelos cuyas escrituras cambian los totales del panel de estadísticas generales
+MODELOS_GENERALES = (
+    Combate, AccionTashiWaza, AccionNeWaza, AccionCombinada, Amonestacion,
+    Competidor, Competicion, Reporte,
+)
+
+
+@receiver(eventos_registrados)
+def actualizar_resumenes(sender, combate, eventos, **kwargs):
+    """
+    Mantiene los resúmenes diarios y de técnicas cuando cambia un combate que cuenta
+    para ellos: acciones o correcciones de un combate finalizado, su finalización, o su reapertura.
+    """
+    reabierto = any(evento.tipo == 'correccion' and 'finalizado' in evento.datos for evento in eventos)
+    if combate.finalizado or reabierto:
+        ResumenDiarioCompetidor.actualizar_combate(combate)
+        ResumenTecnicaCompetidor.actualizar_combate(combate)
+
+
+@receiver(post_save, sender=Combate)
+def actualizar_resumenes_combate_editado(sender, instance, created, **kwargs):
+    """
+    Cambiar la competición o un competidor de un combate no registra eventos: se
+    recalculan los resúmenes de las claves anteriores y de las nuevas, y los reportes
+    de todos esos competidores se regeneran completos.
+    """
+    anteriores = getattr(instance, '_claves_guardadas', None)
+    actuales = instance.claves_resumen()
+    instance._claves_guardadas = actuales
+    if created or anteriores is None or anteriores == actuales:
+        return
+    
+    # fecha_hora se fija al crear el combate: es la misma para ambas claves
+    fecha = timezone.localdate(instance.fecha_hora)
+    claves = set()
+    competidores = set()
+    for competicion_id, competidor1_id, competidor2_id in (anteriores, actuales):
+        claves.update((competicion_id, fecha, competidor_id) for competidor_id in (competidor1_id, competidor2_id))
+        competidores.update((competidor1_id, competidor2_id))
+    
+    ResumenDiarioCompetidor.actualizar(claves)
+    ResumenTecnicaCompetidor.actualizar_combate(instance)
+    Reporte.objects.filter(competidores__in=competidores).update(marca_evento=None)
+
+
+@receiver(post_delete, sender=Combate)
+def invalidar_marcas_combate_eliminado(sender, instance, **kwargs):
+    """
+    Al eliminar un combate se pierden también sus eventos, así que la marca de
+    agua no lo detecta: los reportes de sus competidores se regeneran completos.
+    """
+    Reporte.objects.filter(
+        competidores__in=[instance.competidor1_id, instance.competidor2_id]
+    ).update(marca_evento=None)
+    # Su aportación al resumen de técnicas se elimina en cascada con el combate
+    if instance.finalizado:
+        ResumenDiarioCompetidor.actualizar_combate(instance)
+
+
+def invalidar_generales(sender, **kwargs):
+    """Invalida los totales en caché; la versión se vuelve a incrementar al confirmar la escritura"""
+    invalidar_estadisticas_generales()
+
+
+# Las acciones insertadas en bloque no emiten post_save, pero siempre registran eventos
+eventos_registrados.connect(invalidar_generales, dispatch_uid='generales_eventos')
+for modelo in MODELOS_GENERALES:
+    post_save.connect(invalidar_generales, sender=modelo, dispatch_uid=f'generales_guardado_{modelo.__name__}')
+    post_delete.connect(invalidar_generales, sender=modelo, dispatch_uid=f'generales_eliminado_{modelo.__name__}')
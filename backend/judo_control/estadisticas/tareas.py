@@ -0,0 +1,143 @@
+"""
+Ejecución en segundo plano de la generación de reportes.
+
+Las tareas se ejecutan en un ThreadPoolExecutor del propio proceso, sin broker
+externo. Cada tarea se lanza al confirmarse la transacción que la crea, y su
+progreso se guarda en TareaReporte (o TareaLotePDF para los lotes de PDF) para
+que el frontend lo consulte.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+
+from .models import TareaLotePDF, TareaReporte
+from .pdf import generar_lote, nombre_lote, reportes_para_lote
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+_candado = threading.Lock()
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    with _candado:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(
+                max_workers=settings.REPORTES_TRABAJADORES,
+                thread_name_prefix='reportes'
+            )
+    return _ejecutor
+
+
+def _encolar(activas, crear, ejecutar):
+    """
+    Crea una tarea con `crear()` y la lanza con `ejecutar(tarea_id)` al confirmar la
+    transacción, salvo que `activas` (las tareas activas equivalentes) ya tenga una.
+    Devuelve (tarea, creada).
+    """
+    activa = activas.first()
+    if activa and activa.interrumpida:
+        activa.fallar('La tarea se interrumpió sin terminar')
+    elif activa:
+        return activa, False
+
+    try:
+        with transaction.atomic():
+            tarea = crear()
+    except IntegrityError:
+        # Otra petición creó la tarea activa entre la consulta y la inserción
+        return activas.get(), False
+
+    transaction.on_commit(lambda: _lanzar(ejecutar, tarea.id))
+    return tarea, True
+
+
+def encolar_generacion(reporte, usuario=None):
+    """
+    Encola la generación de estadísticas del reporte y devuelve (tarea, creada).
+    Si ya hay una tarea activa para el reporte se devuelve esa en lugar de crear otra.
+    """
+    return _encolar(
+        reporte.tareas.filter(estado__in=TareaReporte.ESTADOS_ACTIVOS),
+        lambda: TareaReporte.objects.create(
+            reporte=reporte,
+            solicitada_por=usuario,
+            total=reporte.competidores.count()
+        ),
+        ejecutar_tarea
+    )
+
+
+def encolar_lote_pdf(competicion_id=None, fecha_inicio=None, fecha_fin=None, usuario=None):
+    """
+    Encola el ZIP con los PDF de los reportes de `reportes_para_lote` y devuelve
+    (tarea, creada). Si ya se está generando el mismo lote se devuelve esa tarea.
+    """
+    nombre = nombre_lote(competicion_id, fecha_inicio, fecha_fin)
+    return _encolar(
+        TareaLotePDF.objects.filter(nombre=nombre, estado__in=TareaLotePDF.ESTADOS_ACTIVOS),
+        lambda: TareaLotePDF.objects.create(
+            nombre=nombre,
+            competicion_id=competicion_id,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            solicitada_por=usuario,
+            total=reportes_para_lote(competicion_id, fecha_inicio, fecha_fin).count()
+        ),
+        ejecutar_lote_pdf
+    )
+
+
+def _lanzar(ejecutar, tarea_id):
+    if settings.REPORTES_EJECUCION_SINCRONA:
+        ejecutar(tarea_id)
+    else:
+        _obtener_ejecutor().submit(_ejecutar_en_hilo, ejecutar, tarea_id)
+
+
+def _ejecutar_en_hilo(ejecutar, tarea_id):
+    try:
+        ejecutar(tarea_id)
+    finally:
+        # Cada hilo abre sus propias conexiones
+        connections.close_all()
+
+
+def ejecutar_tarea(tarea_id):
+    """Genera las estadísticas del reporte de una tarea registrando su progreso"""
+    tarea = TareaReporte.objects.select_related('reporte').get(pk=tarea_id)
+    if not tarea.activa:
+        return tarea
+
+    tarea.iniciar()
+    try:
+        tarea.reporte.generar_estadisticas(progreso=tarea.avanzar)
+    except Exception as error:
+        logger.exception('Error generando el reporte %s', tarea.reporte_id)
+        tarea.fallar(str(error) or type(error).__name__)
+    else:
+        tarea.completar()
+    return tarea
+
+
+def ejecutar_lote_pdf(tarea_id):
+    """Renderiza los PDF de un lote y guarda la ruta de su ZIP en la tarea"""
+    tarea = TareaLotePDF.objects.get(pk=tarea_id)
+    if not tarea.activa:
+        return tarea
+
+    tarea.iniciar()
+    try:
+        reportes = reportes_para_lote(tarea.competicion_id, tarea.fecha_inicio, tarea.fecha_fin)
+        ruta = generar_lote(reportes, tarea.nombre, progreso=tarea.avanzar)
+    except Exception as error:
+        logger.exception('Error generando el lote de PDF %s', tarea.nombre)
+        tarea.fallar(str(error) or type(error).__name__)
+    else:
+        tarea.completar(archivo=os.path.relpath(ruta, settings.MEDIA_ROOT))
+    return tarea
@@ -0,0 +1,453 @@
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from combates.models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada
+from competiciones.models import Competicion
+from competidores.models import Competidor
+from estadisticas.models import Reporte, EstadisticaCompetidor, ResumenDiarioCompetidor, ResumenTecnicaCompetidor, TareaReporte
+from estadisticas.agregados import calcular_contadores
+from estadisticas.tareas import encolar_generacion
+from django.utils import timezone
+from datetime import date, timedelta
+
+Usuario = get_user_model()
+
+
+class ReporteTestBase(TestCase):
+    """Base con una competición y utilidades para poblar combates finalizados"""
+
+    def setUp(self):
+        """Configuración inicial para las pruebas"""
+        self.usuario = Usuario.objects.create_user(
+            email='reportes@example.com',
+            nombre='Entrenador Reportes',
+            rol='entrenador'
+        )
+        self.competicion = Competicion.objects.create(
+            nombre='Torneo Reportes',
+            fecha=date.today(),
+            evento='combate_oficial',
+            tipo='nacional',
+            cantidad_atletas=20,
+            cantidad_combates_planificados=20,
+            creado_por=self.usuario
+        )
+        self.reporte = Reporte.objects.create(
+            titulo='Reporte de prueba',
+            tipo='comparativo',
+            fecha_inicio=date.today() - timedelta(days=1),
+            fecha_fin=date.today() + timedelta(days=1)
+        )
+
+    def crear_competidores(self, cantidad, desde=0):
+        competidores = [
+            Competidor.objects.create(
+                identificacion_personal=f'9001030{desde + i:04d}',
+                nombre=f'Competidor {desde + i}',
+                genero='M',
+                division_peso='73',
+                categoria='sub21_juvenil',
+                anos_experiencia=2
+            )
+            for i in range(cantidad)
+        ]
+        self.competicion.competidores.add(*competidores)
+        self.reporte.competidores.add(*competidores)
+        return competidores
+
+    def crear_combate(self, competidor1, competidor2, acciones=1):
+        """Combate finalizado con acciones de todos los tipos para ambos competidores"""
+        combate = Combate.objects.create(
+            competicion=self.competicion,
+            competidor1=competidor1,
+            competidor2=competidor2,
+            iniciado=True,
+            registrado_por=self.usuario
+        )
+        tiempo = timedelta(seconds=30)
+        for _ in range(acciones):
+            for competidor in (competidor1, competidor2):
+                AccionTashiWaza.objects.create(
+                    combate=combate, competidor=competidor, tipo='kata_te_waza', tecnica='seoi_nage',
+                    puntuacion='sin_puntuacion', tiempo=tiempo, registrado_por=self.usuario
+                )
+                AccionNeWaza.objects.create(
+                    combate=combate, competidor=competidor, tipo='shime_waza', tecnica='hadaka_jime',
+                    efectiva=False, tiempo=tiempo, registrado_por=self.usuario
+                )
+                Amonestacion.objects.create(
+                    combate=combate, competidor=competidor, tipo='shido', tiempo=tiempo, registrado_por=self.usuario
+                )
+        combinada = AccionCombinada.objects.create(
+            combate=combate, competidor=competidor1, descripcion='Ashi waza - Koshi waza (A-K)',
+            tiempo=tiempo, efectiva=True, puntuacion='waza_ari', registrado_por=self.usuario
+        )
+        AccionTashiWaza.objects.create(
+            combate=combate, competidor=competidor1, tipo='ashi_waza', tecnica='ouchi_gari',
+            puntuacion='sin_puntuacion', accion_combinada=combinada, tiempo=tiempo, registrado_por=self.usuario
+        )
+        AccionTashiWaza.objects.create(
+            combate=combate, competidor=competidor1, tipo='koshi_waza', tecnica='harai_goshi',
+            puntuacion='waza_ari', accion_combinada=combinada, tiempo=tiempo, registrado_por=self.usuario
+        )
+        combate.finalizar(competidor1)
+        return combate
+
+
+class GenerarEstadisticasTest(ReporteTestBase):
+    """Pruebas de la generación de estadísticas de un reporte"""
+
+    def test_contadores_del_competidor(self):
+        """Prueba que los contadores agregados coinciden con las acciones registradas"""
+        competidor1, competidor2 = self.crear_competidores(2)
+        self.crear_combate(competidor1, competidor2, acciones=2)
+        self.crear_combate(competidor2, competidor1)
+
+        self.reporte.generar_estadisticas()
+
+        estadistica = EstadisticaCompetidor.objects.get(reporte=self.reporte, competidor=competidor1)
+        self.assertEqual(estadistica.total_combates, 2)
+        self.assertEqual(estadistica.combates_ganados, 1)
+        self.assertEqual(estadistica.combates_perdidos, 1)
+        self.assertEqual(estadistica.total_ataques_tashi_waza, 5)
+        self.assertEqual(estadistica.kata_te_waza, 3)
+        self.assertEqual(estadistica.ashi_waza, 1)
+        self.assertEqual(estadistica.combinaciones, 2)
+        self.assertEqual(estadistica.ataques_combinados, 1)
+        self.assertEqual(estadistica.tecnicas_positivas_combinadas, 1)
+        self.assertEqual(estadistica.tecnicas_negativas_combinadas, 1)
+        self.assertEqual(estadistica.ataques_positivos, 2)
+        self.assertEqual(estadistica.ataques_negativos, 5)
+        self.assertEqual(estadistica.wazari, 2)
+        self.assertEqual(estadistica.estrangulaciones, 3)
+        self.assertEqual(estadistica.shido, 3)
+
+        rival = EstadisticaCompetidor.objects.get(reporte=self.reporte, competidor=competidor2)
+        self.assertEqual(rival.ataques_combinados, 1)
+        self.assertEqual(rival.combates_ganados, 1)
+
+    def test_regenerar_conserva_observaciones(self):
+        """Prueba que regenerar el reporte no borra las notas del entrenador"""
+        competidor1, competidor2 = self.crear_competidores(2)
+        self.crear_combate(competidor1, competidor2)
+        self.reporte.generar_estadisticas()
+        EstadisticaCompetidor.objects.filter(competidor=competidor1).update(observaciones='Mejorar agarre')
+
+        self.reporte.generar_estadisticas()
+
+        self.assertEqual(
+            EstadisticaCompetidor.objects.get(reporte=self.reporte, competidor=competidor1).observaciones,
+            'Mejorar agarre'
+        )
+        self.assertEqual(self.reporte.estadisticas.count(), 2)
+
+    def test_consultas_independientes_del_volumen(self):
+        """Prueba que el número de consultas no crece con competidores ni acciones"""
+        competidores = self.crear_competidores(2)
+        self.crear_combate(*competidores)
+        with CaptureQueriesContext(connection) as pequeno:
+            self.reporte.generar_estadisticas()
+
+        competidores += self.crear_competidores(10, desde=2)
+        for indice in range(0, len(competidores), 2):
+            self.crear_combate(competidores[indice], competidores[indice + 1], acciones=5)
+        with CaptureQueriesContext(connection) as grande:
+            self.reporte.generar_estadisticas()
+
+        self.assertEqual(len(grande), len(pequeno))
+        self.assertEqual(self.reporte.estadisticas.count(), 12)
+
+
+
+class GeneracionIncrementalTest(ReporteTestBase):
+    """Pruebas de la regeneración incremental a partir de la marca de agua"""
+
+    def setUp(self):
+        super().setUp()
+        self.competidores = self.crear_competidores(4)
+        self.crear_combate(self.competidores[0], self.competidores[1])
+        self.crear_combate(self.competidores[2], self.competidores[3])
+        self.reporte.generar_estadisticas()
+
+    def estadistica(self, competidor):
+        return EstadisticaCompetidor.objects.get(reporte=self.reporte, competidor=competidor)
+
+    def test_solo_recalcula_competidores_con_cambios(self):
+        """Prueba que un combate nuevo solo actualiza a sus dos competidores"""
+        ajenas = list(EstadisticaCompetidor.objects.filter(
+            competidor__in=self.competidores[2:]
+        ).order_by('id').values())
+        self.crear_combate(self.competidores[1], self.competidores[0])
+
+        actualizadas = self.reporte.generar_estadisticas()
+
+        self.assertEqual({e.competidor_id for e in actualizadas}, {c.id for c in self.competidores[:2]})
+        self.assertEqual(self.estadistica(self.competidores[0]).total_combates, 2)
+        self.assertEqual(self.estadistica(self.competidores[1]).combates_ganados, 1)
+        self.assertEqual(list(EstadisticaCompetidor.objects.filter(
+            competidor__in=self.competidores[2:]
+        ).order_by('id').values()), ajenas)
+
+    def test_sin_cambios_no_recalcula(self):
+        """Prueba que regenerar sin cambios no ejecuta las consultas de contadores"""
+        with CaptureQueriesContext(connection) as consultas:
+            actualizadas = self.reporte.generar_estadisticas()
+
+        self.assertEqual(actualizadas, [])
+        self.assertFalse([q for q in consultas if 'combates_acciontashiwaza' in q['sql']])
+
+    def test_correccion_de_accion(self):
+        """Prueba que eliminar una acción de un combate ya incluido se refleja"""
+        AccionNeWaza.objects.filter(competidor=self.competidores[2]).delete()
+
+        self.reporte.generar_estadisticas()
+
+        self.assertEqual(self.estadistica(self.competidores[2]).total_acciones_ne_waza, 0)
+        self.assertEqual(self.estadistica(self.competidores[0]).total_acciones_ne_waza, 1)
+
+    def test_combate_eliminado_regenera_completo(self):
+        """Prueba que eliminar un combate, que borra sus eventos, fuerza la regeneración completa"""
+        Combate.objects.filter(competidor1=self.competidores[2]).delete()
+
+        self.reporte.generar_estadisticas()
+
+        self.assertEqual(self.estadistica(self.competidores[2]).total_combates, 0)
+        self.assertEqual(self.estadistica(self.competidores[3]).total_combates, 0)
+
+    def test_cambio_de_configuracion_regenera_completo(self):
+        """Prueba que ampliar los competidores del reporte recalcula con la nueva configuración"""
+        nuevo, = self.crear_competidores(1, desde=4)
+
+        self.reporte.generar_estadisticas()
+
+        self.assertEqual(self.reporte.estadisticas.count(), 5)
+        self.assertEqual(self.estadistica(nuevo).total_combates, 0)
+
+
+
+class ResumenDiarioCompetidorTest(ReporteTestBase):
+    """Pruebas del mantenimiento de los resúmenes diarios por competidor"""
+
+    def setUp(self):
+        super().setUp()
+        self.competidor1, self.competidor2 = self.crear_competidores(2)
+        self.combate = self.crear_combate(self.competidor1, self.competidor2, acciones=2)
+
+    def resumen(self, competidor):
+        return ResumenDiarioCompetidor.objects.get(competidor=competidor, competicion=self.competicion)
+
+    def test_finalizar_crea_resumenes(self):
+        """Prueba que finalizar un combate crea los resúmenes de ambos competidores"""
+        esperado = calcular_contadores(Combate.objects.filter(pk=self.combate.pk), [self.competidor1.id])
+        resumen = self.resumen(self.competidor1)
+
+        self.assertEqual(resumen.fecha, date.today())
+        for campo, valor in esperado[self.competidor1.id].items():
+            self.assertEqual(getattr(resumen, campo), valor, campo)
+        self.assertEqual(self.resumen(self.competidor2).combates_perdidos, 1)
+
+    def test_combate_en_curso_no_cuenta(self):
+        """Prueba que las acciones de un combate sin finalizar no entran en el resumen"""
+        competidor3, competidor4 = self.crear_competidores(2, desde=2)
+        combate = Combate.objects.create(
+            competicion=self.competicion, competidor1=competidor3, competidor2=competidor4,
+            iniciado=True, registrado_por=self.usuario
+        )
+        Amonestacion.objects.create(
+            combate=combate, competidor=competidor3, tipo='shido',
+            tiempo=timedelta(seconds=5), registrado_por=self.usuario
+        )
+
+        self.assertFalse(ResumenDiarioCompetidor.objects.filter(competidor=competidor3).exists())
+
+    def test_correccion_tras_finalizar(self):
+        """Prueba que corregir una acción de un combate finalizado actualiza el resumen"""
+        Amonestacion.objects.filter(combate=self.combate, competidor=self.competidor1).first().delete()
+
+        self.assertEqual(self.resumen(self.competidor1).shido, 1)
+
+    def test_combate_eliminado(self):
+        """Prueba que eliminar el único combate del día elimina los resúmenes"""
+        self.combate.delete()
+
+        self.assertFalse(ResumenDiarioCompetidor.objects.exists())
+
+    def test_combate_movido_de_competicion_y_competidor(self):
+        """Prueba que cambiar la competición o un competidor actualiza las claves antiguas y nuevas"""
+        self.reporte.generar_estadisticas()
+        competidor3, = self.crear_competidores(1, desde=2)
+        otra = Competicion.objects.create(
+            nombre='Otro Torneo', fecha=date.today(), evento='combate_oficial', tipo='nacional',
+            cantidad_atletas=20, cantidad_combates_planificados=20, creado_por=self.usuario
+        )
+
+        combate = Combate.objects.get(pk=self.combate.pk)
+        combate.competicion = otra
+        combate.competidor2 = competidor3
+        combate.save()
+
+        self.assertEqual(
+            set(ResumenDiarioCompetidor.objects.values_list('competicion', 'competidor')),
+            {(otra.id, self.competidor1.id), (otra.id, competidor3.id)}
+        )
+        self.reporte.refresh_from_db()
+        self.assertIsNone(self.reporte.marca_evento)
+
+    def test_reconstruir_por_dias(self):
+        """Prueba que la reconstrucción separa los días y el reporte suma los resúmenes"""
+        otro = self.crear_combate(self.competidor2, self.competidor1)
+        Combate.objects.filter(pk=otro.pk).update(fecha_hora=otro.fecha_hora - timedelta(days=1))
+        ResumenDiarioCompetidor.objects.all().delete()
+
+        total = ResumenDiarioCompetidor.reconstruir()
+        self.reporte.generar_estadisticas()
+
+        self.assertEqual(total, 4)
+        self.assertEqual(
+            set(ResumenDiarioCompetidor.objects.filter(competidor=self.competidor1).values_list('fecha', flat=True)),
+            {date.today(), date.today() - timedelta(days=1)}
+        )
+        estadistica = EstadisticaCompetidor.objects.get(reporte=self.reporte, competidor=self.competidor1)
+        self.assertEqual(estadistica.total_combates, 2)
+        self.assertEqual(estadistica.combates_ganados, 1)
+        self.assertEqual(estadistica.shido, 3)
+
+
+
+class ResumenTecnicaCompetidorTest(ReporteTestBase):
+    """Pruebas del resumen de técnicas por competidor"""
+
+    def setUp(self):
+        super().setUp()
+        self.competidor1, self.competidor2 = self.crear_competidores(2)
+        self.combate = self.crear_combate(self.competidor1, self.competidor2, acciones=2)
+
+    def test_filas_por_tecnica_y_combinacion(self):
+        """Prueba que el resumen separa técnicas sueltas y dentro de combinaciones"""
+        filas = {
+            (fila.tecnica, fila.puntuacion, fila.en_combinacion): (fila.total, fila.efectivas)
+            for fila in ResumenTecnicaCompetidor.objects.filter(competidor=self.competidor1)
+        }
+
+        self.assertEqual(filas, {
+            ('seoi_nage', 'sin_puntuacion', False): (2, 2),
+            ('hadaka_jime', 'sin_puntuacion', False): (2, 0),
+            ('ouchi_gari', 'sin_puntuacion', True): (1, 1),
+            ('harai_goshi', 'waza_ari', True): (1, 1),
+        })
+
+    def test_correccion_tras_finalizar(self):
+        """Prueba que eliminar una acción de un combate finalizado actualiza el resumen"""
+        AccionTashiWaza.objects.filter(competidor=self.competidor1, tecnica='harai_goshi').delete()
+
+        self.assertFalse(ResumenTecnicaCompetidor.objects.filter(tecnica='harai_goshi').exists())
+
+    def test_correccion_solo_sustituye_su_combate(self):
+        """Prueba que corregir un combate no reescribe la aportación de los demás combates"""
+        otro = self.crear_combate(self.competidor2, self.competidor1)
+        anteriores = list(ResumenTecnicaCompetidor.objects.filter(combate=self.combate).order_by('id').values())
+
+        AccionTashiWaza.objects.filter(combate=otro, tecnica='harai_goshi').delete()
+
+        self.assertEqual(
+            list(ResumenTecnicaCompetidor.objects.filter(combate=self.combate).order_by('id').values()), anteriores
+        )
+        self.assertFalse(ResumenTecnicaCompetidor.objects.filter(combate=otro, tecnica='harai_goshi').exists())
+        self.assertEqual(
+            ResumenTecnicaCompetidor.por_tecnica(
+                ResumenTecnicaCompetidor.objects.filter(competidor=self.competidor1, tecnica='seoi_nage')
+            ).get()['usos'],
+            3
+        )
+
+    def test_por_tecnica(self):
+        """Prueba la agregación por técnica con puntos y uso en combinaciones"""
+        self.crear_combate(self.competidor2, self.competidor1)
+
+        filas = {
+            fila['tecnica']: fila
+            for fila in ResumenTecnicaCompetidor.por_tecnica(ResumenTecnicaCompetidor.objects.all())
+        }
+
+        self.assertEqual(filas['seoi_nage']['usos'], 6)
+        self.assertEqual(filas['harai_goshi']['usos'], 2)
+        self.assertEqual(filas['harai_goshi']['puntos'], 14)
+        self.assertEqual(filas['harai_goshi']['en_combinacion'], 2)
+        self.assertEqual(filas['seoi_nage']['puntuadas'], 0)
+
+    def test_reconstruir(self):
+        """Prueba que la reconstrucción reproduce el resumen mantenido"""
+        antes = sorted(ResumenTecnicaCompetidor.objects.values_list(
+            'competidor', 'modalidad', 'tipo', 'tecnica', 'puntuacion', 'en_combinacion', 'total', 'efectivas'
+        ))
+
+        ResumenTecnicaCompetidor.reconstruir()
+
+        self.assertEqual(sorted(ResumenTecnicaCompetidor.objects.values_list(
+            'competidor', 'modalidad', 'tipo', 'tecnica', 'puntuacion', 'en_combinacion', 'total', 'efectivas'
+        )), antes)
+
+    def test_reconstruir_desde_fecha(self):
+        """Prueba que la reconstrucción acotada solo recalcula los combates desde la fecha"""
+        otro = self.crear_combate(self.competidor2, self.competidor1)
+        Combate.objects.filter(pk=self.combate.pk).update(fecha_hora=timezone.now() - timedelta(days=30))
+        ResumenTecnicaCompetidor.objects.all().delete()
+
+        ResumenTecnicaCompetidor.reconstruir(desde=timezone.localdate() - timedelta(days=7))
+
+        self.assertEqual(set(ResumenTecnicaCompetidor.objects.values_list('combate', flat=True)), {otro.id})
+
+
+@override_settings(REPORTES_EJECUCION_SINCRONA=True, REPORTES_TAMANO_LOTE=3)
+class TareaReporteTest(ReporteTestBase):
+    """Pruebas de la generación de reportes en segundo plano"""
+
+    def test_tarea_completa_con_progreso(self):
+        """Prueba que la tarea procesa a todos los competidores por lotes"""
+        competidores = self.crear_competidores(8)
+        self.crear_combate(competidores[0], competidores[1])
+        avances = []
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tarea, creada = encolar_generacion(self.reporte, self.usuario)
+        tarea.refresh_from_db()
+
+        self.assertTrue(creada)
+        self.assertEqual(tarea.estado, 'completada')
+        self.assertEqual(tarea.procesados, tarea.total)
+        self.assertEqual(tarea.total, 8)
+        self.assertIsNotNone(tarea.finalizada)
+        self.assertEqual(self.reporte.estadisticas.count(), 8)
+
+        self.reporte.generar_estadisticas(
+            progreso=lambda procesados, total: avances.append(procesados), completo=True
+        )
+        self.assertEqual(avances, [3, 6, 8])
+
+    def test_tarea_activa_se_reutiliza(self):
+        """Prueba que solicitar de nuevo un reporte en curso no crea otra tarea"""
+        self.crear_competidores(2)
+        with self.captureOnCommitCallbacks(execute=False):
+            tarea, _ = encolar_generacion(self.reporte)
+            repetida, creada = encolar_generacion(self.reporte)
+
+        self.assertFalse(creada)
+        self.assertEqual(repetida.pk, tarea.pk)
+        self.assertEqual(TareaReporte.objects.filter(reporte=self.reporte).count(), 1)
+
+    def test_tarea_interrumpida_se_reemplaza(self):
+        """Prueba que una tarea activa sin avances recientes se marca como error"""
+        with self.captureOnCommitCallbacks(execute=False):
+            tarea, _ = encolar_generacion(self.reporte)
+        TareaReporte.objects.filter(pk=tarea.pk).update(
+            actualizada=timezone.now() - timedelta(hours=2)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nueva, creada = encolar_generacion(self.reporte)
+
+        tarea.refresh_from_db()
+        self.assertTrue(creada)
+        self.assertEqual(tarea.estado, 'error')
+        self.assertNotEqual(nueva.pk, tarea.pk)
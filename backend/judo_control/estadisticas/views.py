@@ -2,172 +2,159 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Sum, F, Q
-from .models import Reporte, EstadisticaCompetidor
-from .serializers import ReporteSerializer, EstadisticaCompetidorSerializer
+from django.db.models import Count, Sum, F, Q, Case, When
+from .models import (
+    Reporte, EstadisticaCompetidor, ResumenDiarioCompetidor, ResumenTecnicaCompetidor, TareaLotePDF, TareaReporte
+)
+from .serializers import (
+    ReporteSerializer, EstadisticaCompetidorSerializer, TareaLotePDFSerializer, TareaReporteSerializer
+)
+from .tareas import encolar_generacion, encolar_lote_pdf
+from .pdf import abrir_pdf, nombre_descarga, reportes_para_lote
+from django.conf import settings
+from .agregados import (
+    CAMPOS_CONTADORES, calcular_contadores, combates_del_reporte, estadisticas_generales, resumen_combinaciones
+)
+from api.cache import respuesta_cacheada, incrementar_version, TODAS
 from usuarios.views import EsEntrenador
 from competidores.models import Competidor
 from competidores.serializers import CompetidorSerializer
 from combates.models import Combate, AccionTashiWaza, AccionNeWaza, Amonestacion, AccionCombinada
 from competiciones.models import Competicion
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from rest_framework.decorators import action
-from rest_framework.response import Response
-import io
-from datetime import datetime
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.dateparse import parse_date
+from datetime import date
+import os
 
 class ReporteViewSet(viewsets.ModelViewSet):
     queryset = Reporte.objects.all()
     serializer_class = ReporteSerializer
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'generar_estadisticas']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'generar_estadisticas', 'exportar_lote']:
             permission_classes = [EsEntrenador]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    @respuesta_cacheada('reporte', lambda pk: [('reporte', pk), ('competidor', TODAS)])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'])
     def generar_estadisticas(self, request, pk=None):
+        """
+        Encola la generación de estadísticas y responde de inmediato con la tarea.
+        El progreso se consulta en /tareas-reporte/{id}/; si ya hay una tarea en
+        curso para este reporte se devuelve esa misma.
+        """
         reporte = self.get_object()
+        tarea, creada = encolar_generacion(reporte, request.user)
         
-        # Eliminar estadísticas existentes para este reporte
-        EstadisticaCompetidor.objects.filter(reporte=reporte).delete()
-        
-        for competidor in reporte.competidores.all():
-            # Filtrar combates por período y competiciones si se especifican
-            combates_query = Combate.objects.filter(
-                Q(competidor1=competidor) | Q(competidor2=competidor),
-                fecha_hora__date__gte=reporte.fecha_inicio,
-                fecha_hora__date__lte=reporte.fecha_fin,
-                finalizado=True
-            )
-            
-            if reporte.competiciones.exists():
-                combates_query = combates_query.filter(competicion__in=reporte.competiciones.all())
-            
-            # Contar combates
-            total_combates = combates_query.count()
-            combates_ganados = combates_query.filter(ganador=competidor).count()
-            
-            # NUEVAS ESTADÍSTICAS DE ATAQUES COMBINADOS
-            acciones_combinadas = AccionCombinada.objects.filter(
-                competidor=competidor,
-                combate__in=combates_query
-            )
-            
-            total_ataques_combinados = acciones_combinadas.count()
-            
-            # AGREGAR: Contar puntuaciones de acciones combinadas
-            acciones_combinadas_ippon = acciones_combinadas.filter(puntuacion='ippon').count()
-            acciones_combinadas_waza_ari = acciones_combinadas.filter(puntuacion='waza_ari').count()
-            
-            # Técnicas positivas y negativas en combinaciones
-            # CORREGIDO: Contar las AccionCombinada directamente según su efectividad
-            tecnicas_positivas_combinadas = 0
-            tecnicas_negativas_combinadas = 0
-            
-            for accion_combinada in acciones_combinadas:
-                # Contar técnicas Tashi Waza en esta combinación (si existen)
-                tashi_en_combinacion = AccionTashiWaza.objects.filter(accion_combinada=accion_combinada)
-                tecnicas_positivas_combinadas += tashi_en_combinacion.exclude(puntuacion='sin_puntuacion').count()
-                tecnicas_negativas_combinadas += tashi_en_combinacion.filter(puntuacion='sin_puntuacion').count()
-                
-                # Contar técnicas Ne Waza en esta combinación (si existen)
-                ne_en_combinacion = AccionNeWaza.objects.filter(accion_combinada=accion_combinada)
-                tecnicas_positivas_combinadas += ne_en_combinacion.filter(efectiva=True).count()
-                tecnicas_negativas_combinadas += ne_en_combinacion.filter(efectiva=False).count()
-                
-                # NUEVO: Si no hay técnicas individuales relacionadas, contar la AccionCombinada directamente
-                if tashi_en_combinacion.count() == 0 and ne_en_combinacion.count() == 0:
-                    if accion_combinada.efectiva or accion_combinada.puntuacion != 'sin_puntuacion':
-                        tecnicas_positivas_combinadas += 1
-                    else:
-                        tecnicas_negativas_combinadas += 1
-            
-            # Acciones Tashi Waza
-            acciones_tashi = AccionTashiWaza.objects.filter(
-                competidor=competidor,
-                combate__in=combates_query
-            )
-            
-            total_ataques_tashi = acciones_tashi.count()
-            ataques_positivos = acciones_tashi.exclude(puntuacion='sin_puntuacion').count() + tecnicas_positivas_combinadas
-            ataques_negativos = acciones_tashi.filter(puntuacion='sin_puntuacion').count() + tecnicas_negativas_combinadas
-            
-            wazari = acciones_tashi.filter(puntuacion='waza_ari').count()
-            ippon = acciones_tashi.filter(puntuacion='ippon').count()
-            
-            ashi_waza = acciones_tashi.filter(tipo='ashi_waza').count()
-            koshi_waza = acciones_tashi.filter(tipo='koshi_waza').count()
-            kata_te_waza = acciones_tashi.filter(tipo='te_waza').count()
-            sutemi_waza = acciones_tashi.filter(Q(tipo='ma_sutemi_waza') | Q(tipo='yoko_sutemi_waza')).count()
-            
-            combinaciones_tashi = acciones_tashi.filter(accion_combinada__isnull=False).count()
-            
-            # MODIFICAR: Incluir puntuaciones de acciones combinadas en los totales
-            ippon_total = ippon + acciones_combinadas_ippon
-            waza_ari_total = wazari + acciones_combinadas_waza_ari
-            
-            # Acciones Ne Waza
-            acciones_ne = AccionNeWaza.objects.filter(
-                competidor=competidor,
-                combate__in=combates_query
+        return Response(
+            TareaReporteSerializer(tarea).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': f'/api/tareas-reporte/{tarea.id}/'}
+        )
+    
+    @action(detail=True, methods=['get'])
+    def exportar_pdf(self, request, pk=None):
+        """
+        Descarga el reporte en PDF. El archivo se renderiza solo cuando cambian sus
+        estadísticas; mientras tanto se sirve el guardado en disco.
+        """
+        reporte = self.get_object()
+        archivo, ruta = abrir_pdf(reporte)
+        etag = '"{}"'.format(os.path.basename(ruta)[:-len('.pdf')])
+        if request.headers.get('If-None-Match') == etag:
+            archivo.close()
+            return HttpResponseNotModified(headers={'ETag': etag})
+        
+        respuesta = FileResponse(
+            archivo, as_attachment=True,
+            filename=nombre_descarga(reporte), content_type='application/pdf'
+        )
+        respuesta['ETag'] = etag
+        return respuesta
+    
+    @action(detail=False, methods=['post'])
+    def exportar_lote(self, request):
+        """
+        Encola el ZIP con los PDF de todos los reportes de una `competicion` y/o cuyo
+        período se solapa con `fecha_inicio`-`fecha_fin` (AAAA-MM-DD). Responde de
+        inmediato con la tarea; el ZIP se descarga de su `url_descarga` al completarse.
+        """
+        filtros = {}
+        for parametro in ('fecha_inicio', 'fecha_fin'):
+            valor = request.data.get(parametro)
+            try:
+                filtros[parametro] = date.fromisoformat(valor) if valor else None
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': f'{parametro} debe tener el formato AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        competicion_id = request.data.get('competicion')
+        if competicion_id is not None and not str(competicion_id).isdigit():
+            return Response({'error': 'competicion debe ser un id'}, status=status.HTTP_400_BAD_REQUEST)
+        if competicion_id is not None:
+            competicion_id = int(competicion_id)
+        if competicion_id is None and not any(filtros.values()):
+            return Response(
+                {'error': 'Indique una competicion o un rango de fechas'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            total_acciones_ne = acciones_ne.count()
-            inmovilizaciones = acciones_ne.filter(tipo='osaekomi_waza').count()
-            luxaciones = acciones_ne.filter(tipo='kansetsu_waza').count()
-            estrangulaciones = acciones_ne.filter(tipo='shime_waza').count()
-            
-            combinaciones_ne = acciones_ne.filter(accion_combinada__isnull=False).count()
-            
-            # Amonestaciones
-            amonestaciones = Amonestacion.objects.filter(
-                competidor=competidor,
-                combate__in=combates_query
+        
+        if not reportes_para_lote(competicion_id, filtros['fecha_inicio'], filtros['fecha_fin']).exists():
+            return Response({'error': 'No hay reportes para exportar'}, status=status.HTTP_404_NOT_FOUND)
+        
+        tarea, creada = encolar_lote_pdf(competicion_id, filtros['fecha_inicio'], filtros['fecha_fin'], request.user)
+        return Response(
+            TareaLotePDFSerializer(tarea, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': f'/api/tareas-lote-pdf/{tarea.id}/'}
+        )
+
+class TareaReporteViewSet(viewsets.ReadOnlyModelViewSet):
+    """Estado y progreso de las tareas de generación de reportes"""
+    queryset = TareaReporte.objects.all()
+    serializer_class = TareaReporteSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        reporte_id = self.request.query_params.get('reporte')
+        if reporte_id:
+            queryset = queryset.filter(reporte_id=reporte_id)
+        return queryset
+
+class TareaLotePDFViewSet(viewsets.ReadOnlyModelViewSet):
+    """Estado de las tareas de exportación de lotes de PDF y descarga de su ZIP"""
+    queryset = TareaLotePDF.objects.all()
+    serializer_class = TareaLotePDFSerializer
+    permission_classes = [EsEntrenador]
+    
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        """Descarga el ZIP de una tarea completada"""
+        tarea = self.get_object()
+        if tarea.estado != 'completada':
+            return Response(
+                {'error': 'El lote todavía no está listo', 'estado': tarea.estado},
+                status=status.HTTP_409_CONFLICT
             )
-            
-            shido = amonestaciones.filter(tipo='shido').count()
-            hansokumake = amonestaciones.filter(tipo='hansokumake').count()
-            
-            # Crear estadística con los nuevos campos
-            estadistica = EstadisticaCompetidor.objects.create(
-                reporte=reporte,
-                competidor=competidor,
-                total_combates=total_combates,
-                combates_ganados=combates_ganados,
-                combates_perdidos=total_combates - combates_ganados,
-                total_ataques_tashi_waza=total_ataques_tashi,
-                ataques_positivos=ataques_positivos,
-                ataques_negativos=ataques_negativos,
-                wazari=waza_ari_total,  # CAMBIO: Incluir waza-aris de acciones combinadas
-                yuko=0,
-                ippon=ippon_total,  # CAMBIO: Incluir ippons de acciones combinadas
-                ashi_waza=ashi_waza,
-                koshi_waza=koshi_waza,
-                kata_te_waza=kata_te_waza,
-                sutemi_waza=sutemi_waza,
-                combinaciones=combinaciones_tashi + combinaciones_ne,
-                ataques_combinados=total_ataques_combinados,
-                tecnicas_positivas_combinadas=tecnicas_positivas_combinadas,
-                tecnicas_negativas_combinadas=tecnicas_negativas_combinadas,
-                total_acciones_ne_waza=total_acciones_ne,
-                inmovilizaciones=inmovilizaciones,
-                luxaciones=luxaciones,
-                estrangulaciones=estrangulaciones,
-                shido=shido,
-                hansokumake=hansokumake
+        try:
+            archivo = open(os.path.join(settings.MEDIA_ROOT, tarea.archivo), 'rb')
+        except FileNotFoundError:
+            # Un lote posterior con los mismos filtros sustituye al ZIP
+            return Response(
+                {'error': 'El lote ya no está disponible; vuelva a exportarlo'},
+                status=status.HTTP_410_GONE
             )
-        
-        serializer = self.get_serializer(reporte)
-        return Response(serializer.data)
+        return FileResponse(
+            archivo, as_attachment=True,
+            filename=f'{tarea.nombre}.zip', content_type='application/zip'
+        )
 
 class EstadisticaCompetidorViewSet(viewsets.ModelViewSet):
     queryset = EstadisticaCompetidor.objects.all()
@@ -231,72 +218,57 @@ class EstadisticaCompetidorViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
     
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        incrementar_version('reporte', instance.reporte_id)
+    
     @action(detail=True, methods=['get'])
     def detalles_combinaciones(self, request, pk=None):
-        """Obtener detalles específicos de las acciones combinadas de un competidor"""
+        """
+        Detalle paginado (?page=) de las acciones combinadas del competidor dentro del
+        período y las competiciones del reporte, con un resumen de todas ellas.
+        """
         estadistica = self.get_object()
-        competidor = estadistica.competidor
+        combinadas = AccionCombinada.objects.filter(
+            competidor_id=estadistica.competidor_id,
+            combate__in=combates_del_reporte(estadistica.reporte).values('id')
+        )
         
-        # Obtener todas las acciones combinadas del competidor
-        acciones_combinadas = AccionCombinada.objects.filter(
-            competidor=competidor
-        ).select_related('combate', 'registrado_por')
+        pagina = self.paginate_queryset(
+            combinadas.prefetch_related('acciones_tashi', 'acciones_ne').order_by('combate__fecha_hora', 'tiempo', 'id')
+        )
         
         detalles_combinaciones = []
-        
-        for accion_combinada in acciones_combinadas:
-            # Obtener técnicas Tashi Waza relacionadas
-            tashi_relacionadas = AccionTashiWaza.objects.filter(
-                accion_combinada=accion_combinada
-            ).values('tecnica', 'efectiva', 'puntuacion')
-            
-            # Obtener técnicas Ne Waza relacionadas
-            ne_relacionadas = AccionNeWaza.objects.filter(
-                accion_combinada=accion_combinada
-            ).values('tecnica', 'efectiva', 'puntuacion')
-            
+        for accion_combinada in pagina:
             # Clasificar técnicas por efectividad
             tecnicas_efectivas = []
             tecnicas_no_efectivas = []
             
-            # Procesar técnicas Tashi Waza
-            for tecnica in tashi_relacionadas:
-                tecnica_info = {
-                    'tipo': 'Tashi Waza',
-                    'tecnica': tecnica['tecnica'],
-                    'puntuacion': tecnica['puntuacion']
-                }
-                if tecnica['puntuacion'] != 'sin_puntuacion':
+            for tecnica in accion_combinada.acciones_tashi.all():
+                tecnica_info = {'tipo': 'Tashi Waza', 'tecnica': tecnica.tecnica, 'puntuacion': tecnica.puntuacion}
+                if tecnica.puntuacion != 'sin_puntuacion':
                     tecnicas_efectivas.append(tecnica_info)
                 else:
                     tecnicas_no_efectivas.append(tecnica_info)
             
-            # Procesar técnicas Ne Waza
-            for tecnica in ne_relacionadas:
-                tecnica_info = {
-                    'tipo': 'Ne Waza',
-                    'tecnica': tecnica['tecnica'],
-                    'puntuacion': tecnica['puntuacion']
-                }
-                if tecnica['efectiva']:
+            for tecnica in accion_combinada.acciones_ne.all():
+                tecnica_info = {'tipo': 'Ne Waza', 'tecnica': tecnica.tecnica, 'puntuacion': tecnica.puntuacion}
+                if tecnica.efectiva:
                     tecnicas_efectivas.append(tecnica_info)
                 else:
                     tecnicas_no_efectivas.append(tecnica_info)
             
             # Si no hay técnicas individuales, considerar la acción combinada directamente
-            if not tashi_relacionadas and not ne_relacionadas:
+            if not tecnicas_efectivas and not tecnicas_no_efectivas:
+                tecnica_info = {
+                    'tipo': 'Combinación Directa',
+                    'tecnica': accion_combinada.descripcion,
+                    'puntuacion': accion_combinada.puntuacion
+                }
                 if accion_combinada.efectiva or accion_combinada.puntuacion != 'sin_puntuacion':
-                    tecnicas_efectivas.append({
-                        'tipo': 'Combinación Directa',
-                        'tecnica': accion_combinada.descripcion,
-                        'puntuacion': accion_combinada.puntuacion
-                    })
+                    tecnicas_efectivas.append(tecnica_info)
                 else:
-                    tecnicas_no_efectivas.append({
-                        'tipo': 'Combinación Directa',
-                        'tecnica': accion_combinada.descripcion,
-                        'puntuacion': accion_combinada.puntuacion
-                    })
+                    tecnicas_no_efectivas.append(tecnica_info)
             
             detalles_combinaciones.append({
                 'id': accion_combinada.id,
@@ -305,182 +277,27 @@ class EstadisticaCompetidorViewSet(viewsets.ModelViewSet):
                 'efectiva': accion_combinada.efectiva,
                 'puntuacion': accion_combinada.puntuacion,
                 'tiempo': str(accion_combinada.tiempo),
-                'combate_id': accion_combinada.combate.id,
+                'combate_id': accion_combinada.combate_id,
                 'tecnicas_efectivas': tecnicas_efectivas,
                 'tecnicas_no_efectivas': tecnicas_no_efectivas,
                 'total_tecnicas': len(tecnicas_efectivas) + len(tecnicas_no_efectivas)
             })
         
-        # Resumen estadístico
-        total_combinaciones = len(detalles_combinaciones)
-        combinaciones_efectivas = sum(1 for c in detalles_combinaciones if c['efectiva'])
-        combinaciones_no_efectivas = total_combinaciones - combinaciones_efectivas
-        
-        # Contar tipos de técnicas en combinaciones
-        total_tecnicas_tashi = sum(len([t for t in c['tecnicas_efectivas'] + c['tecnicas_no_efectivas'] if t['tipo'] == 'Tashi Waza']) for c in detalles_combinaciones)
-        total_tecnicas_ne = sum(len([t for t in c['tecnicas_efectivas'] + c['tecnicas_no_efectivas'] if t['tipo'] == 'Ne Waza']) for c in detalles_combinaciones)
-        total_combinaciones_directas = sum(len([t for t in c['tecnicas_efectivas'] + c['tecnicas_no_efectivas'] if t['tipo'] == 'Combinación Directa']) for c in detalles_combinaciones)
-        
-        # Técnicas efectivas vs no efectivas por tipo
-        tecnicas_tashi_efectivas = sum(len([t for t in c['tecnicas_efectivas'] if t['tipo'] == 'Tashi Waza']) for c in detalles_combinaciones)
-        tecnicas_ne_efectivas = sum(len([t for t in c['tecnicas_efectivas'] if t['tipo'] == 'Ne Waza']) for c in detalles_combinaciones)
-        combinaciones_directas_efectivas = sum(len([t for t in c['tecnicas_efectivas'] if t['tipo'] == 'Combinación Directa']) for c in detalles_combinaciones)
-        
-        tecnicas_tashi_no_efectivas = sum(len([t for t in c['tecnicas_no_efectivas'] if t['tipo'] == 'Tashi Waza']) for c in detalles_combinaciones)
-        tecnicas_ne_no_efectivas = sum(len([t for t in c['tecnicas_no_efectivas'] if t['tipo'] == 'Ne Waza']) for c in detalles_combinaciones)
-        combinaciones_directas_no_efectivas = sum(len([t for t in c['tecnicas_no_efectivas'] if t['tipo'] == 'Combinación Directa']) for c in detalles_combinaciones)
-        
         return Response({
-            'resumen': {
-                'total_combinaciones': total_combinaciones,
-                'combinaciones_efectivas': combinaciones_efectivas,
-                'combinaciones_no_efectivas': combinaciones_no_efectivas,
-                'porcentaje_efectividad': round((combinaciones_efectivas / total_combinaciones * 100) if total_combinaciones > 0 else 0, 1),
-                'tipos_tecnicas': {
-                    'tashi_waza': {
-                        'total': total_tecnicas_tashi,
-                        'efectivas': tecnicas_tashi_efectivas,
-                        'no_efectivas': tecnicas_tashi_no_efectivas
-                    },
-                    'ne_waza': {
-                        'total': total_tecnicas_ne,
-                        'efectivas': tecnicas_ne_efectivas,
-                        'no_efectivas': tecnicas_ne_no_efectivas
-                    },
-                    'combinaciones_directas': {
-                        'total': total_combinaciones_directas,
-                        'efectivas': combinaciones_directas_efectivas,
-                        'no_efectivas': combinaciones_directas_no_efectivas
-                    }
-                }
-            },
-            'detalles': detalles_combinaciones
+            'resumen': resumen_combinaciones(combinadas),
+            'detalles': detalles_combinaciones,
+            'paginacion': {
+                'total': self.paginator.page.paginator.count,
+                'siguiente': self.paginator.get_next_link(),
+                'anterior': self.paginator.get_previous_link()
+            }
         })
     
     @action(detail=False, methods=['get'])
     def generales(self, request):
-        """Endpoint para obtener estadísticas generales del sistema"""
+        """Endpoint para obtener estadísticas generales del sistema (en caché)"""
         try:
-            # Contar totales básicos
-            total_competidores = Competidor.objects.count()
-            total_competiciones = Competicion.objects.count()
-            total_combates = Combate.objects.filter(finalizado=True).count()
-            total_reportes = Reporte.objects.count()
-            
-            # Estadísticas de técnicas Tashi Waza
-            total_acciones_tashi = AccionTashiWaza.objects.count()
-            tecnicas_acertadas_tashi = AccionTashiWaza.objects.exclude(puntuacion='sin_puntuacion').count()
-            tecnicas_fallidas_tashi = AccionTashiWaza.objects.filter(puntuacion='sin_puntuacion').count()
-            
-            # Estadísticas de técnicas Ne Waza
-            total_acciones_ne = AccionNeWaza.objects.count()
-            tecnicas_acertadas_ne = AccionNeWaza.objects.filter(efectiva=True).count()
-            tecnicas_fallidas_ne = AccionNeWaza.objects.filter(efectiva=False).count()
-            
-            # Estadísticas de combinaciones
-            total_combinaciones = AccionCombinada.objects.count()
-            combinaciones_efectivas = AccionCombinada.objects.filter(efectiva=True).count()
-            combinaciones_fallidas = AccionCombinada.objects.filter(efectiva=False).count()
-            
-            # Técnicas en combinaciones
-            tecnicas_en_combinaciones_tashi = AccionTashiWaza.objects.filter(accion_combinada__isnull=False).count()
-            tecnicas_en_combinaciones_ne = AccionNeWaza.objects.filter(accion_combinada__isnull=False).count()
-            
-            # Técnicas acertadas y fallidas en combinaciones
-            tecnicas_acertadas_combinaciones = (
-                AccionTashiWaza.objects.filter(
-                    accion_combinada__isnull=False
-                ).exclude(puntuacion='sin_puntuacion').count() +
-                AccionNeWaza.objects.filter(
-                    accion_combinada__isnull=False,
-                    efectiva=True
-                ).count()
-            )
-            
-            tecnicas_fallidas_combinaciones = (
-                AccionTashiWaza.objects.filter(
-                    accion_combinada__isnull=False,
-                    puntuacion='sin_puntuacion'
-                ).count() +
-                AccionNeWaza.objects.filter(
-                    accion_combinada__isnull=False,
-                    efectiva=False
-                ).count()
-            )
-            
-            # Estadísticas por tipo de técnica Tashi Waza
-            ashi_waza_total = AccionTashiWaza.objects.filter(tipo='ashi_waza').count()
-            koshi_waza_total = AccionTashiWaza.objects.filter(tipo='koshi_waza').count()
-            te_waza_total = AccionTashiWaza.objects.filter(tipo='te_waza').count()
-            sutemi_waza_total = AccionTashiWaza.objects.filter(
-                Q(tipo='ma_sutemi_waza') | Q(tipo='yoko_sutemi_waza')
-            ).count()
-            
-            # Estadísticas por tipo de técnica Ne Waza
-            osaekomi_total = AccionNeWaza.objects.filter(tipo='osaekomi_waza').count()
-            shime_total = AccionNeWaza.objects.filter(tipo='shime_waza').count()
-            kansetsu_total = AccionNeWaza.objects.filter(tipo='kansetsu_waza').count()
-            
-            # Puntuaciones - INCLUIR ACCIONES COMBINADAS
-            total_ippon = AccionTashiWaza.objects.filter(puntuacion='ippon').count() + AccionCombinada.objects.filter(puntuacion='ippon').count()
-            total_waza_ari = AccionTashiWaza.objects.filter(puntuacion='waza_ari').count() + AccionCombinada.objects.filter(puntuacion='waza_ari').count()
-            
-            # Amonestaciones
-            total_shido = Amonestacion.objects.filter(tipo='shido').count()
-            total_hansokumake = Amonestacion.objects.filter(tipo='hansokumake').count()
-            
-            data = {
-                # Estadísticas básicas
-                'competidores': total_competidores,
-                'competiciones': total_competiciones,
-                'combates': total_combates,
-                'reportes': total_reportes,
-                
-                # Estadísticas de técnicas Tashi Waza
-                'total_acciones_tashi': total_acciones_tashi,
-                'tecnicas_acertadas_tashi': tecnicas_acertadas_tashi,
-                'tecnicas_fallidas_tashi': tecnicas_fallidas_tashi,
-                
-                # Estadísticas de técnicas Ne Waza
-                'total_acciones_ne': total_acciones_ne,
-                'tecnicas_acertadas_ne': tecnicas_acertadas_ne,
-                'tecnicas_fallidas_ne': tecnicas_fallidas_ne,
-                
-                # Estadísticas de combinaciones
-                'total_combinaciones': total_combinaciones,
-                'combinaciones_efectivas': combinaciones_efectivas,
-                'combinaciones_fallidas': combinaciones_fallidas,
-                'tecnicas_en_combinaciones_tashi': tecnicas_en_combinaciones_tashi,
-                'tecnicas_en_combinaciones_ne': tecnicas_en_combinaciones_ne,
-                'tecnicas_acertadas_combinaciones': tecnicas_acertadas_combinaciones,
-                'tecnicas_fallidas_combinaciones': tecnicas_fallidas_combinaciones,
-                
-                # Estadísticas por tipo de técnica Tashi Waza
-                'ashi_waza_total': ashi_waza_total,
-                'koshi_waza_total': koshi_waza_total,
-                'te_waza_total': te_waza_total,
-                'sutemi_waza_total': sutemi_waza_total,
-                
-                # Estadísticas por tipo de técnica Ne Waza
-                'osaekomi_total': osaekomi_total,
-                'shime_total': shime_total,
-                'kansetsu_total': kansetsu_total,
-                
-                # Puntuaciones
-                'total_ippon': total_ippon,
-                'total_waza_ari': total_waza_ari,
-                
-                # Amonestaciones
-                'total_shido': total_shido,
-                'total_hansokumake': total_hansokumake,
-                
-                # Totales generales
-                'total_tecnicas_acertadas': tecnicas_acertadas_tashi + tecnicas_acertadas_ne,
-                'total_tecnicas_fallidas': tecnicas_fallidas_tashi + tecnicas_fallidas_ne,
-                'total_acciones': total_acciones_tashi + total_acciones_ne
-            }
-            
-            return Response(data)
+            return Response(estadisticas_generales())
         except Exception as e:
             return Response({
                 'error': 'Error al obtener estadísticas generales',
@@ -489,134 +306,103 @@ class EstadisticaCompetidorViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@respuesta_cacheada('estadisticas_competidor', lambda competidor_id: [('estadisticas_competidor', competidor_id)])
 def estadisticas_detalladas_competidor(request, competidor_id):
+    """
+    Estadísticas de un competidor en sus combates; `fecha_inicio` y `fecha_fin`
+    (AAAA-MM-DD) acotan el período. Los combates finalizados se suman de los resúmenes
+    diarios y de técnicas, y los que siguen abiertos (pocos) se cuentan al momento.
+    """
+    fechas = {}
+    for parametro in ('fecha_inicio', 'fecha_fin'):
+        valor = request.query_params.get(parametro)
+        try:
+            fechas[parametro] = parse_date(valor) if valor else None
+        except ValueError:
+            fechas[parametro] = None
+        if valor and fechas[parametro] is None:
+            return Response(
+                {'error': f'{parametro} debe ser una fecha válida con el formato AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    fecha_inicio = fechas['fecha_inicio'] or date.min
+    fecha_fin = fechas['fecha_fin'] or date.max
+    
     try:
         competidor = Competidor.objects.get(id=competidor_id)
         
-        # Obtener todas las estadísticas del competidor
         combates = Combate.objects.filter(
-            Q(competidor1=competidor) | Q(competidor2=competidor)
+            Q(competidor1=competidor) | Q(competidor2=competidor),
+            fecha_hora__date__gte=fecha_inicio,
+            fecha_hora__date__lte=fecha_fin
         )
-        
-        # Acciones Tashi Waza para calcular estadísticas
-        acciones_tashi = AccionTashiWaza.objects.filter(
-            competidor=competidor,
-            combate__in=combates
+        en_curso = combates.filter(finalizado=False)
+        finalizados = ResumenDiarioCompetidor.sumar([competidor.id], fecha_inicio, fecha_fin)[competidor.id]
+        abiertos = calcular_contadores(en_curso, [competidor.id])[competidor.id]
+        contadores = {campo: finalizados[campo] + abiertos[campo] for campo in CAMPOS_CONTADORES}
+        
+        # Técnicas fallidas, sueltas y dentro de las combinaciones del competidor
+        tecnicas_fallidas = (
+            AccionTashiWaza.objects.filter(competidor=competidor, combate__in=combates, efectiva=False).count()
+            + AccionNeWaza.objects.filter(competidor=competidor, combate__in=combates, efectiva=False).count()
         )
-        
-        # Acciones Ne Waza
-        acciones_ne = AccionNeWaza.objects.filter(
-            competidor=competidor,
-            combate__in=combates
+        tecnicas_fallidas_combinadas = sum(
+            modelo.objects.filter(
+                accion_combinada__competidor=competidor,
+                accion_combinada__combate__in=combates,
+                efectiva=False
+            ).count()
+            for modelo in (AccionTashiWaza, AccionNeWaza)
         )
         
-        # Calcular técnicas en combinaciones
-        # CORREGIDO: Contar las AccionCombinada directamente según su efectividad
-        tecnicas_positivas_combinadas = 0
-        tecnicas_negativas_combinadas = 0
-        
-        for accion_combinada in AccionCombinada.objects.filter(competidor=competidor, combate__in=combates):
-            # Contar técnicas Tashi Waza en esta combinación (si existen)
-            tashi_en_combinacion = AccionTashiWaza.objects.filter(accion_combinada=accion_combinada)
-            tecnicas_positivas_combinadas += tashi_en_combinacion.exclude(puntuacion='sin_puntuacion').count()
-            tecnicas_negativas_combinadas += tashi_en_combinacion.filter(puntuacion='sin_puntuacion').count()
-            
-            # Contar técnicas Ne Waza en esta combinación (si existen)
-            ne_en_combinacion = AccionNeWaza.objects.filter(accion_combinada=accion_combinada)
-            tecnicas_positivas_combinadas += ne_en_combinacion.filter(efectiva=True).count()
-            tecnicas_negativas_combinadas += ne_en_combinacion.filter(efectiva=False).count()
-            
-            # NUEVO: Si no hay técnicas individuales relacionadas, contar la AccionCombinada directamente
-            if tashi_en_combinacion.count() == 0 and ne_en_combinacion.count() == 0:
-                if accion_combinada.efectiva or accion_combinada.puntuacion != 'sin_puntuacion':
-                    tecnicas_positivas_combinadas += 1
-                else:
-                    tecnicas_negativas_combinadas += 1
-        
-        # Acciones Tashi Waza - CAMPOS CORREGIDOS
-        total_ataques_tashi = acciones_tashi.count()
-        ataques_positivos = acciones_tashi.exclude(puntuacion='sin_puntuacion').count() + tecnicas_positivas_combinadas
-        ataques_negativos = acciones_tashi.filter(puntuacion='sin_puntuacion').count() + tecnicas_negativas_combinadas
-        
-        wazari = acciones_tashi.filter(puntuacion='waza_ari').count()
-        ippon = acciones_tashi.filter(puntuacion='ippon').count()
-        
-        ashi_waza = acciones_tashi.filter(tipo='ashi_waza').count()
-        koshi_waza = acciones_tashi.filter(tipo='koshi_waza').count()
-        kata_te_waza = acciones_tashi.filter(tipo='te_waza').count()
-        sutemi_waza = acciones_tashi.filter(Q(tipo='ma_sutemi_waza') | Q(tipo='yoko_sutemi_waza')).count()
-        
-        combinaciones_tashi = acciones_tashi.filter(accion_combinada__isnull=False).count()
-        
-        # Acciones Ne Waza
-        total_acciones_ne = acciones_ne.count()
-        inmovilizaciones = acciones_ne.filter(tipo='osaekomi_waza').count()
-        luxaciones = acciones_ne.filter(tipo='kansetsu_waza').count()
-        estrangulaciones = acciones_ne.filter(tipo='shime_waza').count()
-        combinaciones_ne = acciones_ne.filter(accion_combinada__isnull=False).count()
-        
-        # Amonestaciones
-        amonestaciones = Amonestacion.objects.filter(
-            competidor=competidor,
-            combate__in=combates
+        # Estadísticas por técnica: del resumen de técnicas, más las acciones de los combates abiertos
+        filas = ResumenTecnicaCompetidor.por_tecnica(
+            ResumenTecnicaCompetidor.objects.filter(
+                competidor=competidor, modalidad='tashi_waza',
+                combate__fecha_hora__date__gte=fecha_inicio,
+                combate__fecha_hora__date__lte=fecha_fin
+            )
+        )
+        filas_en_curso = AccionTashiWaza.objects.filter(
+            competidor=competidor, combate__in=en_curso
+        ).values('tecnica').order_by().annotate(
+            usos=Count('id'),
+            efectivas=Count('id', filter=Q(efectiva=True)),
+            puntos=Sum(Case(
+                *(When(puntuacion=puntuacion, then=valor)
+                  for puntuacion, valor in ResumenTecnicaCompetidor.PUNTOS.items()),
+                default=0
+            ))
         )
-        
-        shido = amonestaciones.filter(tipo='shido').count()
-        hansokumake = amonestaciones.filter(tipo='hansokumake').count()
-        
-        # Técnicas fallidas
-        tecnicas_fallidas_tashi = acciones_tashi.filter(efectiva=False).count()
-        tecnicas_fallidas_ne = acciones_ne.filter(efectiva=False).count()
-        tecnicas_fallidas_combinadas = 0
-        
-        # Contar técnicas fallidas en combinaciones
-        for accion_combinada in AccionCombinada.objects.filter(competidor=competidor, combate__in=combates):
-            tashi_en_combinacion = AccionTashiWaza.objects.filter(accion_combinada=accion_combinada)
-            tecnicas_fallidas_combinadas += tashi_en_combinacion.filter(efectiva=False).count()
-            
-            ne_en_combinacion = AccionNeWaza.objects.filter(accion_combinada=accion_combinada)
-            tecnicas_fallidas_combinadas += ne_en_combinacion.filter(efectiva=False).count()
-        
-        # Calcular estadísticas detalladas por técnica
         tecnicas_stats = {}
-        for accion in acciones_tashi:
-            if hasattr(accion, 'tecnica') and accion.tecnica:
-                tecnica_nombre = str(accion.tecnica)
-                if tecnica_nombre not in tecnicas_stats:
-                    tecnicas_stats[tecnica_nombre] = {
-                        'total': 0,
-                        'efectivas': 0,
-                        'puntos': 0
-                    }
-                tecnicas_stats[tecnica_nombre]['total'] += 1
-                if hasattr(accion, 'efectiva') and accion.efectiva:
-                    tecnicas_stats[tecnica_nombre]['efectivas'] += 1
-                if hasattr(accion, 'puntuacion') and accion.puntuacion in ['ippon', 'waza_ari']:
-                    puntos_map = {'ippon': 10, 'waza_ari': 7}
-                    tecnicas_stats[tecnica_nombre]['puntos'] += puntos_map.get(accion.puntuacion, 0)
+        for fila in [*filas, *filas_en_curso]:
+            tecnica = tecnicas_stats.setdefault(fila['tecnica'], {'total': 0, 'efectivas': 0, 'puntos': 0})
+            tecnica['total'] += fila['usos']
+            tecnica['efectivas'] += fila['efectivas']
+            tecnica['puntos'] += fila['puntos']
         
         data = {
             'competidor': CompetidorSerializer(competidor).data,
             'tecnicas_por_categoria': tecnicas_stats,
-            'total_combates': combates.count(),
-            'combates_ganados': combates.filter(ganador=competidor).count(),
-            'total_acciones_tashi_waza': total_ataques_tashi,
-            'ataques_positivos': ataques_positivos,
-            'ataques_negativos': ataques_negativos,
-            'wazari': wazari,
-            'ippon': ippon,
-            'ashi_waza': ashi_waza,
-            'koshi_waza': koshi_waza,
-            'kata_te_waza': kata_te_waza,
-            'sutemi_waza': sutemi_waza,
-            'combinaciones': combinaciones_tashi + combinaciones_ne,
-            'total_acciones_ne_waza': total_acciones_ne,
-            'inmovilizaciones': inmovilizaciones,
-            'luxaciones': luxaciones,
-            'estrangulaciones': estrangulaciones,
-            'shido': shido,
-            'hansokumake': hansokumake,
-            'tecnicas_fallidas': tecnicas_fallidas_tashi + tecnicas_fallidas_ne,
+            'total_combates': contadores['total_combates'],
+            'combates_ganados': contadores['combates_ganados'],
+            'total_acciones_tashi_waza': contadores['total_ataques_tashi_waza'],
+            'ataques_positivos': contadores['ataques_positivos'],
+            'ataques_negativos': contadores['ataques_negativos'],
+            'wazari': contadores['wazari'],
+            'ippon': contadores['ippon'],
+            'ashi_waza': contadores['ashi_waza'],
+            'koshi_waza': contadores['koshi_waza'],
+            'kata_te_waza': contadores['kata_te_waza'],
+            'sutemi_waza': contadores['sutemi_waza'],
+            'combinaciones': contadores['combinaciones'],
+            'total_acciones_ne_waza': contadores['total_acciones_ne_waza'],
+            'inmovilizaciones': contadores['inmovilizaciones'],
+            'luxaciones': contadores['luxaciones'],
+            'estrangulaciones': contadores['estrangulaciones'],
+            'shido': contadores['shido'],
+            'hansokumake': contadores['hansokumake'],
+            'tecnicas_fallidas': tecnicas_fallidas,
             'tecnicas_fallidas_combinadas': tecnicas_fallidas_combinadas
         }
         
@@ -629,79 +415,53 @@ def estadisticas_detalladas_competidor(request, competidor_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-# Agregar a ReporteViewSet
-@action(detail=True, methods=['get'])
-def exportar_pdf(self, request, pk=None):
-    """Exportar reporte a PDF"""
+def _filas_tecnicas(filas):
+    """Añade a cada fila agrupada por técnica sus tasas de efectividad y de puntuación"""
+    return [
+        {
+            **fila,
+            'tasa_efectividad': round(fila['efectivas'] * 100 / fila['usos'], 1),
+            'tasa_puntuacion': round(fila['puntuadas'] * 100 / fila['usos'], 1),
+        }
+        for fila in filas
+    ]
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def tecnicas_frecuentes(request):
+    """
+    Técnicas más usadas en toda la liga, a partir del resumen de técnicas.
+    Filtros opcionales: division_peso, genero, categoria, modalidad y limite (20 por defecto).
+    """
+    resumenes = ResumenTecnicaCompetidor.objects.all()
+    for parametro in ('division_peso', 'genero', 'categoria'):
+        valor = request.query_params.get(parametro)
+        if valor:
+            resumenes = resumenes.filter(**{f'competidor__{parametro}': valor})
+    modalidad = request.query_params.get('modalidad')
+    if modalidad:
+        resumenes = resumenes.filter(modalidad=modalidad)
+    
     try:
-        reporte = self.get_object()
-        estadisticas = reporte.estadisticas.all()
-        
-        # Crear buffer para el PDF
-        buffer = io.BytesIO()
-        
-        # Crear documento PDF
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1  # Centrado
-        )
-        
-        # Título
-        story.append(Paragraph(f"Reporte: {reporte.titulo}", title_style))
-        story.append(Paragraph(f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Tabla de estadísticas
-        if estadisticas.exists():
-            data = [['Competidor', 'Combates', 'Victorias', 'Ippon', 'Waza-ari', 'Efectividad']]
-            
-            for est in estadisticas:
-                efectividad = 0
-                if est.total_ataques_tashi_waza > 0:
-                    efectividad = (est.ataques_positivos / est.total_ataques_tashi_waza) * 100
-                
-                data.append([
-                    est.competidor_detalle.nombre if est.competidor_detalle else 'N/A',
-                    str(est.total_combates or 0),
-                    str(est.combates_ganados or 0),
-                    str(est.ippon or 0),
-                    str(est.waza_ari or 0),
-                    f"{efectividad:.1f}%"
-                ])
-            
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 14),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(table)
-        else:
-            story.append(Paragraph("No hay estadísticas disponibles para este reporte.", styles['Normal']))
-        
-        # Construir PDF
-        doc.build(story)
-        
-        # Preparar respuesta
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{reporte.titulo}.pdf"'
-        
-        return response
-        
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        limite = max(1, min(int(request.query_params.get('limite', 20)), 200))
+    except ValueError:
+        return Response({'error': 'limite debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    filas = ResumenTecnicaCompetidor.por_tecnica(resumenes).annotate(
+        competidores=Count('competidor', distinct=True)
+    )[:limite]
+    return Response(_filas_tecnicas(filas))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def tecnicas_competidor(request, competidor_id):
+    """Efectividad de cada técnica de un competidor, a partir del resumen de técnicas"""
+    if not Competidor.objects.filter(id=competidor_id).exists():
+        return Response({'error': 'Competidor no encontrado'}, status=404)
+    
+    resumenes = ResumenTecnicaCompetidor.objects.filter(competidor_id=competidor_id)
+    modalidad = request.query_params.get('modalidad')
+    if modalidad:
+        resumenes = resumenes.filter(modalidad=modalidad)
+    
+    return Response(_filas_tecnicas(ResumenTecnicaCompetidor.por_tecnica(resumenes)))
@@ -3,6 +3,11 @@ ASGI config for judo_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live scoreboard streams (``/api/combates/<id>/en_vivo/`` and
+``/api/competiciones/<id>/en_vivo/``) are async views that only stream
+under ASGI. Their event broker is in-process, so run a single worker, e.g.
+``uvicorn judo_backend.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'competiciones',
     'combates',
     'estadisticas',
+    'mantenimiento',
 ]
 
 MIDDLEWARE = [
@@ -129,6 +130,67 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Marcadores en vivo (Server-Sent Events). El difusor vive en memoria del proceso:
+# servir con un único proceso ASGI, p. ej. `uvicorn judo_backend.asgi:application`
+SSE_LATIDO_SEGUNDOS = 15
+SSE_RECONEXION_MS = 3000
+# Vigencia de los tokens de un solo uso para abrir un flujo (POST /api/en_vivo/token/)
+SSE_TOKEN_SEGUNDOS = 60
+# Eventos pendientes por conexión; si un cliente lento la llena, se le cierra el flujo
+SSE_CAPACIDAD_COLA = 256
+
+# Respuestas guardadas por Idempotency-Key en las escrituras de combates.
+# Las vencidas se eliminan con `python manage.py purgar_claves_idempotencia`
+IDEMPOTENCIA_TTL_HORAS = 24
+
+# Generación de reportes en segundo plano (hilos del propio proceso, sin broker)
+REPORTES_TRABAJADORES = 2
+REPORTES_TAMANO_LOTE = 50
+REPORTES_TAREA_CADUCIDAD_MINUTOS = 30
+# Ejecutar las tareas en el propio hilo al confirmar la transacción (útil en pruebas)
+REPORTES_EJECUCION_SINCRONA = False
+# Procesos para renderizar lotes de PDF (estadisticas.pdf.generar_lote); None usa todos los núcleos
+REPORTES_PDF_PROCESOS = None
+
+# Caché. La memoria local es por proceso: con varios procesos de servidor usar un
+# backend compartido, p. ej. archivos
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': os.path.join(BASE_DIR, 'cache'),
+# o Redis
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#   'LOCATION': 'redis://127.0.0.1:6379',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'judo-control',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Vigencia máxima de las respuestas cacheadas (api.cache); las escrituras las invalidan antes
+CACHE_RESPUESTAS_SEGUNDOS = 60 * 60
+
+# Vigencia máxima de los totales del panel; las escrituras los invalidan antes
+ESTADISTICAS_GENERALES_CACHE_SEGUNDOS = 60 * 60
+
+# Filas leídas de la base de datos por lote al exportar acciones (combates.exportacion)
+EXPORTACION_TAMANO_LOTE = 2000
+
+# Competidores insertados por bulk_create al importar (competidores.importacion)
+IMPORTACION_TAMANO_LOTE = 500
+# Días que se conservan los CSV de filas rechazadas en MEDIA_ROOT/importaciones
+IMPORTACION_ERRORES_DIAS = 7
+
+# Trabajos periódicos (mantenimiento.trabajos). Se ejecutan en un proceso aparte:
+#   python manage.py planificador            (o `--una-vez` desde cron)
+MANTENIMIENTO_INTERVALO_SEGUNDOS = 60
+# Vencimiento del candado que impide ejecutar dos planificadores a la vez; mientras
+# corre un trabajo se renueva cada tercio de este tiempo
+MANTENIMIENTO_CANDADO_SEGUNDOS = 10 * 60
+MANTENIMIENTO_HISTORIAL_DIAS = 30
+# Días hacia atrás de los resúmenes diarios y de técnicas que se reconstruyen cada noche
+MANTENIMIENTO_DIAS_RESUMENES = 7
+
 # Configuración de CORS - Más segura
 CORS_ALLOW_ALL_ORIGINS = False  # Cambiado a False para mayor seguridad
 CORS_ALLOWED_ORIGINS = [
@@ -147,6 +209,8 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'last-event-id',
+    'idempotency-key',
 ]
 
 # Configuración de autenticación personalizada
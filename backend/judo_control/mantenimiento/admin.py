@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import EjecucionTrabajo, Candado
+
+class EjecucionTrabajoAdmin(admin.ModelAdmin):
+    list_display = ('trabajo', 'estado', 'resultado', 'inicio', 'fin')
+    list_filter = ('trabajo', 'estado')
+
+admin.site.register(EjecucionTrabajo, EjecucionTrabajoAdmin)
+
+class CandadoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'propietario', 'expira')
+
+admin.site.register(Candado, CandadoAdmin)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class MantenimientoConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'mantenimiento'
+    verbose_name = 'Mantenimiento'
+    
+    def ready(self):
+        from . import trabajos  # noqa: F401
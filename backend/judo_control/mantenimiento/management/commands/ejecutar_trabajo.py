@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from mantenimiento.planificador import TRABAJOS, ejecutar_trabajo
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta ahora un trabajo de mantenimiento, o lista los registrados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('trabajo', nargs='?', help='Nombre del trabajo')
+
+    def handle(self, *args, **options):
+        if not options['trabajo']:
+            for trabajo in TRABAJOS.values():
+                self.stdout.write(f'{trabajo.nombre} (cada {trabajo.intervalo}): {trabajo.descripcion}')
+            return
+
+        trabajo = TRABAJOS.get(options['trabajo'])
+        if trabajo is None:
+            raise CommandError(f'Trabajo desconocido: {options["trabajo"]}')
+        ejecucion = ejecutar_trabajo(trabajo)
+        if ejecucion.estado != 'exito':
+            raise CommandError(ejecucion.error)
+        self.stdout.write(self.style.SUCCESS(f'{trabajo.nombre}: {ejecucion.resultado}'))
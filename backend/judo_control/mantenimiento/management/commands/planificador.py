@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from mantenimiento.models import Candado
+from mantenimiento.planificador import CANDADO, ejecutar_pendientes, identificador_instancia
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los trabajos periódicos de mantenimiento (un único proceso por despliegue)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Ejecutar los trabajos pendientes y terminar (p. ej. desde cron)')
+        parser.add_argument('--intervalo', type=int, default=settings.MANTENIMIENTO_INTERVALO_SEGUNDOS,
+                            help='Segundos entre revisiones de los trabajos pendientes')
+
+    def handle(self, *args, **options):
+        propietario = identificador_instancia()
+        try:
+            while True:
+                self.revisar(propietario)
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                # Un proceso de larga duración no debe conservar conexiones caídas
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            Candado.liberar(CANDADO, propietario)
+
+    def revisar(self, propietario):
+        ejecuciones = ejecutar_pendientes(propietario)
+        if ejecuciones is None:
+            self.stdout.write(self.style.WARNING('Otra instancia del planificador tiene el candado'))
+            return
+        for ejecucion in ejecuciones:
+            estilo = self.style.SUCCESS if ejecucion.estado == 'exito' else self.style.ERROR
+            self.stdout.write(estilo(
+                f'{ejecucion.trabajo}: {ejecucion.get_estado_display()} {ejecucion.resultado}'.rstrip()
+            ))
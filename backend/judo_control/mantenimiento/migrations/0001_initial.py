@@ -0,0 +1,45 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candado',
+            fields=[
+                ('nombre', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Nombre')),
+                ('propietario', models.CharField(max_length=255, verbose_name='Propietario')),
+                ('expira', models.DateTimeField(verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Candado',
+                'verbose_name_plural': 'Candados',
+            },
+        ),
+        migrations.CreateModel(
+            name='EjecucionTrabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trabajo', models.CharField(max_length=100, verbose_name='Trabajo')),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('exito', 'Éxito'), ('error', 'Error')], default='en_curso', max_length=20, verbose_name='Estado')),
+                ('resultado', models.CharField(blank=True, default='', max_length=255, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('inicio', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Inicio')),
+                ('fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+            ],
+            options={
+                'verbose_name': 'Ejecución de trabajo',
+                'verbose_name_plural': 'Ejecuciones de trabajos',
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['trabajo', '-inicio'], name='ejecucion_trabajo_inicio')],
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+
+class EjecucionTrabajo(models.Model):
+    """Registro de cada ejecución de un trabajo periódico del planificador"""
+    ESTADO_CHOICES = [
+        ('en_curso', 'En curso'),
+        ('exito', 'Éxito'),
+        ('error', 'Error'),
+    ]
+    
+    trabajo = models.CharField('Trabajo', max_length=100)
+    estado = models.CharField('Estado', max_length=20, choices=ESTADO_CHOICES, default='en_curso')
+    resultado = models.CharField('Resultado', max_length=255, blank=True, default='')
+    error = models.TextField('Error', blank=True, default='')
+    inicio = models.DateTimeField('Inicio', default=timezone.now)
+    fin = models.DateTimeField('Fin', null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.trabajo} - {self.get_estado_display()}"
+    
+    @property
+    def duracion(self):
+        return self.fin - self.inicio if self.fin else None
+    
+    def terminar(self, estado, resultado='', error=''):
+        self.estado = estado
+        self.resultado = str(resultado if resultado is not None else '')[:255]
+        self.error = error
+        self.fin = timezone.now()
+        self.save(update_fields=['estado', 'resultado', 'error', 'fin'])
+    
+    @classmethod
+    def ultimas_ejecuciones(cls):
+        """{trabajo: inicio de su última ejecución}, en una sola consulta"""
+        return dict(
+            cls.objects.values('trabajo').order_by().annotate(ultima=models.Max('inicio'))
+            .values_list('trabajo', 'ultima')
+        )
+    
+    @classmethod
+    def purgar_antiguas(cls, dias):
+        """Elimina el historial anterior a `dias` días y devuelve cuántas ejecuciones se borraron"""
+        eliminadas, _ = cls.objects.filter(
+            inicio__lt=timezone.now() - timedelta(days=dias)
+        ).exclude(estado='en_curso').delete()
+        return eliminadas
+    
+    class Meta:
+        verbose_name = 'Ejecución de trabajo'
+        verbose_name_plural = 'Ejecuciones de trabajos'
+        ordering = ['-inicio']
+        indexes = [
+            models.Index(fields=['trabajo', '-inicio'], name='ejecucion_trabajo_inicio'),
+        ]
+
+
+class Candado(models.Model):
+    """
+    Candado con vencimiento guardado en la base de datos, para que solo una instancia del
+    planificador ejecute trabajos aunque se arranquen varias. Si el proceso que lo tiene
+    muere, el candado queda libre al vencer.
+    """
+    nombre = models.CharField('Nombre', max_length=100, primary_key=True)
+    propietario = models.CharField('Propietario', max_length=255)
+    expira = models.DateTimeField('Expira')
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.propietario})"
+    
+    @classmethod
+    def adquirir(cls, nombre, propietario, duracion):
+        """Toma o renueva el candado y devuelve si se consiguió"""
+        ahora = timezone.now()
+        # Un único UPDATE condicional: solo lo consigue quien ya lo tiene o si está vencido
+        tomado = cls.objects.filter(nombre=nombre).filter(
+            models.Q(propietario=propietario) | models.Q(expira__lte=ahora)
+        ).update(propietario=propietario, expira=ahora + duracion)
+        if tomado:
+            return True
+        try:
+            with transaction.atomic():
+                cls.objects.create(nombre=nombre, propietario=propietario, expira=ahora + duracion)
+        except IntegrityError:
+            # Existe y lo tiene otra instancia
+            return False
+        return True
+    
+    @classmethod
+    def liberar(cls, nombre, propietario):
+        cls.objects.filter(nombre=nombre, propietario=propietario).delete()
+    
+    class Meta:
+        verbose_name = 'Candado'
+        verbose_name_plural = 'Candados'
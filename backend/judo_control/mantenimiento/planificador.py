@@ -0,0 +1,118 @@
+"""
+Planificador de trabajos periódicos de mantenimiento.
+
+Los trabajos se registran con el decorador `periodico` (ver mantenimiento/trabajos.py) y
+los ejecuta el comando `planificador`, que el despliegue arranca como un proceso aparte.
+Cada ejecución queda en EjecucionTrabajo, y un Candado en la base de datos impide que dos
+instancias del planificador trabajen a la vez.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import Candado, EjecucionTrabajo
+
+logger = logging.getLogger(__name__)
+
+CANDADO = 'planificador'
+
+# Trabajos registrados por nombre, en orden de registro
+TRABAJOS = {}
+
+
+class Trabajo:
+    def __init__(self, nombre, funcion, intervalo):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.descripcion = (funcion.__doc__ or '').strip()
+
+    def pendiente(self, ultima, ahora):
+        return ultima is None or ultima + self.intervalo <= ahora
+
+
+def periodico(intervalo, nombre=None):
+    """Registra una función sin argumentos como trabajo que se ejecuta cada `intervalo`"""
+    def decorador(funcion):
+        trabajo = Trabajo(nombre or funcion.__name__, funcion, intervalo)
+        TRABAJOS[trabajo.nombre] = trabajo
+        return funcion
+    return decorador
+
+
+def identificador_instancia():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def trabajos_pendientes(ahora=None):
+    """Trabajos cuyo intervalo ya pasó desde su última ejecución"""
+    ahora = ahora or timezone.now()
+    ultimas = EjecucionTrabajo.ultimas_ejecuciones()
+    return [
+        trabajo for trabajo in TRABAJOS.values()
+        if trabajo.pendiente(ultimas.get(trabajo.nombre), ahora)
+    ]
+
+
+def ejecutar_trabajo(trabajo):
+    """Ejecuta un trabajo registrando su resultado; un error no detiene al planificador"""
+    ejecucion = EjecucionTrabajo.objects.create(trabajo=trabajo.nombre)
+    try:
+        resultado = trabajo.funcion()
+    except Exception:
+        logger.exception('Error en el trabajo de mantenimiento %s', trabajo.nombre)
+        ejecucion.terminar('error', error=traceback.format_exc())
+    else:
+        ejecucion.terminar('exito', resultado)
+    return ejecucion
+
+
+@contextmanager
+def candado_renovado(propietario, duracion):
+    """
+    Renueva el candado desde otro hilo cada tercio de `duracion` mientras dura el bloque,
+    para que un trabajo más largo que el candado no deje entrar a otra instancia.
+    """
+    detener = threading.Event()
+
+    def renovar():
+        try:
+            while not detener.wait(duracion.total_seconds() / 3):
+                if not Candado.adquirir(CANDADO, propietario, duracion):
+                    logger.warning('La instancia %s perdió el candado del planificador', propietario)
+        finally:
+            # El hilo abre su propia conexión
+            connections.close_all()
+
+    hilo = threading.Thread(target=renovar, name='planificador-candado', daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def ejecutar_pendientes(propietario=None):
+    """
+    Ejecuta los trabajos pendientes si esta instancia tiene el candado del planificador.
+    Devuelve las ejecuciones realizadas, o None si otra instancia tiene el candado.
+    """
+    propietario = propietario or identificador_instancia()
+    duracion = timedelta(seconds=settings.MANTENIMIENTO_CANDADO_SEGUNDOS)
+    if not Candado.adquirir(CANDADO, propietario, duracion):
+        return None
+
+    ejecuciones = []
+    with candado_renovado(propietario, duracion):
+        for trabajo in trabajos_pendientes():
+            ejecuciones.append(ejecutar_trabajo(trabajo))
+    return ejecuciones
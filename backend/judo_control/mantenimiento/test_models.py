@@ -0,0 +1,115 @@
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from competiciones.models import Competicion
+from mantenimiento import planificador
+from mantenimiento.models import Candado, EjecucionTrabajo
+from mantenimiento.planificador import Trabajo, ejecutar_pendientes, ejecutar_trabajo, trabajos_pendientes
+from mantenimiento.trabajos import cerrar_competiciones
+
+Usuario = get_user_model()
+
+
+class CandadoTest(TestCase):
+    """Pruebas del candado que garantiza una única instancia del planificador"""
+
+    def test_solo_un_propietario(self):
+        """Prueba que otra instancia no toma el candado hasta que se libera"""
+        duracion = timedelta(minutes=5)
+        self.assertTrue(Candado.adquirir('planificador', 'a', duracion))
+        self.assertTrue(Candado.adquirir('planificador', 'a', duracion))
+        self.assertFalse(Candado.adquirir('planificador', 'b', duracion))
+
+        Candado.liberar('planificador', 'a')
+        self.assertTrue(Candado.adquirir('planificador', 'b', duracion))
+
+    def test_candado_vencido(self):
+        """Prueba que un candado vencido (proceso caído) lo puede tomar otra instancia"""
+        Candado.objects.create(nombre='planificador', propietario='a', expira=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(Candado.adquirir('planificador', 'b', timedelta(minutes=5)))
+        self.assertEqual(Candado.objects.get().propietario, 'b')
+
+
+class PlanificadorTest(TestCase):
+    """Pruebas del registro y la ejecución de los trabajos periódicos"""
+
+    def setUp(self):
+        self.llamadas = []
+        trabajos = {
+            'horario': Trabajo('horario', lambda: self.llamadas.append('horario') or 1, timedelta(hours=1)),
+            'fallido': Trabajo('fallido', lambda: 1 / 0, timedelta(hours=1)),
+        }
+        registro = mock.patch.dict(planificador.TRABAJOS, trabajos, clear=True)
+        registro.start()
+        self.addCleanup(registro.stop)
+
+    def test_trabajos_pendientes_segun_intervalo(self):
+        """Prueba que un trabajo no se repite hasta que pasa su intervalo"""
+        self.assertEqual(len(trabajos_pendientes()), 2)
+
+        EjecucionTrabajo.objects.create(trabajo='horario', inicio=timezone.now() - timedelta(minutes=30))
+        self.assertEqual([t.nombre for t in trabajos_pendientes()], ['fallido'])
+
+        ahora = timezone.now() + timedelta(minutes=31)
+        self.assertEqual(len(trabajos_pendientes(ahora)), 2)
+
+    def test_error_queda_registrado(self):
+        """Prueba que un trabajo que falla se registra con su error sin detener a los demás"""
+        with self.assertLogs('mantenimiento.planificador', 'ERROR'):
+            ejecuciones = ejecutar_pendientes('instancia')
+
+        self.assertEqual({e.trabajo: e.estado for e in ejecuciones}, {'horario': 'exito', 'fallido': 'error'})
+        self.assertIn('ZeroDivisionError', EjecucionTrabajo.objects.get(trabajo='fallido').error)
+        self.assertEqual(self.llamadas, ['horario'])
+        self.assertEqual(ejecutar_pendientes('instancia'), [])
+
+    def test_otra_instancia_no_ejecuta(self):
+        """Prueba que sin el candado no se ejecuta ningún trabajo"""
+        Candado.adquirir(planificador.CANDADO, 'otra', timedelta(minutes=5))
+
+        self.assertIsNone(ejecutar_pendientes('instancia'))
+        self.assertFalse(EjecucionTrabajo.objects.exists())
+
+
+class CandadoRenovadoTest(TransactionTestCase):
+    """Pruebas de la renovación del candado mientras se ejecuta un trabajo largo"""
+
+    @override_settings(MANTENIMIENTO_CANDADO_SEGUNDOS=1)
+    def test_trabajo_mas_largo_que_el_candado(self):
+        """Prueba que otra instancia no toma el candado aunque el trabajo dure más que él"""
+        intentos = []
+
+        def largo():
+            time.sleep(1.5)
+            intentos.append(Candado.adquirir(planificador.CANDADO, 'otra', timedelta(seconds=1)))
+
+        trabajos = {'largo': Trabajo('largo', largo, timedelta(hours=1))}
+        with mock.patch.dict(planificador.TRABAJOS, trabajos, clear=True):
+            ejecuciones = ejecutar_pendientes('instancia')
+
+        self.assertEqual([e.estado for e in ejecuciones], ['exito'])
+        self.assertEqual(intentos, [False])
+        self.assertEqual(Candado.objects.get().propietario, 'instancia')
+
+
+class TrabajosMantenimientoTest(TestCase):
+    """Pruebas de los trabajos de mantenimiento registrados"""
+
+    def test_cerrar_competiciones(self):
+        """Prueba que el trabajo cierra las competiciones vencidas y registra cuántas"""
+        usuario = Usuario.objects.create_user(email='planificador@example.com', nombre='Admin', rol='administrador')
+        competicion = Competicion.objects.create(
+            nombre='Vencida', fecha=date.today() - timedelta(days=3), fecha_fin=date.today() - timedelta(days=1),
+            evento='entrenamiento', tipo='nacional', cantidad_atletas=4, creado_por=usuario
+        )
+
+        ejecucion = ejecutar_trabajo(planificador.TRABAJOS['cerrar_competiciones'])
+        self.assertEqual((ejecucion.estado, ejecucion.resultado), ('exito', '1'))
+        competicion.refresh_from_db()
+        self.assertTrue(competicion.finalizada)
+        self.assertEqual(cerrar_competiciones(), 0)
@@ -0,0 +1,98 @@
+"""Trabajos periódicos registrados en el planificador de mantenimiento"""
+import os
+import re
+import time
+from datetime import timedelta
+from glob import glob
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from api.models import ClaveIdempotencia
+from competiciones.models import Competicion
+from competidores.importacion import DIRECTORIO_IMPORTACIONES
+from estadisticas import pdf
+from estadisticas.models import Reporte, ResumenDiarioCompetidor, ResumenTecnicaCompetidor, TareaLotePDF, TareaReporte
+from .models import EjecucionTrabajo
+from .planificador import periodico
+
+
+@periodico(timedelta(hours=1))
+def cerrar_competiciones():
+    """Marca como finalizadas las competiciones cuya fecha de fin ya pasó"""
+    return Competicion.cerrar_vencidas()
+
+
+@periodico(timedelta(hours=1))
+def purgar_claves_idempotencia():
+    """Elimina las claves de idempotencia vencidas"""
+    return ClaveIdempotencia.purgar_expiradas()
+
+
+@periodico(timedelta(minutes=15))
+def cerrar_tareas_interrumpidas():
+    """Marca con error las tareas de reporte y de lotes de PDF que dejaron de avanzar"""
+    interrumpidas = [
+        tarea
+        for modelo in (TareaReporte, TareaLotePDF)
+        for tarea in modelo.objects.filter(estado__in=modelo.ESTADOS_ACTIVOS)
+        if tarea.interrumpida
+    ]
+    for tarea in interrumpidas:
+        tarea.fallar('La tarea se interrumpió sin terminar')
+    return len(interrumpidas)
+
+
+@periodico(timedelta(days=1))
+def reconstruir_resumenes():
+    """Reconstruye los resúmenes diarios y de técnicas recientes, por si alguna señal se perdió"""
+    desde = timezone.now().date() - timedelta(days=settings.MANTENIMIENTO_DIAS_RESUMENES)
+    diarios = ResumenDiarioCompetidor.reconstruir(desde=desde)
+    tecnicas = ResumenTecnicaCompetidor.reconstruir(desde=desde)
+    return f'{diarios} diarios, {tecnicas} de técnicas'
+
+
+@periodico(timedelta(days=1))
+def purgar_pdf_huerfanos():
+    """Borra los PDF guardados de reportes que ya no existen"""
+    existentes = set(Reporte.objects.values_list('id', flat=True))
+    borrados = 0
+    for ruta in glob(os.path.join(settings.MEDIA_ROOT, pdf.DIRECTORIO_PDF, 'reporte_*.pdf')):
+        coincidencia = re.match(r'reporte_(\d+)_', os.path.basename(ruta))
+        if coincidencia and int(coincidencia.group(1)) not in existentes:
+            os.remove(ruta)
+            borrados += 1
+    return borrados
+
+
+@periodico(timedelta(days=1))
+def purgar_errores_importacion():
+    """Borra los CSV de filas rechazadas de importaciones antiguas"""
+    limite = time.time() - settings.IMPORTACION_ERRORES_DIAS * 24 * 60 * 60
+    borrados = 0
+    for ruta in glob(os.path.join(settings.MEDIA_ROOT, DIRECTORIO_IMPORTACIONES, 'errores_*.csv')):
+        if os.path.getmtime(ruta) < limite:
+            os.remove(ruta)
+            borrados += 1
+    return borrados
+
+
+@periodico(timedelta(days=1))
+def purgar_historial():
+    """Elimina el historial antiguo de ejecuciones del planificador"""
+    return EjecucionTrabajo.purgar_antiguas(settings.MANTENIMIENTO_HISTORIAL_DIAS)
+
+
+@periodico(timedelta(days=7))
+def optimizar_base_datos():
+    """Compacta y actualiza las estadísticas del planificador de consultas de la base de datos"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('VACUUM')
+            cursor.execute('PRAGMA optimize')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('VACUUM ANALYZE')
+        else:
+            return 'sin acción'
+    return connection.vendor
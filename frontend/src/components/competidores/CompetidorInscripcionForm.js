@@ -25,6 +25,7 @@ const CompetidorInscripcionForm = () => {
   const [competidores, setCompetidores] = useState([]);
   const [selectedCompetidores, setSelectedCompetidores] = useState([]);
   const [error, setError] = useState('');
+  const [resultadoLote, setResultadoLote] = useState(null);
 
   useEffect(() => {
     if (!id) {
@@ -74,6 +75,35 @@ const CompetidorInscripcionForm = () => {
     }
   };
 
+  // Inscripción masiva: CSV con la columna identificacion_personal (o una identificación por línea)
+  const handleImportarCSV = async (e) => {
+    const archivo = e.target.files[0];
+    e.target.value = '';
+    if (!archivo) return;
+
+    const datos = new FormData();
+    datos.append('archivo', archivo);
+    try {
+      setLoading(true);
+      const response = await api.post(`/competiciones/${id}/inscribir_lote/`, datos, {
+        headers: { 'Content-Type': 'multipart/form-data' }
+      });
+      setResultadoLote(response.data);
+      if (response.data.inscritos > 0) {
+        toast.success(`Se inscribieron ${response.data.inscritos} competidores`);
+      }
+      if (response.data.rechazados > 0) {
+        toast.error(`${response.data.rechazados} filas no se pudieron inscribir`);
+      }
+    } catch (err) {
+      const errorMessage = err.response?.data?.error || 'Error al importar el archivo';
+      setError(errorMessage);
+      toast.error(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleCompetidorToggle = (competidorId) => {
     setSelectedCompetidores(prev => {
       if (prev.includes(competidorId)) {
@@ -102,6 +132,24 @@ const CompetidorInscripcionForm = () => {
 
       {error && <Alert severity="error" sx={{ mb: 3 }}>{error}</Alert>}
 
+      <Box sx={{ mb: 3 }}>
+        <Button variant="outlined" component="label">
+          Importar CSV
+          <input type="file" accept=".csv,text/csv" hidden onChange={handleImportarCSV} />
+        </Button>
+      </Box>
+
+      {resultadoLote && (
+        <Alert severity={resultadoLote.rechazados > 0 ? 'warning' : 'success'} sx={{ mb: 3 }}>
+          Inscritos: {resultadoLote.inscritos}. Rechazados: {resultadoLote.rechazados}.
+          {resultadoLote.errores.map((fila) => (
+            <Typography key={fila.fila} variant="body2">
+              Fila {fila.fila} ({fila.identificacion || 'vacía'}): {fila.error}
+            </Typography>
+          ))}
+        </Alert>
+      )}
+
       <form onSubmit={handleSubmit}>
         <Grid container spacing={3}>
           {competidores.map((competidor) => (
@@ -15,7 +15,8 @@ import {
   Accordion,
   AccordionSummary,
   AccordionDetails,
-  LinearProgress
+  LinearProgress,
+  Button
 } from '@mui/material';
 import {
   ExpandMore,
@@ -31,6 +32,7 @@ const DetallesCombinaciones = ({ competidorId }) => {
   const [detalles, setDetalles] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
 
   useEffect(() => {
     const fetchDetallesCombinaciones = async () => {
@@ -54,6 +56,24 @@ const DetallesCombinaciones = ({ competidorId }) => {
     }
   }, [competidorId]);
 
+  // El detalle llega paginado: las páginas siguientes se añaden a la lista
+  const cargarMas = async () => {
+    try {
+      setCargandoMas(true);
+      const response = await api.get(detalles.paginacion.siguiente);
+      setDetalles(prev => ({
+        ...prev,
+        detalles: [...prev.detalles, ...response.data.detalles],
+        paginacion: response.data.paginacion
+      }));
+    } catch (err) {
+      console.error('Error al cargar más combinaciones:', err);
+      setError('Error al cargar los detalles de las combinaciones');
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
   const formatearTecnica = (tecnica) => {
     return tecnica.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase());
   };
@@ -409,6 +429,16 @@ const DetallesCombinaciones = ({ competidorId }) => {
               </AccordionDetails>
             </Accordion>
           ))}
+
+          {detalles.paginacion?.siguiente && (
+            <Box display="flex" justifyContent="center" mt={2}>
+              <Button variant="outlined" onClick={cargarMas} disabled={cargandoMas}>
+                {cargandoMas
+                  ? 'Cargando...'
+                  : `Cargar más (${listaCombinaciones.length} de ${detalles.paginacion.total})`}
+              </Button>
+            </Box>
+          )}
         </CardContent>
       </Card>
     </Box>
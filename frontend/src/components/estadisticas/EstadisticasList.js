@@ -214,8 +214,27 @@ const EstadisticasList = () => {
     }
   };
 
+  const descargarReportePDF = async (reporteId) => {
+    // El servidor genera el PDF y lo reutiliza mientras no cambien las estadísticas
+    const response = await api.get(`reportes/${reporteId}/exportar_pdf/`, { responseType: 'blob' });
+    const url = window.URL.createObjectURL(response.data);
+    const enlace = document.createElement('a');
+    enlace.href = url;
+    enlace.download = `reporte-${reporteId}.pdf`;
+    document.body.appendChild(enlace);
+    enlace.click();
+    enlace.remove();
+    window.URL.revokeObjectURL(url);
+  };
+
   const exportarEstadisticasPDF = async () => {
     try {
+      if (selectedReporte) {
+        await descargarReportePDF(selectedReporte);
+        toast.success('PDF del reporte descargado correctamente');
+        return;
+      }
+
       // Preparar datos estructurados para el PDF
       const datosParaPDF = {
         estadisticas_generales: {
@@ -34,6 +34,8 @@ const TIPOS_REPORTE = [
   { value: 'comparativo', label: 'Reporte Comparativo' }
 ];
 
+const INTERVALO_CONSULTA_TAREA_MS = 1000;
+
 const INITIAL_FORM_DATA = {
   titulo: '',
   tipo: '',
@@ -47,6 +49,8 @@ const INITIAL_FORM_DATA = {
 // FUNCIONES UTILITARIAS
 // ============================================================================
 
+const esperar = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
 const formatDate = (dateString) => {
   const date = new Date(dateString);
   return date.toLocaleDateString('es-ES');
@@ -106,6 +110,7 @@ const ReporteForm = () => {
   const [loadingData, setLoadingData] = useState(true);
   const [error, setError] = useState('');
   const [generandoEstadisticas, setGenerandoEstadisticas] = useState(false);
+  const [progresoEstadisticas, setProgresoEstadisticas] = useState(0);
 
   // ============================================================================
   // EFECTOS
@@ -165,7 +170,17 @@ const ReporteForm = () => {
   const generarEstadisticas = async (reporteId) => {
     try {
       setGenerandoEstadisticas(true);
-      await api.post(`reportes/${reporteId}/generar_estadisticas/`);
+      setProgresoEstadisticas(0);
+      // La generación corre en segundo plano: se consulta la tarea hasta que termine
+      let { data: tarea } = await api.post(`reportes/${reporteId}/generar_estadisticas/`);
+      while (tarea.estado === 'pendiente' || tarea.estado === 'en_curso') {
+        setProgresoEstadisticas(tarea.progreso);
+        await esperar(INTERVALO_CONSULTA_TAREA_MS);
+        ({ data: tarea } = await api.get(`tareas-reporte/${tarea.id}/`));
+      }
+      if (tarea.estado === 'error') {
+        throw new Error(tarea.error);
+      }
       toast.success('Estadísticas generadas correctamente');
     } catch (err) {
       toast.error('Error al generar estadísticas');
@@ -355,7 +370,7 @@ const ReporteForm = () => {
         <Alert severity="info" sx={{ mb: 3 }}>
           <Box sx={{ display: 'flex', alignItems: 'center' }}>
             <CircularProgress size={20} sx={{ mr: 1 }} />
-            Generando estadísticas automáticamente...
+            Generando estadísticas automáticamente... {progresoEstadisticas}%
           </Box>
         </Alert>
       )}